@@ -0,0 +1,190 @@
+import asyncio
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+def answer_event(user_id, word_id, answer, correct, shown_at):
+    """Строка для answer_events; shown_at — time.time() показа карточки"""
+    latency_ms = None
+    if shown_at is not None:
+        latency_ms = max(0, int((time.time() - shown_at) * 1000))
+    return {
+        "user_id": user_id,
+        "word_id": word_id,
+        "answer": answer[:100],
+        "correct": correct,
+        "latency_ms": latency_ms,
+        "answered_at": datetime.now(),
+    }
+
+
+# Журнал ответов с отложенной записью пачками
+class AnswerLog:
+    """Буфер ответов на карточки между обработчиками и базой.
+
+    record() только кладёт событие в очередь и сразу возвращается, поэтому
+    ответ пользователю не ждёт INSERT и COMMIT. Фоновый поток записывает
+    события одним INSERT на пачку: когда набралось batch_size событий или
+    прошло flush_interval секунд. Если очередь заполнена (max_queue), новые
+    события отбрасываются и учитываются в dropped. close() дописывает всё,
+    что осталось в очереди.
+    """
+
+    def __init__(self, db, batch_size=500, flush_interval=1.0, max_queue=100_000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self._thread = threading.Thread(
+            target=self._run, name="answer-log", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, event):
+        """Постановка события в очередь без ожидания"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def depth(self):
+        """Число событий, ожидающих записи"""
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+    def _next_batch(self):
+        """Пачка событий: до batch_size штук или сколько пришло за flush_interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (self._closed.is_set() and self._queue.empty()):
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.db.insert_answer_events(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка записи журнала ответов ({len(batch)} событий): {e}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def close(self, timeout=None):
+        """Запись оставшихся событий и остановка фонового потока"""
+        self._closed.set()
+        self._thread.join(timeout)
+
+
+# Метка остановки в очереди AsyncAnswerLog
+_STOP = object()
+
+
+# Тот же буфер для AsyncTeleBot: очередь asyncio и задача вместо потока
+class AsyncAnswerLog:
+    """Асинхронный вариант AnswerLog поверх AsyncDatabase.
+
+    start() запускает задачу записи в текущем цикле событий.
+    """
+
+    def __init__(self, db, batch_size=500, flush_interval=1.0, max_queue=100_000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = None
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def record(self, event):
+        """Постановка события в очередь без ожидания"""
+        if self._task is None or self._queue.full():
+            self.dropped += 1
+            return
+        self._queue.put_nowait(event)
+
+    def depth(self):
+        """Число событий, ожидающих записи"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+    async def _write(self, batch):
+        try:
+            await self.db.insert_answer_events(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка записи журнала ответов ({len(batch)} событий): {e}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                await self._write(batch)
+
+    async def close(self):
+        """Запись оставшихся событий и остановка задачи"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
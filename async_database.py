@@ -0,0 +1,426 @@
+from datetime import datetime
+
+from sqlalchemy import delete, false, insert, make_url, select, true
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import scheduler
+from word_import import batched
+from database import (
+    _OVERSIZED,
+    _DatabaseQueries,
+    AnswerEvent,
+    DEFAULT_WORDS,
+    Base,
+    User,
+    UserWord,
+    Word,
+    WordEntry,
+    WordSchedule,
+)
+
+# Асинхронные драйверы для синхронных URL из DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(db_url):
+    """URL с асинхронным драйвером (asyncpg / aiosqlite)"""
+    url = make_url(db_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+# Асинхронный вариант Database на AsyncEngine
+class AsyncDatabase(_DatabaseQueries):
+    """Те же запросы, кэши и правила, что в Database, но через AsyncEngine.
+
+    Построение запросов и работа с кэшами общие с Database
+    (_DatabaseQueries), а обращения к базе — корутины этого класса. Методов
+    Database, которые здесь не реализованы (рассылка, unit_of_work,
+    счётчики пула), у AsyncDatabase нет.
+    """
+
+    def __init__(
+        self,
+        db_url,
+        vocab_cache_size=1024,
+        vocab_cache_ttl=300,
+        vocab_cache_max_words=5000,
+        vocab_cache_total_words=100_000,
+        user_id_cache_size=100_000,
+    ):
+        self.engine = create_async_engine(async_url(db_url))
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        self._init_caches(
+            vocab_cache_size,
+            vocab_cache_ttl,
+            vocab_cache_max_words,
+            vocab_cache_total_words,
+            user_id_cache_size,
+        )
+
+    async def create_tables(self):
+        """Создание всех таблиц в БД"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        print("Таблицы успешно созданы!")
+
+    async def init_default_words(self):
+        """Инициализация базовых слов по умолчанию"""
+        async with self.Session() as session:
+            existing = (
+                await session.execute(select(Word.id).where(Word.is_default == true()))
+            ).first()
+            if existing is None:
+                session.add_all(
+                    Word(english=w["english"], russian=w["russian"], is_default=True)
+                    for w in DEFAULT_WORDS
+                )
+                await session.commit()
+                print(f"Добавлено {len(DEFAULT_WORDS)} слов по умолчанию")
+
+    async def compact_default_words(self):
+        """Удаление скопированных связей со словами по умолчанию"""
+        async with self.Session() as session:
+            await session.execute(
+                delete(UserWord).where(
+                    UserWord.deleted == false(),
+                    UserWord.word_id.in_(select(Word.id).where(Word.is_default == true())),
+                )
+            )
+            await session.commit()
+
+    async def get_or_create_user_id(
+        self, telegram_id, username=None, first_name=None, last_name=None
+    ):
+        """Получение id пользователя по telegram_id с созданием при необходимости"""
+        user_id = self.user_id_cache.get(telegram_id)
+        if user_id is not None:
+            return user_id
+
+        stmt = self._upsert_user_statement(telegram_id, username, first_name, last_name)
+
+        async with self.Session() as session:
+            user_id = None
+            if stmt is not None:
+                user_id = (await session.execute(stmt)).scalar()
+            if user_id is None:
+                user_id = (
+                    await session.execute(
+                        select(User.id).where(User.telegram_id == telegram_id)
+                    )
+                ).scalar()
+            if user_id is None:
+                user = User(
+                    telegram_id=telegram_id,
+                    username=username,
+                    first_name=first_name,
+                    last_name=last_name,
+                )
+                session.add(user)
+                await session.flush()
+                user_id = user.id
+            await session.commit()
+
+        self.user_id_cache.set(telegram_id, user_id)
+        return user_id
+
+    async def _get_vocabulary(self, user_id):
+        """Активные слова пользователя из кэша (см. Database._get_vocabulary)"""
+        if self.vocab_cache.maxsize <= 0:
+            return None
+
+        vocabulary = self.vocab_cache.get(user_id)
+        if vocabulary is _OVERSIZED:
+            return None
+        if vocabulary is not None:
+            return vocabulary
+
+        invalidations = self._vocab_invalidations
+        async with self.Session() as session:
+            rows = (await session.execute(self._vocabulary_statement(user_id))).all()
+
+        return self._store_vocabulary(user_id, rows, invalidations)
+
+    async def _query_user_words(self, user_id, include_deleted=False, is_default=None):
+        async with self.Session() as session:
+            words = self._user_words_select(
+                user_id, include_deleted, is_default
+            ).subquery()
+            rows = await session.execute(select(words).order_by(words.c.id))
+            return [WordEntry(*row) for row in rows]
+
+    async def get_user_words(self, user_id, include_deleted=False, include_default=False):
+        """Получение слов пользователя"""
+        is_default = None if include_default else False
+
+        if not include_deleted:
+            vocabulary = await self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return [
+                    w for w in vocabulary if is_default is None or not w.is_default
+                ]
+
+        return await self._query_user_words(user_id, include_deleted, is_default)
+
+    async def get_user_default_words(self, user_id, include_deleted=False):
+        """Получение только дефолтных слов пользователя"""
+        if not include_deleted:
+            vocabulary = await self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return [w for w in vocabulary if w.is_default]
+
+        return await self._query_user_words(user_id, include_deleted, is_default=True)
+
+    async def get_all_user_words(self, user_id, include_deleted=False):
+        """Получение всех слов пользователя (включая дефолтные)"""
+        if not include_deleted:
+            vocabulary = await self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return list(vocabulary)
+
+        return await self._query_user_words(user_id, include_deleted)
+
+    async def get_words_page(self, user_id, after=None, before=None, size=10):
+        """Страница слов пользователя (WordsPage) для /mywords"""
+        async with self.Session() as session:
+            rows = (
+                await session.execute(
+                    self._words_page_statement(user_id, after, before, size)
+                )
+            ).all()
+
+        return self._words_page(rows, after, before, size)
+
+    async def get_picker_page(
+        self, user_id, prefix=None, after=None, before=None, size=8
+    ):
+        """Страница собственных слов (PickerPage) для выбора удаляемого слова"""
+        async with self.Session() as session:
+            rows = (
+                await session.execute(
+                    self._picker_page_statement(user_id, prefix, after, before, size)
+                )
+            ).all()
+
+        return self._picker_page(rows, after, before, size)
+
+    async def get_random_words_for_test(self, user_id, count=4, mode="bounded"):
+        """Получение случайных слов для теста"""
+        vocabulary = await self._get_vocabulary(user_id)
+        if vocabulary is not None and len(vocabulary) >= count:
+            return self._pick_card(vocabulary, count)
+
+        if vocabulary is None and mode == "bounded":
+            async with self.Session() as session:
+                total = (
+                    await session.scalar(self._word_count_statement(user_id)) or 0
+                )
+                if total >= self.BOUNDED_MIN_WORDS:
+                    rows = await session.execute(
+                        self._bounded_probe_statement(user_id, total, count)
+                    )
+                    words = [WordEntry(*row) for row in rows]
+                    result = self._pick_bounded(words, total, count)
+                    if result is not None:
+                        return result
+
+        user_words = await self._query_user_words(user_id)
+        if len(user_words) >= count:
+            return self._pick_card(user_words, count)
+
+        # Если у пользователя недостаточно слов, берём все слова по умолчанию
+        async with self.Session() as session:
+            return await session.run_sync(self._get_default_words_for_test, count)
+
+    async def get_next_card(self, user_id, count=4):
+        """Карточка для тренировки: слово, которое пора повторить, или случайное"""
+        async with self.Session() as session:
+            row = (
+                await session.execute(
+                    self._next_due_statement(user_id, datetime.now())
+                )
+            ).first()
+
+        target_word, all_words = await self.get_random_words_for_test(user_id, count)
+        if row is None or not target_word:
+            return target_word, all_words
+        return self._with_due_word(WordEntry(*row), all_words, count)
+
+    async def record_answer(self, user_id, word_id, correct):
+        """Учёт ответа на карточку в расписании повторения слова"""
+        async with self.Session() as session:
+            schedule = await session.get(WordSchedule, (user_id, word_id))
+            if schedule is None:
+                visible = await session.execute(
+                    self._visible_word_statement(user_id, word_id)
+                )
+                if not visible.first():
+                    return None
+                schedule = WordSchedule(
+                    user_id=user_id,
+                    word_id=word_id,
+                    interval=0,
+                    ease=scheduler.INITIAL_EASE,
+                    repetitions=0,
+                )
+                session.add(schedule)
+
+            result = self._apply_review(schedule, correct, datetime.now())
+            await session.commit()
+            return result
+
+    async def insert_answer_events(self, events):
+        """Запись пачки ответов одним INSERT (список словарей)"""
+        async with self.Session() as session:
+            await session.execute(insert(AnswerEvent), events)
+            await session.commit()
+
+    async def add_word_to_user(self, user_id, english, russian):
+        """Добавление нового слова пользователю"""
+        english_lower = english.lower().strip()
+        russian_lower = russian.lower().strip()
+
+        async with self.Session() as session:
+            word = (
+                await session.execute(
+                    select(Word).where(
+                        Word.english == english_lower, Word.russian == russian_lower
+                    )
+                )
+            ).scalar()
+
+            if not word:
+                word = Word(
+                    english=english_lower, russian=russian_lower, is_default=False
+                )
+                session.add(word)
+                await session.flush()
+
+            existing_user_word = (
+                await session.execute(
+                    select(UserWord).where(
+                        UserWord.user_id == user_id, UserWord.word_id == word.id
+                    )
+                )
+            ).scalar()
+
+            if word.is_default:
+                # Слово по умолчанию уже видно пользователю, если не скрыто
+                if existing_user_word and existing_user_word.deleted:
+                    await session.delete(existing_user_word)
+                    await session.commit()
+                    self._invalidate_vocabulary(user_id)
+                    return word.english, word.russian, False
+                return word.english, word.russian, None
+
+            if existing_user_word and not existing_user_word.deleted:
+                return word.english, word.russian, None
+
+            # Сначала счётчик, затем номер слова по нему
+            await session.execute(self._word_count_update(user_id, 1))
+            position = self._word_position(user_id)
+            if existing_user_word:
+                existing_user_word.deleted = False
+                existing_user_word.position = position
+                existing_user_word.english = word.english
+                result = False
+            else:
+                session.add(
+                    UserWord(
+                        user_id=user_id,
+                        word_id=word.id,
+                        english=word.english,
+                        deleted=False,
+                        position=position,
+                    )
+                )
+                result = True
+
+            await session.commit()
+            self._invalidate_vocabulary(user_id)
+            return word.english, word.russian, result
+
+    async def import_words(self, user_id, pairs, batch_size=1000, stats=None):
+        """Добавление слов пользователю пачками (загрузка из файла)"""
+        if stats is None:
+            stats = self.new_import_stats()
+
+        try:
+            for batch in batched(pairs, batch_size):
+                keys = self._import_keys(batch, stats)
+                async with self.Session() as session:
+                    words = (
+                        await session.execute(self._words_by_keys_statement(keys))
+                    ).all()
+                    found = {(w.english, w.russian) for w in words}
+                    missing = [key for key in keys if key not in found]
+                    if missing:
+                        await session.execute(self._insert_words_statement(missing))
+                        words += (
+                            await session.execute(
+                                self._words_by_keys_statement(missing)
+                            )
+                        ).all()
+
+                    links = dict(
+                        (
+                            await session.execute(
+                                self._user_links_statement(
+                                    user_id, [w.id for w in words]
+                                )
+                            )
+                        ).all()
+                    )
+                    for stmt in self._import_statements(user_id, words, links, stats):
+                        await session.execute(stmt)
+                    await session.commit()
+        finally:
+            self._invalidate_vocabulary(user_id)
+
+        return stats
+
+    async def get_user_word_count(self, user_id):
+        """Число собственных (не дефолтных) слов пользователя — чтение счётчика"""
+        async with self.Session() as session:
+            return await session.scalar(self._word_count_statement(user_id)) or 0
+
+    async def delete_word_from_user(self, user_id, word_id):
+        """Удаление слова у пользователя (только НЕ дефолтные слова)"""
+        try:
+            async with self.Session() as session:
+                word = await session.get(Word, word_id)
+                if word and word.is_default:
+                    return False, "Нельзя удалять слова по умолчанию"
+
+                user_word = (
+                    await session.execute(
+                        select(UserWord).where(
+                            UserWord.user_id == user_id, UserWord.word_id == word_id
+                        )
+                    )
+                ).scalar()
+
+                if not user_word or user_word.deleted:
+                    return False, "Слово не найдено у пользователя"
+
+                position = user_word.position
+                await session.execute(self._word_count_update(user_id, -1))
+                if position is not None:
+                    await session.execute(
+                        self._fill_position_statement(user_id, position)
+                    )
+                user_word.deleted = True
+                user_word.position = None
+                await session.execute(
+                    self._delete_schedule_statement(user_id, word_id)
+                )
+                await session.commit()
+                self._invalidate_vocabulary(user_id)
+                return True, "Слово удалено"
+
+        except Exception as e:
+            return False, f"Ошибка: {str(e)}"
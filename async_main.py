@@ -0,0 +1,439 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from telebot.async_telebot import AsyncTeleBot
+
+import async_database
+import views
+from answer_log import AsyncAnswerLog, answer_event
+from router import Router
+from state_storage import AsyncMemoryStateStorage
+from views import CANCEL, Command, MyStates
+from word_import import (
+    IMPORT_EXTENSIONS,
+    MAX_IMPORT_FILE_SIZE,
+    open_text,
+    read_word_pairs,
+)
+
+# Асинхронный вариант main.py: те же обработчики и состояния на AsyncTeleBot
+# и AsyncEngine. Один процесс держит тысячи обновлений в работе без потока
+# на каждое, пока они ждут Postgres и Telegram.
+
+load_dotenv()
+TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+DB_URL = os.getenv("DATABASE_URL")
+
+# Состояния в памяти: простаивающие дольше STATE_IDLE_TTL секунд удаляются
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "100000"))
+STATE_IDLE_TTL = int(os.getenv("STATE_IDLE_TTL", "3600"))
+
+state_storage = AsyncMemoryStateStorage(
+    max_entries=STATE_MAX_ENTRIES, idle_ttl=STATE_IDLE_TTL
+)
+bot = AsyncTeleBot(TOKEN, state_storage=state_storage)
+db = async_database.AsyncDatabase(DB_URL)
+# Ответы на карточки пишутся в фоне пачками, не задерживая ответ бота
+answer_log = AsyncAnswerLog(db)
+router = Router()
+
+
+@bot.message_handler(content_types=["text"])
+async def dispatch(message):
+    """Единая точка входа: обработчик выбирается по таблице маршрутов"""
+    state = await bot.get_state(message.from_user.id, message.chat.id)
+    handler = router.resolve(message.text, state)
+    if handler is not None:
+        await handler(message)
+
+
+@bot.callback_query_handler(func=lambda call: True)
+async def dispatch_callback(call):
+    """Нажатия inline-кнопок по таблице маршрутов"""
+    handler = router.resolve_callback(call.data)
+    if handler is not None:
+        await handler(call)
+    else:
+        await bot.answer_callback_query(call.id)
+
+
+@router.command("start", "cards")
+async def handle_start(message):
+    """Начало работы с ботом"""
+    cid = message.chat.id
+    user_id = await db.get_or_create_user_id(
+        telegram_id=cid,
+        username=message.from_user.username,
+        first_name=message.from_user.first_name,
+        last_name=message.from_user.last_name,
+    )
+
+    if message.text == "/start":
+        await bot.send_message(cid, views.WELCOME_MESSAGE, parse_mode="HTML")
+
+    await create_cards(message, user_id)
+
+
+@router.command("help")
+async def handle_help(message):
+    """Помощь по боту"""
+    await bot.send_message(message.chat.id, views.HELP_MESSAGE, parse_mode="Markdown")
+
+
+@router.command("mywords")
+async def handle_mywords(message):
+    """Показать слова пользователя"""
+    cid = message.chat.id
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    # Первая страница и число слов одним запросом
+    page = await db.get_words_page(user_id, size=views.PAGE_SIZE)
+
+    if not page.words:
+        await bot.send_message(cid, views.NO_WORDS_MESSAGE)
+        return
+
+    await bot.send_message(
+        cid,
+        views.mywords_message(page),
+        parse_mode="Markdown",
+        reply_markup=views.page_markup("mywords", page),
+    )
+
+
+@router.callback("mywords")
+async def mywords_page(call):
+    """Листание списка слов"""
+    cid = call.message.chat.id
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    after, before = views.parse_page_callback(call.data)
+    page = await db.get_words_page(user_id, after, before, views.PAGE_SIZE)
+
+    await bot.answer_callback_query(call.id)
+    if page.words:
+        await bot.edit_message_text(
+            views.mywords_message(page),
+            cid,
+            call.message.message_id,
+            parse_mode="Markdown",
+            reply_markup=views.page_markup("mywords", page),
+        )
+
+
+async def create_cards(message, user_id=None):
+    """Создать новую карточку с вопросом"""
+    await send_card(message.chat.id, message.from_user.id, user_id)
+
+
+async def send_card(cid, uid, user_id=None):
+    """Отправить карточку в чат cid (uid — id пользователя Telegram)"""
+    if user_id is None:
+        user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    target_word, all_words = await db.get_next_card(user_id)
+
+    if not target_word:
+        await bot.send_message(cid, views.NOT_ENOUGH_WORDS_MESSAGE)
+        return
+
+    card = views.Card.from_words(target_word, all_words)
+
+    await bot.send_message(
+        cid,
+        views.card_question(card),
+        reply_markup=views.card_markup(card.options),
+        parse_mode="Markdown",
+    )
+
+    await bot.set_state(uid, MyStates.target_word.name, cid)
+    async with bot.retrieve_data(uid, cid) as data:
+        data["card"] = card
+        data["user_id"] = user_id
+        data["shown_at"] = time.time()
+        data.pop("answered", None)  # ответ на новую карточку ещё не записан
+
+
+@router.button(Command.NEXT)
+async def next_card(message):
+    """Следующая карточка"""
+    await create_cards(message)
+
+
+@router.button(Command.ADD_WORD)
+async def add_word_start(message):
+    """Начать добавление слова"""
+    await bot.send_message(
+        message.chat.id, "Введите английское слово:", reply_markup=views.cancel_markup()
+    )
+    await bot.set_state(
+        message.from_user.id, MyStates.waiting_for_english.name, message.chat.id
+    )
+
+
+@router.button(Command.DELETE_WORD)
+async def delete_word_start(message):
+    """Начать удаление слова"""
+    cid = message.chat.id
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    # Только пользовательские слова, первая страница
+    page = await db.get_picker_page(user_id, size=views.DELETE_PAGE_SIZE)
+
+    if not page.words:
+        await bot.send_message(cid, views.NOTHING_TO_DELETE_MESSAGE)
+        return
+
+    await bot.send_message(
+        cid, views.DELETE_PROMPT, reply_markup=views.delete_markup(page)
+    )
+    await bot.set_state(
+        message.from_user.id, MyStates.waiting_for_word_to_delete.name, cid
+    )
+    # Новый список без поиска: листание не должно продолжать прежний поиск
+    async with bot.retrieve_data(message.from_user.id, cid) as data:
+        data.pop("delete_prefix", None)
+
+
+@router.button(Command.MY_WORDS)
+async def show_my_words(message):
+    """Показать мои слова"""
+    await handle_mywords(message)
+
+
+@router.button(Command.HELP)
+async def show_help(message):
+    """Показать помощь"""
+    await handle_help(message)
+
+
+@bot.message_handler(content_types=["document"])
+async def handle_document(message):
+    """Загрузка слов из CSV/TSV-файла"""
+    cid = message.chat.id
+    document = message.document
+
+    if not (document.file_name or "").lower().endswith(IMPORT_EXTENSIONS):
+        await bot.send_message(cid, views.IMPORT_FORMAT_MESSAGE)
+        return
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await bot.send_message(cid, views.IMPORT_TOO_LARGE_MESSAGE)
+        return
+
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    try:
+        file_info = await bot.get_file(document.file_id)
+        content = await bot.download_file(file_info.file_path)
+
+        # Файл разбирается построчно и пишется в базу пачками
+        stats = db.new_import_stats()
+        pairs = read_word_pairs(open_text(content), stats)
+        await db.import_words(user_id, pairs, stats=stats)
+
+        await bot.send_message(
+            cid, views.import_summary_message(stats), parse_mode="Markdown"
+        )
+
+    except Exception as e:
+        await bot.send_message(cid, f"❌ Ошибка: {str(e)}")
+
+
+# Состояния ввода
+@router.state(MyStates.waiting_for_english)
+async def get_english_word(message):
+    """Получить английское слово"""
+    if message.text == CANCEL:
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        await create_cards(message)
+        return
+
+    await bot.send_message(
+        message.chat.id,
+        views.english_received_message(message.text),
+        parse_mode="Markdown",
+        reply_markup=views.cancel_markup(),
+    )
+
+    await bot.set_state(
+        message.from_user.id, MyStates.waiting_for_russian.name, message.chat.id
+    )
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+        data["new_english"] = message.text.strip()
+
+
+@router.state(MyStates.waiting_for_russian)
+async def get_russian_translation(message):
+    """Получить русский перевод"""
+    if message.text == CANCEL:
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        await create_cards(message)
+        return
+
+    cid = message.chat.id
+
+    async with bot.retrieve_data(message.from_user.id, cid) as data:
+        english = data["new_english"]
+        russian = message.text.strip()
+        user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+        try:
+            english_word, russian_word, result = await db.add_word_to_user(
+                user_id, english, russian
+            )
+
+            response = views.add_word_message(english_word, russian_word, result)
+            await bot.send_message(cid, response, parse_mode="Markdown")
+
+        except Exception as e:
+            await bot.send_message(cid, f"❌ Ошибка: {str(e)}")
+
+    await bot.delete_state(message.from_user.id, cid)
+    await create_cards(message, user_id)
+
+
+@router.state(MyStates.waiting_for_word_to_delete)
+async def search_word_to_delete(message):
+    """Поиск удаляемого слова по началу"""
+    if message.text == CANCEL:
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        await create_cards(message)
+        return
+
+    cid = message.chat.id
+    prefix = message.text.strip()
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    page = await db.get_picker_page(user_id, prefix, size=views.DELETE_PAGE_SIZE)
+    if not page.words:
+        await bot.send_message(cid, views.search_not_found_message(prefix))
+        return
+
+    # Листание продолжает поиск по тому же началу слова
+    async with bot.retrieve_data(message.from_user.id, cid) as data:
+        data["delete_prefix"] = prefix
+
+    await bot.send_message(
+        cid, views.DELETE_PROMPT, reply_markup=views.delete_markup(page)
+    )
+
+
+@router.callback("delete")
+async def delete_callback(call):
+    """Кнопки списка удаления: слово, листание, отмена"""
+    cid = call.message.chat.id
+    uid = call.from_user.id
+    action = call.data.split(":", 2)[1]
+
+    await bot.answer_callback_query(call.id)
+
+    if action == "cancel":
+        await bot.edit_message_reply_markup(cid, call.message.message_id)
+        await bot.delete_state(uid, cid)
+        await send_card(cid, uid)
+        return
+
+    user_id = await db.get_or_create_user_id(telegram_id=cid)
+
+    if action == "word":
+        # id слова из callback_data; delete_word_from_user проверяет владельца
+        word_id = int(call.data.rsplit(":", 1)[1])
+        success, msg = await db.delete_word_from_user(user_id, word_id)
+        await bot.edit_message_text(
+            f"✅ {msg}" if success else f"❌ {msg}", cid, call.message.message_id
+        )
+        await bot.delete_state(uid, cid)
+        await send_card(cid, uid, user_id)
+        return
+
+    async with bot.retrieve_data(uid, cid) as data:
+        prefix = (data or {}).get("delete_prefix")
+
+    after, before = views.parse_page_callback(call.data)
+    page = await db.get_picker_page(
+        user_id, prefix, after, before, size=views.DELETE_PAGE_SIZE
+    )
+    if page.words:
+        await bot.edit_message_reply_markup(
+            cid, call.message.message_id, reply_markup=views.delete_markup(page)
+        )
+
+
+@router.default
+async def handle_test_answer(message):
+    """Обработка ответов на тест"""
+    # Кнопки и состояния ввода сюда не попадают: их разбирает router
+    is_correct = None
+    try:
+        uid, cid = message.from_user.id, message.chat.id
+        async with bot.retrieve_data(uid, cid) as data:
+            if data and "card" in data:
+                is_correct = await check_answer(message, data)
+    except Exception:
+        is_correct = None
+
+    # Новая карточка, когда карточки нет (например, после перезапуска) или
+    # ответ правильный; только после выхода из retrieve_data, иначе его
+    # save() затёр бы состояние, записанное send_card
+    if is_correct is not False:
+        await create_cards(message)
+
+
+async def check_answer(message, data):
+    """Проверка ответа на карточку из data; True, если ответ правильный"""
+    cid = message.chat.id
+    uid = message.from_user.id
+
+    card = views.Card.restore(data["card"])
+
+    # Проверяем ответ
+    user_answer = message.text.strip()
+    is_correct = user_answer == card.english
+
+    # В расписание повторения идёт только первый ответ на карточку
+    if card.word_id is not None and not data.get("answered"):
+        await db.record_answer(data["user_id"], card.word_id, is_correct)
+        data["answered"] = True
+
+    answer_log.record(
+        answer_event(
+            data["user_id"],
+            card.word_id,
+            user_answer,
+            is_correct,
+            data.get("shown_at"),
+        )
+    )
+
+    if is_correct:
+        markup = views.service_markup()
+    else:
+        markup = views.card_markup(card.options, wrong_answer=user_answer)
+
+    response = views.answer_message(card, is_correct)
+    await bot.send_message(cid, response, reply_markup=markup, parse_mode="Markdown")
+
+    if is_correct:
+        await bot.delete_state(uid, cid)
+    return is_correct
+
+
+async def main():
+    await db.create_tables()
+    await db.init_default_words()
+    await db.compact_default_words()
+
+    answer_log.start()
+    print("Бот запущен (asyncio)!")
+    try:
+        await bot.infinity_polling()
+    finally:
+        await answer_log.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nБот остановлен.")
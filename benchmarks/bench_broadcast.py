@@ -0,0 +1,127 @@
+"""Ежедневная рассылка main.py по тысячам пользователей против фейкового Bot API.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_broadcast.py --users 2000
+    BROADCAST_RATE=25 python benchmarks/bench_broadcast.py --users 5000 --crash-after 1200
+
+В базу добавляются --users пользователей, затем main.broadcast рассылает
+каждому карточку через очередь исходящих сообщений (outbound.py).
+Фейковый API отвечает 429 сверх --api-rate сообщений в секунду, как
+Telegram; по умолчанию бот отправляет не больше 30 в секунду (SEND_RATE),
+а рассылка — BROADCAST_RATE (по умолчанию 20).
+
+С --crash-after рассылка прерывается после стольких пользователей, как
+при падении процесса, и запускается снова с тем же именем:
+она должна продолжиться с последней сохранённой пачки. В отчёте —
+сообщения в секунду, пользователи без карточки (должно быть 0) и
+повторные карточки (не больше размера пачки).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper  # noqa: E402
+
+from bench_database import seed  # noqa: E402
+from e2e_sessions import load_main  # noqa: E402
+from fake_api import FakeTelegramAPI  # noqa: E402
+
+BASE_TELEGRAM_ID = 700000
+
+
+class _Crash(BaseException):
+    """Падение процесса посреди рассылки"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--crash-after", type=int, default=0, help="карточек")
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--api-rate", type=float, default=30, help="429 сверх стольких сообщений в секунду"
+    )
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--output", help="файл для JSON-отчёта")
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(latency=args.api_latency, rate=args.api_rate).start()
+    apihelper.API_URL = api.api_url
+
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'broadcast.db')}"
+
+    # Ограничение отправки как у бота по умолчанию, а не выключенное, как в e2e
+    os.environ.setdefault("SEND_RATE", "30")
+    bot_main = load_main(db_url, "polling")
+    bot_main.db.create_tables()
+    bot_main.db.init_default_words()
+    seed(bot_main.db, args.users, 0, BASE_TELEGRAM_ID)
+
+    name = f"bench:{time.time():.0f}"
+    runs = []
+    if args.crash_after:
+        started = 0
+
+        def crashing_send(user_id, telegram_id, done):
+            nonlocal started
+            started += 1
+            if started > args.crash_after:
+                raise _Crash()
+            bot_main.send_reminder(user_id, telegram_id, done)
+
+        crashed = bot_main.Broadcast(
+            bot_main.db,
+            crashing_send,
+            batch_size=bot_main.BROADCAST_BATCH_SIZE,
+            rate=bot_main.BROADCAST_RATE,
+        )
+        try:
+            crashed.run(name)
+        except _Crash:
+            runs.append({"crashed_after": args.crash_after, **crashed.stats()})
+
+    runs.append(bot_main.broadcast.run(name))
+    # Повторный запуск завершённой рассылки ничего не отправляет
+    runs.append(bot_main.broadcast.run(name))
+    bot_main.outbound.close()
+    bot_main.chat_workers.close()
+    bot_main.answer_log.close()
+
+    received = Counter(
+        chat_id for chat_id, text, _ in api.sent if text.startswith("⏰")
+    )
+    report = {
+        "users": args.users,
+        "broadcast_rate": bot_main.BROADCAST_RATE,
+        "batch_size": bot_main.BROADCAST_BATCH_SIZE,
+        "send_rate": bot_main.SEND_RATE,
+        "runs": runs,
+        "missed_users": args.users - len(received),
+        "duplicates": sum(count - 1 for count in received.values()),
+        "api_throttled": dict(api.throttled),
+        "outbound": bot_main.outbound.stats(),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    api.stop()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Сравнение выборки карточки: полный просмотр словаря против ограниченной.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_card_selection.py
+    python benchmarks/bench_card_selection.py --db-url postgresql://... --repeat 200
+
+Без --db-url используется временная база SQLite. Связи замеряемого
+пользователя перемежаются сериями связей NEIGHBOURS соседей, как в общей
+базе. Колонка «после разрыва» — доля слов в карточках, перед связью
+которых лежат чужие связи; при равновероятной выборке она совпадает с
+долей таких слов в словаре (строка «словарь»).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import Database, User, UserWord, Word  # noqa: E402
+
+SIZES = (10, 1_000, 50_000)
+MODES = ("scan", "bounded")
+# Пользователи, чьи связи перемежаются со связями замеряемого
+NEIGHBOURS = 3
+
+
+def seed_user(db, telegram_id, size, neighbours=0):
+    """Создание пользователя с size собственными словами
+
+    С neighbours перед каждой связью пользователя с вероятностью 0.3
+    вставляется серия связей случайного соседа случайной длины, поэтому
+    id связей пользователя идут с неравными промежутками.
+    """
+    rng = random.Random(telegram_id)
+    session = db.Session()
+    try:
+        users = [User(telegram_id=telegram_id, username=f"bench_{size}")] + [
+            User(
+                telegram_id=telegram_id + 1000 * (k + 1),
+                username=f"bench_{size}_{k}",
+            )
+            for k in range(neighbours)
+        ]
+        session.add_all(users)
+        session.flush()
+
+        owners = []
+        for _ in range(size):
+            if neighbours and rng.random() < 0.3:
+                run = int(rng.expovariate(1 / 20)) + 1
+                owners += [rng.randrange(neighbours) + 1] * run
+            owners.append(0)
+        counts = [0] * len(users)
+        positions = []
+        for owner in owners:
+            counts[owner] += 1
+            positions.append(counts[owner])
+        for user, count in zip(users, counts):
+            user.custom_word_count = count
+
+        first_word_id = session.execute(
+            select(Word.id).order_by(Word.id.desc()).limit(1)
+        ).scalar() or 0
+        session.execute(
+            insert(Word),
+            [
+                {"english": f"word{telegram_id}_{i}", "russian": f"слово{i}"}
+                for i in range(len(owners))
+            ],
+        )
+        session.execute(
+            insert(UserWord),
+            [
+                {
+                    "user_id": users[owner].id,
+                    "word_id": first_word_id + i + 1,
+                    "english": f"word{telegram_id}_{i}",
+                    "position": position,
+                }
+                for i, (owner, position) in enumerate(zip(owners, positions))
+            ],
+        )
+        session.commit()
+        return users[0].id
+    finally:
+        session.close()
+
+
+def gap_words(db, user_id):
+    """id слов пользователя, перед связью которых лежат связи соседей, и число связей"""
+    session = db.Session()
+    try:
+        rows = session.execute(
+            select(UserWord.id, UserWord.word_id)
+            .where(UserWord.user_id == user_id)
+            .order_by(UserWord.id)
+        ).all()
+    finally:
+        session.close()
+    return {
+        word_id
+        for (prev, _), (link_id, word_id) in zip(rows, rows[1:])
+        if link_id - prev > 1
+    }, len(rows)
+
+
+def measure(db, user_id, mode, repeat, gaps):
+    """Задержка get_random_words_for_test в миллисекундах и доля слов gaps"""
+    timings = []
+    custom = in_gaps = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _, all_words = db.get_random_words_for_test(user_id, mode=mode)
+        timings.append((time.perf_counter() - started) * 1000)
+        for word in all_words:
+            if not word.is_default:
+                custom += 1
+                in_gaps += word.id in gaps
+    timings.sort()
+    return {
+        "mean": statistics.fmean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95) - 1],
+        "gaps": in_gaps / custom if custom else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    db = Database(db_url, vocab_cache_size=0)  # сравниваем пути выборки без кэша
+    db.create_tables()
+
+    base_telegram_id = int(time.time())
+    print(
+        f"{'слов':>8} {'режим':>8} {'mean, мс':>10} {'p50, мс':>10}"
+        f" {'p95, мс':>10} {'после разрыва, %':>17}"
+    )
+    for offset, size in enumerate(SIZES):
+        user_id = seed_user(db, base_telegram_id + offset, size, NEIGHBOURS)
+        gaps, total = gap_words(db, user_id)
+        print(f"{size:>8} {'словарь':>8} {'':>32} {len(gaps) / total * 100:>17.1f}")
+        for mode in MODES:
+            db.get_random_words_for_test(user_id, mode=mode)  # прогрев
+            stats = measure(db, user_id, mode, args.repeat, gaps)
+            print(
+                f"{size:>8} {mode:>8} {stats['mean']:>10.3f}"
+                f" {stats['p50']:>10.3f} {stats['p95']:>10.3f}"
+                f" {stats['gaps'] * 100:>17.1f}"
+            )
+
+    db.engine.dispose()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""Нагрузочный замер слоя базы данных: методы Database под параллельными пользователями.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_database.py
+    python benchmarks/bench_database.py --users 2000 --words 200 --workers 32
+    python benchmarks/bench_database.py --db-url postgresql://... --output before.json
+
+Без --db-url (или BENCH_DATABASE_URL) используется временная база SQLite.
+База заполняется users пользователями по words собственных слов, затем
+workers потоков в течение duration секунд вызывают публичные методы
+Database в смеси, похожей на работу бота (карточки и ответы чаще, импорт
+и удаление реже). Смесь задаётся --seed, поэтому последовательность
+вызовов воспроизводима. Служебные методы (create_tables,
+init_default_words, compact_default_words, new_import_stats, pool_stats,
+unit_of_work) не замеряются.
+
+Результат — JSON с пропускной способностью и задержками p50/p95/p99 по
+каждому методу; отчёты разных коммитов можно сравнивать между собой.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import Database, User, UserWord, Word  # noqa: E402
+from word_import import batched  # noqa: E402
+
+SEED_BATCH = 5_000
+
+
+def seed(db, users, words, base_telegram_id):
+    """Пользователи с words собственными словами каждый, вставка пачками
+
+    Связи пользователей идут вперемешку (j-е слово каждого, затем j+1-е),
+    как в общей базе, где пользователи добавляют слова одновременно.
+    Возвращает список пользователей: (user_id, telegram_id, [word_id, ...]).
+    """
+    session = db.Session()
+    try:
+        for batch in batched(range(users), SEED_BATCH):
+            session.execute(
+                insert(User),
+                [
+                    {
+                        "telegram_id": base_telegram_id + i,
+                        "username": f"bench_{i}",
+                        "custom_word_count": words,
+                    }
+                    for i in batch
+                ],
+            )
+        user_ids = session.execute(
+            select(User.id, User.telegram_id)
+            .where(User.telegram_id >= base_telegram_id)
+            .where(User.telegram_id < base_telegram_id + users)
+            .order_by(User.telegram_id)
+        ).all()
+
+        first_word_id = session.execute(
+            select(Word.id).order_by(Word.id.desc()).limit(1)
+        ).scalar() or 0
+        pairs = (
+            (index, j) for j in range(words) for index in range(len(user_ids))
+        )
+        for batch in batched(pairs, SEED_BATCH):
+            session.execute(
+                insert(Word),
+                [
+                    {
+                        "english": f"bench{base_telegram_id + index}w{j}",
+                        "russian": f"слово{j}",
+                        "is_default": False,
+                    }
+                    for index, j in batch
+                ],
+            )
+            session.execute(
+                insert(UserWord),
+                [
+                    {
+                        "user_id": user_ids[index].id,
+                        "word_id": first_word_id + j * len(user_ids) + index + 1,
+                        "english": f"bench{base_telegram_id + index}w{j}",
+                        "deleted": False,
+                        "position": j + 1,
+                    }
+                    for index, j in batch
+                ],
+            )
+        session.commit()
+    finally:
+        session.close()
+
+    return [
+        (
+            row.id,
+            row.telegram_id,
+            list(
+                range(
+                    first_word_id + index + 1,
+                    first_word_id + words * len(user_ids) + 1,
+                    len(user_ids),
+                )
+            ),
+        )
+        for index, row in enumerate(user_ids)
+    ]
+
+
+class Worker:
+    """Один имитируемый пользователь: выбирает операцию по весу и замеряет её"""
+
+    def __init__(self, number, db, users, rng, new_telegram_ids):
+        self.number = number
+        self.db = db
+        self.users = users
+        self.rng = rng
+        self.new_telegram_ids = new_telegram_ids
+        self.added = 0
+        self.timings = {name: [] for name in OPERATIONS}
+        self.errors = {name: 0 for name in OPERATIONS}
+
+    # Операции получают случайного пользователя и возвращают False, если
+    # выполнить их нечем (например, у пользователя не осталось слов)
+
+    def get_or_create_user(self, user):
+        self.db.get_or_create_user(user[1])
+
+    def get_or_create_user_id(self, user):
+        # Каждый пятый вызов — новый пользователь (INSERT ... ON CONFLICT)
+        if self.rng.random() < 0.2:
+            self.db.get_or_create_user_id(next(self.new_telegram_ids))
+        else:
+            self.db.get_or_create_user_id(user[1])
+
+    def get_random_words_for_test(self, user):
+        self.db.get_random_words_for_test(user[0])
+
+    def get_next_card(self, user):
+        self.db.get_next_card(user[0])
+
+    def record_answer(self, user):
+        if not user[2]:
+            return False
+        correct = self.rng.random() < 0.7
+        self.db.record_answer(user[0], self.rng.choice(user[2]), correct)
+
+    def insert_answer_events(self, user):
+        if not user[2]:
+            return False
+        now = datetime.now()
+        self.db.insert_answer_events(
+            [
+                {
+                    "user_id": user[0],
+                    "word_id": self.rng.choice(user[2]),
+                    "answer": "bench",
+                    "correct": True,
+                    "latency_ms": 1500,
+                    "answered_at": now,
+                }
+                for _ in range(50)
+            ]
+        )
+
+    def add_word_to_user(self, user):
+        self.added += 1
+        self.db.add_word_to_user(
+            user[0], f"added{self.number}w{self.added}", f"добавлено{self.added}"
+        )
+
+    def delete_word_from_user(self, user):
+        try:
+            word_id = user[2].pop()
+        except IndexError:
+            return False
+        self.db.delete_word_from_user(user[0], word_id)
+
+    def import_words(self, user):
+        self.added += 1
+        pairs = [
+            (f"import{self.number}b{self.added}w{i}", f"импорт{i}") for i in range(50)
+        ]
+        self.db.import_words(user[0], pairs)
+
+    def get_user_words(self, user):
+        self.db.get_user_words(user[0])
+
+    def get_user_default_words(self, user):
+        self.db.get_user_default_words(user[0])
+
+    def get_all_user_words(self, user):
+        self.db.get_all_user_words(user[0])
+
+    def get_words_page(self, user):
+        self.db.get_words_page(user[0])
+
+    def get_picker_page(self, user):
+        prefix = None
+        if self.rng.random() < 0.5:
+            prefix = f"bench{user[1]}w{self.rng.randrange(10)}"
+        self.db.get_picker_page(user[0], prefix)
+
+    def get_word_by_id(self, user):
+        if not user[2]:
+            return False
+        self.db.get_word_by_id(self.rng.choice(user[2]))
+
+    def get_user_word_count(self, user):
+        self.db.get_user_word_count(user[0])
+
+    # Рассылка: пачка пользователей и сохранение хода, как в broadcast.py
+
+    def get_user_batch(self, user):
+        self.db.get_user_batch(user[0], 200)
+
+    def get_broadcast_progress(self, user):
+        self.db.get_broadcast_progress(f"bench:{self.number}")
+
+    def save_broadcast_progress(self, user):
+        self.db.save_broadcast_progress(f"bench:{self.number}", user[0], 200, 0, 0)
+
+    def run(self, deadline):
+        names = list(OPERATIONS)
+        weights = list(OPERATIONS.values())
+        while time.perf_counter() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            user = self.rng.choice(self.users)
+            started = time.perf_counter()
+            try:
+                done = getattr(self, name)(user)
+            except Exception:
+                self.errors[name] += 1
+                continue
+            if done is not False:
+                self.timings[name].append((time.perf_counter() - started) * 1000)
+
+
+# Вес операции в смеси: примерно как часто бот вызывает метод
+OPERATIONS = {
+    "get_next_card": 20,
+    "record_answer": 15,
+    "get_random_words_for_test": 10,
+    "get_or_create_user": 5,
+    "get_or_create_user_id": 5,
+    "get_word_by_id": 5,
+    "get_user_word_count": 5,
+    "get_user_words": 5,
+    "get_words_page": 5,
+    "add_word_to_user": 5,
+    "get_picker_page": 4,
+    "delete_word_from_user": 3,
+    "get_user_default_words": 2,
+    "get_all_user_words": 2,
+    "insert_answer_events": 2,
+    "import_words": 1,
+    "get_user_batch": 1,
+    "get_broadcast_progress": 1,
+    "save_broadcast_progress": 1,
+}
+
+
+def percentile(timings, q):
+    """Перцентиль по ближайшему рангу; timings отсортированы"""
+    return timings[max(0, math.ceil(q * len(timings)) - 1)]
+
+
+def summarize(timings, errors, elapsed):
+    timings.sort()
+    if not timings:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": len(timings),
+        "errors": errors,
+        "ops_per_sec": round(len(timings) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--words", type=int, default=100, help="слов на пользователя")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="без кэша словарей в памяти"
+    )
+    parser.add_argument("--output", help="файл для JSON-отчёта")
+    args = parser.parse_args()
+
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    db = Database(db_url, vocab_cache_size=0 if args.no_cache else 1024)
+    db.create_tables()
+    db.init_default_words()
+
+    # Свой диапазон telegram_id на каждый запуск, чтобы не пересекаться
+    # с данными в постоянной базе; колонка telegram_id — 32-битная
+    base_telegram_id = (int(time.time()) % 100_000) * 10_000
+    started = time.perf_counter()
+    users = seed(db, args.users, args.words, base_telegram_id)
+    seed_seconds = time.perf_counter() - started
+
+    # next() у itertools.count атомарен, счётчик общий для всех потоков
+    ids = itertools.count(base_telegram_id + args.users)
+    workers = [
+        Worker(number, db, users, random.Random(args.seed * 1000 + number), ids)
+        for number in range(args.workers)
+    ]
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker.run, args=(deadline,)) for worker in workers
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {
+        name: summarize(
+            [ms for worker in workers for ms in worker.timings[name]],
+            sum(worker.errors[name] for worker in workers),
+            elapsed,
+        )
+        for name in OPERATIONS
+    }
+    all_timings = [
+        ms
+        for worker in workers
+        for timings in worker.timings.values()
+        for ms in timings
+    ]
+    report = {
+        "commit": git_commit(),
+        "dialect": db.engine.dialect.name,
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "words_per_user": args.words,
+            "workers": args.workers,
+            "duration": args.duration,
+            "seed": args.seed,
+            "vocab_cache": not args.no_cache,
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "total": summarize(
+            all_timings,
+            sum(op["errors"] for op in operations.values()),
+            elapsed,
+        ),
+        "operations": operations,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+    db.engine.dispose()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
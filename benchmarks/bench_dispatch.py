@@ -0,0 +1,166 @@
+"""Стоимость выбора обработчика: цепочка фильтров TeleBot против таблицы маршрутов.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_dispatch.py --messages 20000
+
+Обработчики пустые, сеть и база не используются: замеряется только путь
+обновления через TeleBot до нужной функции. Смесь сообщений — команды,
+кнопки, ответы на карточку и ввод в состояниях. Также считаются чтения
+хранилища состояний на одно обновление.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import TeleBot, custom_filters, types  # noqa: E402
+
+from fake_api import make_message_update  # noqa: E402
+from router import Router  # noqa: E402
+from state_storage import MemoryStateStorage  # noqa: E402
+from views import CANCEL, Command, MyStates  # noqa: E402
+
+
+class CountingStorage(MemoryStateStorage):
+    """Хранилище в памяти со счётчиком чтений состояния"""
+
+    reads = 0
+
+    def get_state(self, chat_id, user_id):
+        self.reads += 1
+        return super().get_state(chat_id, user_id)
+
+
+def noop(message):
+    pass
+
+
+def build_chain_bot():
+    """Регистрация обработчиков, как в main.py до таблицы маршрутов"""
+    storage = CountingStorage()
+    bot = TeleBot("1:BENCH", state_storage=storage, threaded=False)
+    bot.add_custom_filter(custom_filters.StateFilter(bot))
+
+    bot.message_handler(commands=["start", "cards"])(noop)
+    bot.message_handler(commands=["help"])(noop)
+    bot.message_handler(commands=["mywords"])(noop)
+    for text in (
+        Command.NEXT,
+        Command.ADD_WORD,
+        Command.DELETE_WORD,
+        Command.MY_WORDS,
+        Command.HELP,
+    ):
+        bot.message_handler(func=lambda m, text=text: m.text == text)(noop)
+    for state in (
+        MyStates.waiting_for_english,
+        MyStates.waiting_for_russian,
+        MyStates.waiting_for_word_to_delete,
+    ):
+        bot.message_handler(state=state)(noop)
+
+    @bot.message_handler(func=lambda m: True)
+    def fallback(message):
+        current_state = bot.get_state(message.from_user.id, message.chat.id)
+        if current_state in [
+            MyStates.waiting_for_english,
+            MyStates.waiting_for_russian,
+            MyStates.waiting_for_word_to_delete,
+        ]:
+            return
+
+    return bot, storage
+
+
+def build_router_bot():
+    """Регистрация обработчиков, как в main.py сейчас"""
+    storage = CountingStorage()
+    bot = TeleBot("1:BENCH", state_storage=storage, threaded=False)
+    router = Router()
+
+    @bot.message_handler(content_types=["text"])
+    def dispatch(message):
+        state = bot.get_state(message.from_user.id, message.chat.id)
+        handler = router.resolve(message.text, state)
+        if handler is not None:
+            handler(message)
+
+    router.command("start", "cards")(noop)
+    router.command("help")(noop)
+    router.command("mywords")(noop)
+    router.button(
+        Command.NEXT,
+        Command.ADD_WORD,
+        Command.DELETE_WORD,
+        Command.MY_WORDS,
+        Command.HELP,
+    )(noop)
+    router.state(
+        MyStates.waiting_for_english,
+        MyStates.waiting_for_russian,
+        MyStates.waiting_for_word_to_delete,
+    )(noop)
+    router.default(noop)
+
+    return bot, storage
+
+
+def scripted_messages(count):
+    """Сообщения от 100 пользователей в разных состояниях"""
+    states = [
+        MyStates.target_word,
+        MyStates.target_word,
+        MyStates.waiting_for_english,
+        MyStates.waiting_for_russian,
+        MyStates.waiting_for_word_to_delete,
+    ]
+    texts = ["/cards", Command.NEXT, Command.HELP, "cat", "кошка", CANCEL, "dog"]
+
+    messages = []
+    for i in range(count):
+        chat_id = 1 + i % 100
+        update = make_message_update(i + 1, chat_id, texts[i % len(texts)])
+        messages.append(types.Update.de_json(update).message)
+    return messages, {chat_id: states[chat_id % len(states)] for chat_id in range(1, 101)}
+
+
+def measure(build, messages, chat_states, repeat):
+    bot, storage = build()
+    for chat_id, state in chat_states.items():
+        bot.set_state(chat_id, state, chat_id)
+
+    best = None
+    for _ in range(repeat):
+        storage.reads = 0
+        started = time.perf_counter()
+        bot.process_new_messages(messages)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        "us_per_update": round(best / len(messages) * 1e6, 2),
+        "state_reads_per_update": round(storage.reads / len(messages), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages, chat_states = scripted_messages(args.messages)
+    report = {
+        "messages": args.messages,
+        "chain": measure(build_chain_bot, messages, chat_states, args.repeat),
+        "router": measure(build_router_bot, messages, chat_states, args.repeat),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Масштабирование supervisor.py по числу рабочих процессов.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_scaling.py --users 1000 --processes 1,2,4
+    python benchmarks/bench_scaling.py --processes 1,2,4,8 --db-url postgresql://...
+
+Для каждого числа процессов запускаются фейковый Bot API, процесс-супервизор
+с приёмом обновлений (long polling) и рабочие процессы main.py; пользователи
+проходят тот же сценарий, что в e2e_sessions.py. Итог — JSON с
+обновлениями в секунду, ускорением относительно первого варианта и
+эффективностью (ускорение / число процессов). Без --db-url каждый вариант
+получает свою временную SQLite; запись в SQLite идёт под одной
+блокировкой файла на все процессы, поэтому для оценки масштабирования
+нужен PostgreSQL. Ускорение не может превысить число ядер (cpu_count в
+отчёте).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import TeleBot, apihelper  # noqa: E402
+
+from e2e_sessions import Driver  # noqa: E402
+from fake_api import FakeTelegramAPI  # noqa: E402
+
+TOKEN = "123456:FAKE"
+
+
+def run(processes, args, db_url):
+    """Один вариант: processes рабочих процессов, свежий фейковый API"""
+    api = FakeTelegramAPI(latency=args.api_latency).start()
+    apihelper.API_URL = api.api_url
+    apihelper.FILE_URL = api.file_url
+    # Рабочие процессы читают окружение при импорте main.py
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["TELEGRAM_BOT_TOKEN"] = TOKEN
+    os.environ["BOT_MODE"] = "polling"
+    os.environ.setdefault("SEND_RATE", "0")
+    os.environ.setdefault("SEND_CHAT_RATE", "0")
+
+    import supervisor
+
+    supervisor.prepare_database(db_url)
+    pool = supervisor.Supervisor(processes=processes)
+    bot = TeleBot(TOKEN)
+    pool.attach(bot).start()
+    threading.Thread(
+        target=bot.polling,
+        kwargs={"non_stop": True, "timeout": 10, "long_polling_timeout": 1},
+        daemon=True,
+    ).start()
+
+    driver = Driver(api, args.users, args.correct_rate, args.seed)
+    started = time.perf_counter()
+    driver.start()
+    completed = driver.finished.wait(args.timeout)
+    elapsed = time.perf_counter() - started
+
+    bot.stop_polling()
+    pool.close()
+    api.stop()
+    return {
+        "processes": processes,
+        "completed": completed,
+        "unfinished_sessions": driver.active,
+        "updates": driver.updates,
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(driver.updates / elapsed, 1),
+        "routed": [worker["routed"] for worker in pool.stats()],
+        "steps": driver.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--processes", default="1,2,4", help="через запятую")
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument("--correct-rate", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600.0, help="секунд")
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--output", help="файл для JSON-отчёта")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for processes in map(int, args.processes.split(",")):
+            # Процессы ждут блокировку записи SQLite дольше 5 секунд по умолчанию
+            db_url = (
+                args.db_url
+                or f"sqlite:///{tmpdir}/scaling-{processes}.db?timeout=60"
+            )
+            runs.append(run(processes, args, db_url))
+
+    base = runs[0]
+    for result in runs:
+        speedup = result["updates_per_sec"] / base["updates_per_sec"]
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(
+            speedup * base["processes"] / result["processes"], 2
+        )
+
+    report = {
+        "users": args.users,
+        "api_latency": args.api_latency,
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
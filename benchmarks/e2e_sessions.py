@@ -0,0 +1,396 @@
+"""Сквозной замер main.py: сценарии тысяч пользователей против фейкового Bot API.
+
+Запуск из корня проекта:
+
+    python benchmarks/e2e_sessions.py --users 2000
+    python benchmarks/e2e_sessions.py --users 1000 --transport webhook
+    SEND_RATE=30 SEND_CHAT_RATE=1 python benchmarks/e2e_sessions.py --users 200 \
+        --api-rate 30 --api-chat-rate 1
+
+Бот из main.py работает как обычно (long polling или webhook), но вместо
+api.telegram.org обращается к локальному FakeTelegramAPI. Каждый
+пользователь проходит сценарий: /start, ответы на карточки, «Дальше»,
+добавление слова, загрузка CSV-файла со словами и удаление слова через
+inline-список. Следующее сообщение
+пользователь отправляет, когда получил все ответы на предыдущее, поэтому
+одновременно у каждого чата в работе не больше одного обновления.
+
+Для каждого шага (обработчика) считаются задержка до первого ответа бота
+(first) и до последнего ответа шага (done), в миллисекундах. Итог — JSON
+с обновлениями в секунду и перцентилями. База — временная SQLite, если
+не задан --db-url.
+
+С --api-rate и --api-chat-rate фейковый API отвечает 429 сверх заданной
+частоты, как Telegram; ограничения самого бота (SEND_RATE, SEND_CHAT_RATE)
+по умолчанию здесь выключены и задаются переменными окружения.
+"""
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper  # noqa: E402
+
+from database import DEFAULT_WORDS  # noqa: E402
+from fake_api import (  # noqa: E402
+    FakeTelegramAPI,
+    make_callback_update,
+    make_document_update,
+    make_message_update,
+)
+from views import CANCEL, Command  # noqa: E402
+
+FIRST_CHAT_ID = 500_000
+# Кнопки клавиатуры карточки, которые не являются вариантами ответа
+SERVICE_TEXTS = {
+    Command.ADD_WORD,
+    Command.DELETE_WORD,
+    Command.NEXT,
+    Command.MY_WORDS,
+    Command.HELP,
+    CANCEL,
+}
+QUESTION = re.compile(r"🇷🇺 \*(.+?)\*")
+
+
+def answered(expected):
+    """Шаг завершён после expected ответов бота"""
+    return lambda replies: len(replies) >= expected
+
+
+def imported(replies):
+    # Итог загрузки файла; сообщение об ошибке оставляет сессию незавершённой
+    return bool(replies) and (replies[0]["text"] or "").startswith("📥")
+
+
+def answer_done(replies):
+    # Правильный ответ: сообщение «Правильно!» и следующая карточка
+    if not replies:
+        return False
+    if (replies[0]["text"] or "").startswith("✅"):
+        return len(replies) >= 2
+    return True
+
+
+# Сценарий пользователя: (шаг, сообщение, условие завершения). Сообщение —
+# текст или функция от сессии, возвращающая текст, нажатие inline-кнопки
+# ("callback", data, message_id) или файл ("document", имя, содержимое)
+SCRIPT = [
+    ("start", "/start", answered(2)),
+    ("answer", lambda session: session.answer(), answer_done),
+    ("answer", lambda session: session.answer(), answer_done),
+    ("next", Command.NEXT, answered(1)),
+    ("answer", lambda session: session.answer(), answer_done),
+    ("add_word", Command.ADD_WORD, answered(1)),
+    ("add_english", lambda session: session.english, answered(1)),
+    ("add_russian", lambda session: session.russian, answered(2)),
+    ("import", lambda session: session.import_file(), imported),
+    ("delete_word", Command.DELETE_WORD, answered(1)),
+    # Нажатие на слово: answerCallbackQuery, правка списка и новая карточка
+    ("delete_pick", lambda session: session.pick_word(), answered(3)),
+]
+
+
+class Session:
+    """Один пользователь, проходящий SCRIPT"""
+
+    def __init__(self, chat_id, rng, correct_rate, translations):
+        self.chat_id = chat_id
+        self.rng = rng
+        self.correct_rate = correct_rate
+        self.translations = translations
+        self.english = f"e2e word {chat_id}"
+        self.russian = f"слово {chat_id}"
+        self.step = -1
+        self.replies = []
+        self.pushed_at = None
+        self.options = []
+        self.question = None
+        self.inline = None  # (message_id, [(текст, callback_data)])
+
+    def remember(self, reply):
+        """Клавиатуры из ответа бота: варианты карточки и inline-список"""
+        markup = reply["reply_markup"] or {}
+        if "keyboard" in markup:
+            options = [
+                button["text"]
+                for row in markup["keyboard"]
+                for button in row
+                if button["text"] not in SERVICE_TEXTS
+            ]
+            if options:
+                self.options = [option.removeprefix("❌ ") for option in options]
+                match = QUESTION.match(reply["text"] or "")
+                if match:
+                    self.question = match.group(1)
+        if "inline_keyboard" in markup:
+            self.inline = (
+                reply["message_id"],
+                [
+                    (button["text"], button.get("callback_data"))
+                    for row in markup["inline_keyboard"]
+                    for button in row
+                ],
+            )
+
+    def answer(self):
+        """Вариант ответа: правильный с вероятностью correct_rate"""
+        correct = self.translations.get(self.question, ())
+        right = [option for option in self.options if option in correct]
+        wrong = [option for option in self.options if option not in correct]
+        if right and (not wrong or self.rng.random() < self.correct_rate):
+            return self.rng.choice(right)
+        return self.rng.choice(wrong or self.options or ["?"])
+
+    def import_file(self):
+        """CSV из двух слов для загрузки словаря"""
+        content = (
+            f"e2e import {self.chat_id} a,импорт а\n"
+            f"e2e import {self.chat_id} b,импорт б\n"
+        ).encode()
+        return "document", f"words{self.chat_id}.csv", content
+
+    def pick_word(self):
+        """Нажатие на добавленное слово в списке удаления"""
+        message_id, buttons = self.inline
+        for text, data in buttons:
+            if text.startswith(self.english) and data.startswith("delete:word:"):
+                return "callback", data, message_id
+        return "callback", "delete:cancel", message_id
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу; values отсортированы"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize(values):
+    values.sort()
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "max": round(values[-1], 2),
+    }
+
+
+class Driver:
+    """Ведёт сессии по ответам бота: ответ в чат продвигает его сценарий"""
+
+    def __init__(self, api, users, correct_rate, seed):
+        self.api = api
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.update_ids = itertools.count(1)
+        self.translations = {}
+        for word in DEFAULT_WORDS:
+            self.translations.setdefault(word["russian"], set()).add(word["english"])
+
+        self.sessions = {
+            FIRST_CHAT_ID + i: Session(
+                FIRST_CHAT_ID + i,
+                random.Random(seed * 1_000_003 + i),
+                correct_rate,
+                self.translations,
+            )
+            for i in range(users)
+        }
+        for session in self.sessions.values():
+            self.translations.setdefault(session.russian, set()).add(session.english)
+
+        self.active = len(self.sessions)
+        self.updates = 0
+        self.first = {name: [] for name, _, _ in SCRIPT}
+        self.done = {name: [] for name, _, _ in SCRIPT}
+        api.on_reply = self.on_reply
+
+    def start(self):
+        with self.lock:
+            updates = [self._advance(session) for session in self.sessions.values()]
+            self.api.push_updates(updates)
+
+    def on_reply(self, chat_id, reply):
+        # Обновления отдаются API под self.lock в порядке update_id: getUpdates
+        # сдвигает смещение, и обновление с меньшим id потерялось бы
+        with self.lock:
+            session = self.sessions.get(chat_id)
+            if session is None or session.pushed_at is None:
+                return
+            session.replies.append(reply)
+            session.remember(reply)
+
+            name, _, complete = SCRIPT[session.step]
+            if len(session.replies) == 1:
+                self.first[name].append((reply["time"] - session.pushed_at) * 1000)
+            if not complete(session.replies):
+                return
+            self.done[name].append((reply["time"] - session.pushed_at) * 1000)
+
+            if session.step + 1 < len(SCRIPT):
+                self.api.push_updates([self._advance(session)])
+            else:
+                session.pushed_at = None
+                self.active -= 1
+                if not self.active:
+                    self.finished.set()
+
+    def _advance(self, session):
+        """Следующее сообщение сессии (под self.lock)"""
+        session.step += 1
+        session.replies = []
+        _, message, _ = SCRIPT[session.step]
+        if callable(message):
+            message = message(session)
+
+        update_id = next(self.update_ids)
+        self.updates += 1
+        session.pushed_at = time.monotonic()
+        if isinstance(message, tuple) and message[0] == "document":
+            _, file_name, content = message
+            file_id = self.api.add_file(content)
+            return make_document_update(
+                update_id, session.chat_id, file_id, file_name, len(content)
+            )
+        if isinstance(message, tuple):
+            _, data, message_id = message
+            return make_callback_update(update_id, session.chat_id, message_id, data)
+        return make_message_update(update_id, session.chat_id, message)
+
+    def report(self):
+        with self.lock:
+            return {
+                name: {
+                    "count": len(self.done[name]),
+                    "first_ms": summarize(self.first[name]),
+                    "done_ms": summarize(self.done[name]),
+                }
+                for name in self.first
+            }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_main(db_url, transport):
+    """Импорт main.py с переменными окружения для фейкового API"""
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:FAKE"
+    # Ограничения отправки бота — только если заданы явно (SEND_RATE и т. д.)
+    os.environ.setdefault("SEND_RATE", "0")
+    os.environ.setdefault("SEND_CHAT_RATE", "0")
+    if transport == "webhook":
+        port = free_port()
+        os.environ["WEBHOOK_HOST"] = "127.0.0.1"
+        os.environ["WEBHOOK_PORT"] = str(port)
+        os.environ["WEBHOOK_URL"] = f"http://127.0.0.1:{port}/webhook"
+        os.environ["WEBHOOK_SECRET"] = "e2e-secret"
+    return importlib.import_module("main")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument(
+        "--transport", choices=("polling", "webhook"), default="polling"
+    )
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--api-rate", type=float, default=0, help="429 сверх стольких сообщений в секунду"
+    )
+    parser.add_argument(
+        "--api-chat-rate", type=float, default=0, help="429 сверх стольких в чат"
+    )
+    parser.add_argument("--api-chat-burst", type=int, default=3)
+    parser.add_argument("--correct-rate", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600.0, help="секунд")
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(
+        latency=args.api_latency,
+        rate=args.api_rate,
+        chat_rate=args.api_chat_rate,
+        chat_burst=args.api_chat_burst,
+    ).start()
+    apihelper.API_URL = api.api_url
+    apihelper.FILE_URL = api.file_url
+
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'e2e.db')}"
+
+    bot_main = load_main(db_url, args.transport)
+    bot_main.db.create_tables()
+    bot_main.db.init_default_words()
+
+    if args.transport == "webhook":
+        target = bot_main.run_webhook
+        kwargs = {}
+    else:
+        # Тот же цикл, что у infinity_polling в main.py
+        target = bot_main.bot.polling
+        kwargs = {"non_stop": True, "timeout": 10, "long_polling_timeout": 1}
+    threading.Thread(target=target, kwargs=kwargs, daemon=True).start()
+    if args.transport == "webhook":
+        # Бот сам вызывает setWebhook при запуске
+        deadline = time.monotonic() + 10
+        while api.webhook_url is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    driver = Driver(api, args.users, args.correct_rate, args.seed)
+    started = time.perf_counter()
+    driver.start()
+    completed = driver.finished.wait(args.timeout)
+    elapsed = time.perf_counter() - started
+
+    if args.transport == "polling":
+        bot_main.bot.stop_polling()
+    bot_main.chat_workers.close()
+    if bot_main.outbound is not None:
+        bot_main.outbound.close()
+    bot_main.answer_log.close()
+
+    report = {
+        "transport": args.transport,
+        "users": args.users,
+        "api_latency": args.api_latency,
+        "completed": completed,
+        "unfinished_sessions": driver.active,
+        "updates": driver.updates,
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(driver.updates / elapsed, 1),
+        "api_calls": dict(api.calls),
+        "api_throttled": dict(api.throttled),
+        "outbound": bot_main.outbound.stats() if bot_main.outbound else None,
+        "db_pool": bot_main.db.pool_stats(),
+        "chat_workers": bot_main.chat_workers.stats(),
+        "steps": driver.report(),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    api.stop()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Планы запросов и время выполнения с индексами схемы и без них.
+
+Запуск из корня проекта:
+
+    python benchmarks/explain_indexes.py
+    python benchmarks/explain_indexes.py --db-url postgresql://... --users 50 --words 2000
+
+Без --db-url используется временная база SQLite. Для каждого горячего
+запроса печатается план (EXPLAIN QUERY PLAN / EXPLAIN ANALYZE), признак
+использования ожидаемого индекса и среднее время выполнения; затем индексы
+удаляются и замер повторяется.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import false, select, text  # noqa: E402
+
+from bench_card_selection import seed_user  # noqa: E402
+from database import Base, Database, UserWord, Word  # noqa: E402
+
+
+def hot_queries(db, user_id, word):
+    """Запросы Database, которые должны обслуживаться индексами"""
+    active = (UserWord.user_id == user_id, UserWord.deleted == false())
+    return [
+        (
+            "поиск слова (add_word_to_user)",
+            "uq_words_english_russian",
+            select(Word).where(Word.english == word.english, Word.russian == word.russian),
+        ),
+        (
+            "связь пользователь-слово",
+            "uq_user_words_user_id_word_id",
+            select(UserWord).where(
+                UserWord.user_id == user_id, UserWord.word_id == word.id
+            ),
+        ),
+        (
+            "случайные номера карточки",
+            "ix_user_words_position",
+            select(UserWord.word_id).where(*active, UserWord.position.in_([1, 2, 3])),
+        ),
+        (
+            "поиск удаляемого слова по началу",
+            "ix_user_words_english",
+            db._picker_page_statement(user_id, word.english[:-1]),
+        ),
+        (
+            "видимые слова по умолчанию",
+            "ix_words_default",
+            db._user_words_select(user_id, is_default=True),
+        ),
+    ]
+
+
+def explain(conn, sql):
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).all()
+        return "\n".join(row[0] for row in rows)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def run(db, user_id, word, repeat):
+    with db.engine.connect() as conn:
+        for title, index_name, stmt in hot_queries(db, user_id, word):
+            sql = str(
+                stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+            )
+            plan = explain(conn, sql)
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(text(sql)).all()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            uses_index = "да" if index_name in plan else "нет"
+            print(f"\n== {title}: {statistics.fmean(timings):.3f} мс")
+            print(f"   индекс {index_name} в плане: {uses_index}")
+            print("   " + plan.replace("\n", "\n   "))
+
+
+def set_indexes(db, enabled):
+    with db.engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if enabled:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--words", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    db = Database(db_url)
+    db.create_tables()
+    db.init_default_words()
+
+    base_telegram_id = int(time.time())
+    user_ids = [seed_user(db, base_telegram_id + i, args.words) for i in range(args.users)]
+    user_id = user_ids[len(user_ids) // 2]
+
+    session = db.Session()
+    try:
+        word = (
+            session.query(Word).join(UserWord).filter(UserWord.user_id == user_id).first()
+        )
+    finally:
+        session.close()
+
+    try:
+        for enabled in (True, False):
+            set_indexes(db, enabled)
+            print(f"\n######## индексы {'включены' if enabled else 'удалены'} ########")
+            run(db, user_id, word, args.repeat)
+    finally:
+        set_indexes(db, True)
+        db.engine.dispose()
+        if tmpdir:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов.
+
+Сервер отвечает на вызовы бота по адресу http://127.0.0.1:<port>/bot<token>/<method>
+и записывает отправленные сообщения. Бот направляется на него через API_URL:
+
+    api = FakeTelegramAPI(latency=0.05).start()
+    telebot.apihelper.API_URL = api.api_url
+    telebot.apihelper.FILE_URL = api.file_url
+    telebot.asyncio_helper.API_URL = api.api_url
+
+Обновления из push_updates бот забирает через getUpdates, а после
+setWebhook они, как у Telegram, отправляются POST-запросами на адрес
+webhook (getUpdates тогда отвечает 409). Файлы из add_file бот получает
+через getFile и скачивает по FILE_URL.
+"""
+import itertools
+import json
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qsl, urlsplit
+from urllib.request import Request, urlopen
+
+from outbound import TokenBucket
+from webhook import SECRET_HEADER
+
+
+def make_message_update(update_id, chat_id, text):
+    """Обновление с текстовым сообщением от пользователя chat_id в личном чате"""
+    user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def make_document_update(update_id, chat_id, file_id, file_name, file_size):
+    """Обновление с файлом, отправленным пользователем chat_id в личном чате"""
+    user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "document": {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_name": file_name,
+                "file_size": file_size,
+            },
+        },
+    }
+
+
+def make_callback_update(update_id, chat_id, message_id, data):
+    """Обновление с нажатием inline-кнопки под сообщением бота message_id"""
+    user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "",
+            },
+        },
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными пакетами; без TCP_NODELAY каждый
+    # ответ ждал бы отложенного подтверждения (~40 мс)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params.update(json.loads(body))
+            else:
+                params.update(parse_qsl(body))
+        return url.path, params
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path, params = self._params()
+        if path.startswith("/file/"):
+            self._send_file(path.rsplit("/", 1)[-1])
+            return
+        method = path.rsplit("/", 1)[-1]
+        status, payload = self.server.api.handle(method, params)
+        self._reply(status, payload)
+
+    do_POST = do_GET
+
+    def _send_file(self, name):
+        content = self.server.api.files.get(name.split(".", 1)[0])
+        if content is None:
+            self._reply(404, {"ok": False, "error_code": 404})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeTelegramAPI:
+    """Минимальный Bot API: getMe, getUpdates, setWebhook, sendMessage,
+    правка сообщений, ответы на нажатия inline-кнопок и служебные вызовы
+
+    latency — задержка ответа на вызовы, отправляющие сообщения (имитация
+    сети). on_reply(chat_id, reply) вызывается после каждого ответа бота в
+    чат; reply — словарь с method, text, reply_markup и time (monotonic).
+
+    rate и chat_rate — ограничения Telegram на отправку и правку сообщений
+    (в секунду всего и в один чат, всплеск до chat_burst); сверх них API
+    отвечает 429 с retry_after, как настоящий. 0 — без ограничения.
+    """
+
+    # Вызовы, которые бот делает в ответ пользователю
+    REPLY_METHODS = (
+        "sendMessage",
+        "editMessageText",
+        "editMessageReplyMarkup",
+        "answerCallbackQuery",
+    )
+
+    # Вызовы, на которые действуют ограничения частоты
+    LIMITED_METHODS = ("sendMessage", "editMessageText", "editMessageReplyMarkup")
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        webhook_connections=40,
+        rate=0,
+        chat_rate=0,
+        chat_burst=3,
+    ):
+        self.latency = latency
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global_bucket = TokenBucket(rate, rate) if rate else None
+        self._chat_buckets = {}
+        self.throttled = {}  # ответы 429 по методам
+        self.webhook_connections = webhook_connections
+        self.server = _Server((host, port), _Handler)
+        self.server.api = self
+        self._thread = None
+
+        self._lock = threading.Condition()
+        self._updates = []
+        self._message_ids = itertools.count(1)
+        self._callback_chats = {}  # id нажатия -> chat_id для answerCallbackQuery
+        self.sent = []  # (chat_id, text, время отправки)
+        self.files = {}  # file_id -> содержимое для getFile и скачивания
+        self._file_ids = itertools.count(1)
+        self.calls = {}
+        self.on_reply = None
+
+        self.webhook_url = None
+        self.webhook_secret = None
+        self._deliveries = queue.Queue()
+        self._delivery_threads = []
+
+    @property
+    def api_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    @property
+    def file_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/file/bot{{0}}/{{1}}"
+
+    def add_file(self, content):
+        """Файл, который бот сможет скачать; возвращает file_id"""
+        with self._lock:
+            file_id = f"file{next(self._file_ids)}"
+            self.files[file_id] = content
+        return file_id
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        for _ in self._delivery_threads:
+            self._deliveries.put(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def push_updates(self, updates):
+        """Обновления для бота: через getUpdates или на webhook, если он задан"""
+        with self._lock:
+            for update in updates:
+                call = update.get("callback_query")
+                if call:
+                    self._callback_chats[call["id"]] = call["message"]["chat"]["id"]
+            if self.webhook_url is None:
+                self._updates.extend(updates)
+                self._lock.notify_all()
+                return
+        for update in updates:
+            self._deliveries.put(update)
+
+    def reset(self):
+        with self._lock:
+            self._updates.clear()
+            self._callback_chats.clear()
+            self.sent.clear()
+            self.calls.clear()
+            self.throttled.clear()
+            self._chat_buckets.clear()
+            self.files.clear()
+
+    def wait_for_messages(self, count, timeout=60):
+        """Ожидание count отправленных ботом сообщений; True, если дождались"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def handle(self, method, params):
+        """Ответ на вызов method: (HTTP-статус, JSON)"""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == "getMe":
+            return 200, {
+                "ok": True,
+                "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"},
+            }
+
+        if method == "getUpdates":
+            if self.webhook_url is not None:
+                return 409, {
+                    "ok": False,
+                    "error_code": 409,
+                    "description": "Conflict: can't use getUpdates method "
+                    "while webhook is active",
+                }
+            return 200, {"ok": True, "result": self._get_updates(params)}
+
+        if method == "getFile":
+            file_id = params.get("file_id")
+            content = self.files.get(file_id)
+            if content is None:
+                return 400, {
+                    "ok": False,
+                    "error_code": 400,
+                    "description": "Bad Request: invalid file_id",
+                }
+            return 200, {
+                "ok": True,
+                "result": {
+                    "file_id": file_id,
+                    "file_unique_id": file_id,
+                    "file_size": len(content),
+                    "file_path": f"documents/{file_id}.csv",
+                },
+            }
+
+        if method == "setWebhook":
+            self._set_webhook(params.get("url") or None, params.get("secret_token"))
+            return 200, {"ok": True, "result": True}
+
+        if method == "deleteWebhook":
+            self._set_webhook(None, None)
+            return 200, {"ok": True, "result": True}
+
+        if method == "getWebhookInfo":
+            return 200, {
+                "ok": True,
+                "result": {
+                    "url": self.webhook_url or "",
+                    "has_custom_certificate": False,
+                    "pending_update_count": self._deliveries.qsize(),
+                },
+            }
+
+        if method in self.REPLY_METHODS:
+            retry_after = self._throttle(method, params)
+            if retry_after:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                }
+            return 200, {"ok": True, "result": self._reply(method, params)}
+
+        return 200, {"ok": True, "result": True}
+
+    def _throttle(self, method, params):
+        """Секунды retry_after, если вызов превышает ограничения; иначе 0"""
+        if method not in self.LIMITED_METHODS:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            buckets = []
+            if self._global_bucket is not None:
+                buckets.append(self._global_bucket)
+            if self.chat_rate:
+                chat_id = int(params["chat_id"])
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+                    self._chat_buckets[chat_id] = bucket
+                buckets.append(bucket)
+
+            wait = max((bucket.wait_time(now) for bucket in buckets), default=0)
+            if wait:
+                self.throttled[method] = self.throttled.get(method, 0) + 1
+                return max(1, math.ceil(wait))
+            for bucket in buckets:
+                bucket.take(now)
+            return 0
+
+    def _reply(self, method, params):
+        """Запись ответа бота; результат вызова для Bot API"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        markup = params.get("reply_markup")
+        reply = {
+            "method": method,
+            "text": params.get("text"),
+            "reply_markup": json.loads(markup) if isinstance(markup, str) else markup,
+            "time": time.monotonic(),
+        }
+
+        with self._lock:
+            if method == "answerCallbackQuery":
+                chat_id = self._callback_chats.pop(params["callback_query_id"], None)
+            else:
+                chat_id = int(params["chat_id"])
+            if method == "sendMessage":
+                message_id = next(self._message_ids)
+                self.sent.append((chat_id, reply["text"], reply["time"]))
+                self._lock.notify_all()
+            else:
+                message_id = int(params.get("message_id") or 0)
+
+        reply["message_id"] = message_id
+        if self.on_reply is not None and chat_id is not None:
+            self.on_reply(chat_id, reply)
+
+        if method == "answerCallbackQuery":
+            return True
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": reply["text"] or "",
+        }
+
+    def _set_webhook(self, url, secret):
+        with self._lock:
+            self.webhook_url = url
+            self.webhook_secret = secret
+            # Как у Telegram: накопленные для getUpdates обновления уходят на webhook
+            pending, self._updates = self._updates, []
+        if url is None:
+            return
+
+        while len(self._delivery_threads) < self.webhook_connections:
+            thread = threading.Thread(target=self._deliver, daemon=True)
+            thread.start()
+            self._delivery_threads.append(thread)
+        for update in pending:
+            self._deliveries.put(update)
+
+    def _deliver(self):
+        """Доставка обновлений на webhook; при ошибке — повтор, как у Telegram"""
+        while True:
+            update = self._deliveries.get()
+            if update is None:
+                return
+            while not self._post(update):
+                time.sleep(0.05)
+
+    def _post(self, update):
+        url = self.webhook_url
+        if url is None:
+            # webhook сняли — обновление снова ждёт getUpdates
+            self.push_updates([update])
+            return True
+
+        request = Request(
+            url,
+            data=json.dumps(update).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if self.webhook_secret:
+            request.add_header(SECRET_HEADER, self.webhook_secret)
+        try:
+            with urlopen(request, timeout=10) as response:
+                return response.status == 200
+        except (HTTPError, URLError, OSError):
+            return False
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = min(float(params.get("timeout") or 0), 1.0)
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            while True:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                if self._updates or time.monotonic() >= deadline:
+                    return self._updates[:limit]
+                self._lock.wait(deadline - time.monotonic())
@@ -0,0 +1,119 @@
+"""Пропускная способность потокового (main.py) и асинхронного (async_main.py) бота.
+
+Запуск из корня проекта:
+
+    python benchmarks/loadtest_runtime.py --users 200 --messages 5 --api-latency 0.05
+
+Оба варианта получают одинаковые обновления (/cards и «⏭ Дальше» от каждого
+пользователя) и отвечают локальному фейковому Bot API с заданной задержкой.
+Замеряется время до получения API всех ответов. База — временная SQLite.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper, asyncio_helper, types  # noqa: E402
+
+from fake_api import FakeTelegramAPI, make_message_update  # noqa: E402
+from views import Command  # noqa: E402
+
+
+def scripted_updates(users, messages):
+    """По messages сообщений от каждого пользователя, каждое даёт один ответ"""
+    updates = []
+    update_id = 1
+    for step in range(messages):
+        text = "/cards" if step == 0 else Command.NEXT
+        for chat_id in range(1, users + 1):
+            updates.append(make_message_update(update_id, 100_000 + chat_id, text))
+            update_id += 1
+    return updates
+
+
+def load_bot_module(name, db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:FAKE"
+    os.environ.setdefault("SEND_RATE", "0")
+    os.environ.setdefault("SEND_CHAT_RATE", "0")
+    return importlib.import_module(name)
+
+
+def run_threaded(api, updates, expected, db_path):
+    main = load_bot_module("main", db_path)
+    main.db.create_tables()
+    main.db.init_default_words()
+
+    started = time.perf_counter()
+    for update in updates:
+        main.bot.process_new_updates([types.Update.de_json(update)])
+    completed = api.wait_for_messages(expected)
+    elapsed = time.perf_counter() - started
+
+    main.chat_workers.close()
+    if main.outbound is not None:
+        main.outbound.close()
+    return elapsed, completed
+
+
+def run_async(api, updates, expected, db_path):
+    async_main = load_bot_module("async_main", db_path)
+
+    async def scenario():
+        await async_main.db.create_tables()
+        await async_main.db.init_default_words()
+
+        started = time.perf_counter()
+        await async_main.bot.process_new_updates(
+            [types.Update.de_json(update) for update in updates]
+        )
+        completed = await asyncio.to_thread(api.wait_for_messages, expected)
+        elapsed = time.perf_counter() - started
+
+        await asyncio_helper.session_manager.session.close()
+        await async_main.db.engine.dispose()
+        return elapsed, completed
+
+    return asyncio.run(scenario())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--modes", default="threaded,async")
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(latency=args.api_latency).start()
+    apihelper.API_URL = api.api_url
+    asyncio_helper.API_URL = api.api_url
+
+    updates = scripted_updates(args.users, args.messages)
+    expected = len(updates)
+    runners = {"threaded": run_threaded, "async": run_async}
+
+    report = {"users": args.users, "updates": expected, "api_latency": args.api_latency}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode in args.modes.split(","):
+            api.reset()
+            db_path = os.path.join(tmpdir, f"{mode}.db")
+            elapsed, completed = runners[mode](api, updates, expected, db_path)
+            report[mode] = {
+                "seconds": round(elapsed, 3),
+                "updates_per_sec": round(expected / elapsed, 1),
+                "completed": completed,
+            }
+
+    api.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Отправка записанных обновлений на webhook бота.
+
+Запуск из корня проекта (бот запущен с BOT_MODE=webhook):
+
+    python benchmarks/post_updates.py updates.jsonl --url http://127.0.0.1:8443/webhook --secret s3cr3t
+    python benchmarks/post_updates.py --generate 1000 --url http://127.0.0.1:8443/webhook
+
+Файл содержит обновления Telegram в формате JSON: массив или по одному на
+строку. Без файла --generate N создаёт N обновлений «⏭ Дальше» от разных
+пользователей.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_api import make_message_update  # noqa: E402
+from views import Command  # noqa: E402
+from webhook import SECRET_HEADER  # noqa: E402
+
+
+def load_updates(path):
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def post(url, secret, update):
+    request = Request(
+        url,
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    if secret:
+        request.add_header(SECRET_HEADER, secret)
+    try:
+        with urlopen(request, timeout=10) as response:
+            return response.status
+    except HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/webhook")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET"))
+    parser.add_argument("--generate", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.file:
+        updates = load_updates(args.file)
+    else:
+        updates = [
+            make_message_update(i + 1, 200_000 + i, Command.NEXT)
+            for i in range(args.generate)
+        ]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        statuses = Counter(
+            pool.map(lambda update: post(args.url, args.secret, update), updates)
+        )
+    elapsed = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {
+                "updates": len(updates),
+                "seconds": round(elapsed, 3),
+                "updates_per_sec": round(len(updates) / elapsed, 1) if elapsed else None,
+                "statuses": dict(statuses),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from outbound import TokenBucket
+
+
+# Рассылка по всем пользователям с продолжением после падения
+class Broadcast:
+    """Рассылка сообщения каждому пользователю из таблицы users.
+
+    Пользователи читаются пачками по batch_size по возрастанию id
+    (Database.get_user_batch), поэтому таблица не загружается в память
+    целиком. Для каждого пользователя вызывается send(user_id, telegram_id,
+    done): он готовит и отправляет сообщение, возможно в другом потоке, и
+    по итогу вызывает done(True) — отправлено, done(False) — ошибка или
+    done(None) — пользователь пропущен. Рассылка обходит не больше rate
+    пользователей в секунду (0 — без ограничения) и ждёт, если без итога
+    остаётся max_pending сообщений.
+
+    После каждой пачки, когда все её сообщения отправлены или отброшены,
+    ход рассылки сохраняется в broadcast_runs. Повторный run() с тем же
+    именем продолжает с пользователя после последней сохранённой пачки, а
+    для завершённой рассылки ничего не делает; после падения сообщения
+    последней пачки могут прийти повторно.
+    """
+
+    def __init__(self, db, send, batch_size=200, rate=20, max_pending=100):
+        self.db = db
+        self.send = send
+        self.batch_size = batch_size
+        self.rate = rate
+        self.max_pending = max_pending
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._run_lock = threading.Lock()
+        self.running = None  # имя идущей рассылки
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.last_user_id = 0
+
+    def run(self, name):
+        """Рассылка name до конца; отчёт со скоростью отправки"""
+        with self._run_lock:
+            progress = self.db.get_broadcast_progress(name)
+            if progress is not None and progress.finished_at is not None:
+                return None
+            if progress is None:
+                self.last_user_id = self.sent = self.failed = self.skipped = 0
+            else:
+                self.last_user_id = progress.last_user_id
+                self.sent = progress.sent
+                self.failed = progress.failed
+                self.skipped = progress.skipped
+            resumed_from = self.last_user_id
+            sent_before = self.sent
+            self.running = name
+            started = time.perf_counter()
+            try:
+                self._run(name)
+            finally:
+                self.running = None
+            elapsed = time.perf_counter() - started
+            sent = self.sent - sent_before
+            return {
+                "name": name,
+                "resumed_from": resumed_from,
+                "sent": self.sent,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "seconds": round(elapsed, 3),
+                "messages_per_sec": round(sent / elapsed, 1) if elapsed else 0.0,
+            }
+
+    def _run(self, name):
+        bucket = TokenBucket(self.rate, 1) if self.rate else None
+        while True:
+            batch = self.db.get_user_batch(self.last_user_id, self.batch_size)
+            if not batch:
+                break
+            for user_id, telegram_id in batch:
+                if bucket is not None:
+                    wait = bucket.wait_time(time.monotonic())
+                    if wait:
+                        time.sleep(wait)
+                    bucket.take(time.monotonic())
+                with self._cond:
+                    while self._in_flight >= self.max_pending:
+                        self._cond.wait()
+                    self._in_flight += 1
+                try:
+                    self.send(user_id, telegram_id, self._done)
+                except Exception as e:
+                    print(f"Ошибка рассылки пользователю {user_id}: {e}")
+                    self._done(False)
+
+            # Пачка сохраняется, только когда у всех её сообщений есть итог
+            with self._cond:
+                while self._in_flight:
+                    self._cond.wait()
+            self.last_user_id = batch[-1][0]
+            self._save(name)
+        self._save(name, finished=True)
+
+    def _done(self, delivered):
+        with self._cond:
+            if delivered is None:
+                self.skipped += 1
+            elif delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _save(self, name, finished=False):
+        self.db.save_broadcast_progress(
+            name, self.last_user_id, self.sent, self.failed, self.skipped, finished
+        )
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": int(self.running is not None),
+                "in_flight": self._in_flight,
+                "sent": self.sent,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "last_user_id": self.last_user_id,
+            }
+
+
+def start_daily(at, job):
+    """Поток, вызывающий job(date) каждый день в at (строка ЧЧ:ММ).
+
+    Если сегодняшнее время уже прошло, job вызывается сразу: рассылка,
+    прерванная перезапуском, продолжается, а завершённая не повторяется.
+    """
+    hour, minute = map(int, at.split(":"))
+
+    def loop():
+        day = date.today()
+        while True:
+            when = datetime.combine(day, datetime.min.time()).replace(
+                hour=hour, minute=minute
+            )
+            delay = (when - datetime.now()).total_seconds()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                report = job(day)
+                if report is not None:
+                    print(f"Рассылка завершена: {report}")
+            except Exception as e:
+                print(f"Ошибка рассылки: {e}")
+            day = max(day + timedelta(days=1), date.today())
+
+    thread = threading.Thread(target=loop, name="broadcast", daemon=True)
+    thread.start()
+    return thread
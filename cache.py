@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Ограниченный по размеру кэш в памяти процесса
+class LRUCache:
+    """LRU-кэш с ограничением числа записей и временем жизни (ttl, секунды).
+
+    Потокобезопасен: обработчики TeleBot выполняются в пуле потоков.
+    maxsize=0 отключает кэш — get всегда возвращает промах. С weight
+    (функция значения -> вес) ограничен и суммарный вес записей: при
+    превышении maxweight вытесняются самые давно использованные, а
+    значение тяжелее maxweight не сохраняется.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, maxweight=None, weight=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weight = weight
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Получение значения; обновляет позицию записи в LRU-порядке"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value, weight = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._weight -= weight
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Сохранение значения с вытеснением самых давно использованных записей"""
+        if self.maxsize <= 0:
+            return
+
+        weight = self.weight(value) if self.weight is not None else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._weight -= old[2]
+            if self.maxweight is not None and weight > self.maxweight:
+                return
+            self._data[key] = (expires_at, value, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self._weight > self.maxweight
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._weight -= evicted
+                self.evictions += 1
+
+    def pop(self, key):
+        """Удаление записи (инвалидация)"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._weight -= item[2]
+        return item[1] if item is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def stats(self):
+        """Счётчики попаданий, промахов и вытеснений; вес — при заданном weight"""
+        with self._lock:
+            stats = {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+            if self.weight is not None:
+                stats["weight"] = self._weight
+                stats["maxweight"] = self.maxweight
+            return stats
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+
+# Метка остановки в очереди потока
+_STOP = object()
+
+
+def chat_key(update):
+    """Чат обновления: по нему выбирается поток, а значит и порядок обработки"""
+    for name in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        message = getattr(update, name, None)
+        if message is not None:
+            return message.chat.id
+
+    call = update.callback_query
+    if call is not None:
+        if call.message is not None:
+            return call.message.chat.id
+        return call.from_user.id
+
+    for name in ("my_chat_member", "chat_member", "chat_join_request"):
+        member = getattr(update, name, None)
+        if member is not None:
+            return member.chat.id
+
+    # Обновления без чата (inline-запросы и т. п.) упорядочивать не нужно
+    return update.update_id
+
+
+class _Call:
+    __slots__ = ("chat_id", "fn")
+
+    def __init__(self, chat_id, fn):
+        self.chat_id = chat_id
+        self.fn = fn
+
+
+class _Shard:
+    __slots__ = ("queue", "thread", "processed", "errors", "wait_sum", "wait_max")
+
+    def __init__(self, max_pending):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.processed = 0
+        self.errors = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+
+# Пул потоков, в котором обновления одного чата идут строго по очереди
+class ChatWorkerPool:
+    """Обработка обновлений TeleBot в workers потоках с разбиением по чатам.
+
+    Поток выбирается по chat.id % workers, у каждого потока своя очередь,
+    поэтому обновления одного чата обрабатываются по одному и в порядке
+    поступления (двойное нажатие «Дальше» не гоняется за retrieve_data),
+    а разные чаты распределяются по всем потокам.
+
+    Пул подменяет bot.process_new_updates: long polling и webhook кладут
+    обновления в очереди, а потоки вызывают исходный метод. В очереди
+    потока ждёт не больше max_pending обновлений; при заполнении polling
+    ждёт, а submit(block=False) возвращает False. submit_call() ставит в
+    ту же очередь свою функцию, которая выполняется по порядку с
+    обновлениями чата (например, рассылка, меняющая состояние диалога).
+    """
+
+    def __init__(self, bot, workers=8, max_pending=1000, metrics=None):
+        self.bot = bot
+        self._process = bot.process_new_updates
+        self._shards = [_Shard(max_pending) for _ in range(workers)]
+        self._lock = threading.Lock()
+
+        # Обработчики выполняются в потоках пула, а не в пуле TeleBot
+        bot.threaded = False
+        bot.process_new_updates = self.process_new_updates
+
+        self._wait_seconds = None
+        if metrics is not None:
+            self._wait_seconds = metrics.histogram(
+                "chat_shard_wait_seconds", "Ожидание обновления в очереди", "shard"
+            )
+            metrics.gauge(
+                "chat_shard_queue_depth",
+                "Обновлений в очереди потока",
+                "shard",
+                lambda: {i: s.queue.qsize() for i, s in enumerate(self._shards)},
+            )
+            metrics.gauge(
+                "chat_shard_processed",
+                "Обработано обновлений потоком",
+                "shard",
+                lambda: {i: s.processed for i, s in enumerate(self._shards)},
+            )
+        self.metrics = metrics
+
+        for number, shard in enumerate(self._shards):
+            shard.thread = threading.Thread(
+                target=self._run,
+                args=(number, shard),
+                name=f"chat-worker-{number}",
+                daemon=True,
+            )
+            shard.thread.start()
+
+    def submit(self, update, block=True):
+        """Постановка обновления в очередь его чата; False, если очередь полна"""
+        shard = self._shards[chat_key(update) % len(self._shards)]
+        try:
+            shard.queue.put((time.perf_counter(), update), block=block)
+        except queue.Full:
+            return False
+        return True
+
+    def submit_call(self, chat_id, fn, block=True):
+        """fn() в потоке чата chat_id после уже поставленных обновлений"""
+        shard = self._shards[chat_id % len(self._shards)]
+        try:
+            shard.queue.put((time.perf_counter(), _Call(chat_id, fn)), block=block)
+        except queue.Full:
+            return False
+        return True
+
+    def process_new_updates(self, updates):
+        """Замена bot.process_new_updates: раскладка обновлений по очередям"""
+        for update in updates:
+            self.submit(update)
+            # Смещение getUpdates сдвигается сразу, иначе long polling
+            # получил бы ещё не обработанные обновления повторно
+            with self._lock:
+                if update.update_id > self.bot.last_update_id:
+                    self.bot.last_update_id = update.update_id
+
+    def _run(self, number, shard):
+        while True:
+            item = shard.queue.get()
+            if item is _STOP:
+                return
+            enqueued_at, update = item
+
+            wait = time.perf_counter() - enqueued_at
+            shard.wait_sum += wait
+            shard.wait_max = max(shard.wait_max, wait)
+            if self._wait_seconds is not None:
+                self.metrics.observe(self._wait_seconds, number, wait)
+
+            try:
+                if isinstance(update, _Call):
+                    update.fn()
+                else:
+                    self._process([update])
+            except Exception as e:
+                shard.errors += 1
+                if isinstance(update, _Call):
+                    print(f"Ошибка в задаче чата {update.chat_id}: {e}")
+                else:
+                    print(f"Ошибка при обработке обновления {update.update_id}: {e}")
+            shard.processed += 1
+
+    def depth(self):
+        """Обновлений во всех очередях"""
+        return sum(shard.queue.qsize() for shard in self._shards)
+
+    def stats(self):
+        """Очередь, обработанные обновления и ожидание по каждому потоку"""
+        return [
+            {
+                "shard": number,
+                "queue_depth": shard.queue.qsize(),
+                "processed": shard.processed,
+                "errors": shard.errors,
+                "wait_avg_ms": (
+                    round(shard.wait_sum / shard.processed * 1000, 3)
+                    if shard.processed
+                    else 0
+                ),
+                "wait_max_ms": round(shard.wait_max * 1000, 3),
+            }
+            for number, shard in enumerate(self._shards)
+        ]
+
+    def close(self, timeout=None):
+        """Обработка уже поставленных обновлений и остановка потоков"""
+        for shard in self._shards:
+            shard.queue.put(_STOP)
+        for shard in self._shards:
+            shard.thread.join(timeout)
@@ -1,19 +1,93 @@
+import random
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
+    BigInteger,
     Integer,
     String,
+    Text,
     ForeignKey,
     Boolean,
+    DateTime,
+    Float,
+    Index,
+    and_,
+    case,
     false,
+    or_,
     true,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    union_all,
+    update,
 )
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.orm import (
+    Session,
+    declarative_base,
+    object_session,
+    relationship,
+    sessionmaker,
+)
+from sqlalchemy.pool import QueuePool
+
+import scheduler
+from cache import LRUCache
+from word_import import batched
 
 Base = declarative_base()
 
+# Ход рассылки из broadcast_runs (см. Database.get_broadcast_progress)
+BroadcastProgress = namedtuple(
+    "BroadcastProgress", ["last_user_id", "sent", "failed", "skipped", "finished_at"]
+)
+
+# Лёгкое представление слова для списков и карточек (без ORM-сессии)
+WordEntry = namedtuple("WordEntry", ["id", "english", "russian", "is_default"])
+
+# Страница списка слов пользователя и число его слов (см. Database.get_words_page)
+WordsPage = namedtuple(
+    "WordsPage", ["words", "default_count", "custom_count", "has_prev", "has_next"]
+)
+# Страница собственных слов пользователя для выбора удаляемого слова
+PickerPage = namedtuple("PickerPage", ["words", "has_prev", "has_next"])
+
+# Слова по умолчанию, видимые всем пользователям
+DEFAULT_WORDS = [
+    {"english": "red", "russian": "красный"},
+    {"english": "blue", "russian": "синий"},
+    {"english": "green", "russian": "зеленый"},
+    {"english": "yellow", "russian": "желтый"},
+    {"english": "black", "russian": "черный"},
+    {"english": "I", "russian": "я"},
+    {"english": "you", "russian": "ты"},
+    {"english": "he", "russian": "он"},
+    {"english": "she", "russian": "она"},
+    {"english": "it", "russian": "оно"},
+    {"english": "hello", "russian": "привет"},
+    {"english": "goodbye", "russian": "до свидания"},
+    {"english": "thank you", "russian": "спасибо"},
+    {"english": "please", "russian": "пожалуйста"},
+    {"english": "sorry", "russian": "извините"},
+]
+
+# Метка в кэше словарей: словарь слишком велик, чтобы держать его в памяти
+_OVERSIZED = object()
+
+
+def _vocabulary_words(vocabulary):
+    """Вес записи кэша словарей — число слов (метка _OVERSIZED весит одно)"""
+    return 1 if vocabulary is _OVERSIZED else len(vocabulary)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -23,7 +97,10 @@ class User(Base):
     username = Column(String(100))
     first_name = Column(String(100))
     last_name = Column(String(100))
-    created_at = Column(String, default=lambda: datetime.now().isoformat())
+    created_at = Column(DateTime, default=datetime.now)
+    # Число активных собственных слов; ведут add_word_to_user,
+    # delete_word_from_user и import_words, заполняет migrate_db.py
+    custom_word_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Связи
     user_words = relationship(
@@ -32,7 +109,25 @@ class User(Base):
 
     @hybrid_property
     def total_words(self):
-        return len([uw for uw in self.user_words if not uw.deleted])
+        """Число активных связей пользователя — COUNT в БД, без загрузки связей
+
+        У объекта вне сессии (например, из get_or_create_user) берётся
+        счётчик custom_word_count: активные связи есть только у собственных
+        слов.
+        """
+        session = object_session(self)
+        if session is None:
+            return self.custom_word_count
+        return session.scalar(select(User.total_words).where(User.id == self.id))
+
+    @total_words.expression
+    def total_words(cls):
+        return (
+            select(func.count(UserWord.id))
+            .where(UserWord.user_id == cls.id, UserWord.deleted == false())
+            .correlate_except(UserWord)
+            .scalar_subquery()
+        )
 
 
 class Word(Base):
@@ -45,6 +140,18 @@ class Word(Base):
         Boolean, default=False
     )  # слова по умолчанию для всех пользователей
 
+    __table_args__ = (
+        # Поиск слова при добавлении (add_word_to_user) и защита от дублей
+        Index("uq_words_english_russian", "english", "russian", unique=True),
+        # Список слов по умолчанию — небольшая часть таблицы
+        Index(
+            "ix_words_default",
+            "id",
+            postgresql_where=is_default == true(),
+            sqlite_where=is_default == true(),
+        ),
+    )
+
     # Связи
     user_words = relationship("UserWord", back_populates="word")
 
@@ -57,18 +164,771 @@ class UserWord(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     word_id = Column(Integer, ForeignKey("words.id"), nullable=False)
     deleted = Column(Boolean, default=False)
-    added_at = Column(String, default=lambda: datetime.now().isoformat())
+    added_at = Column(DateTime, default=datetime.now)
+    # Номер активного собственного слова у пользователя: 1..custom_word_count
+    # без пропусков (NULL у удалённых связей); ведут add_word_to_user,
+    # delete_word_from_user и import_words, заполняет migrate_db.py
+    position = Column(Integer)
+    # Копия words.english для поиска по началу слова среди слов пользователя;
+    # слова не переименовываются, поэтому копия не расходится с оригиналом
+    english = Column(String(100))
+
+    __table_args__ = (
+        # Одна связь на пару пользователь-слово; также ищет скрытые слова по умолчанию
+        Index("uq_user_words_user_id_word_id", "user_id", "word_id", unique=True),
+        # Активные слова пользователя по номеру (выборка карточки по
+        # случайным номерам, см. get_random_words_for_test)
+        Index(
+            "ix_user_words_position",
+            "user_id",
+            "position",
+            postgresql_where=deleted == false(),
+            sqlite_where=deleted == false(),
+        ),
+        # Активные слова пользователя по алфавиту (поиск удаляемого слова по
+        # началу, см. get_picker_page)
+        Index(
+            "ix_user_words_english",
+            "user_id",
+            "english",
+            "word_id",
+            postgresql_where=deleted == false(),
+            sqlite_where=deleted == false(),
+        ),
+    )
 
     # Связи
     user = relationship("User", back_populates="user_words")
     word = relationship("Word", back_populates="user_words")
 
 
+# Расписание повторения слова пользователем (SM-2, см. scheduler.py).
+# Отдельная таблица: у слов по умолчанию нет строк в user_words
+class WordSchedule(Base):
+    __tablename__ = "word_schedules"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    word_id = Column(Integer, ForeignKey("words.id"), primary_key=True)
+    interval = Column(Integer, nullable=False, default=0)  # дней
+    ease = Column(Float, nullable=False, default=scheduler.INITIAL_EASE)
+    repetitions = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Очередь повторения: ближайшее слово пользователя — первая запись
+        Index("ix_word_schedules_due", "user_id", "due_at"),
+    )
+
+
+# Ответ на карточку (журнал для аналитики, пишется пачками, см. answer_log.py)
+class AnswerEvent(Base):
+    __tablename__ = "answer_events"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    word_id = Column(Integer, ForeignKey("words.id"))
+    answer = Column(String(100), nullable=False)
+    correct = Column(Boolean, nullable=False)
+    latency_ms = Column(Integer)  # от показа карточки до ответа
+    answered_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+# Состояние диалога (FSM) пользователя в чате, см. state_storage.py
+class ChatState(Base):
+    __tablename__ = "chat_states"
+
+    chat_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    state = Column(String(100))
+    data = Column(Text, nullable=False, default="{}")  # JSON
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+# Ход рассылки по пользователям (см. broadcast.py): после падения рассылка
+# продолжается с пользователя после last_user_id
+class BroadcastRun(Base):
+    __tablename__ = "broadcast_runs"
+
+    name = Column(String(100), primary_key=True)  # например, daily:2026-10-17
+    last_user_id = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = Column(DateTime)
+
+
+class _UpdateSession(Session):
+    """Общая сессия обновления, привязанная к одному соединению из пула.
+
+    Методы Database закрывают сессию в finally; здесь close() только
+    отсоединяет объекты и завершает незакрытую транзакцию, как это сделала
+    бы отдельная сессия, а соединение остаётся у обновления до finish().
+    """
+
+    def close(self):
+        self.expunge_all()
+        if self.in_transaction():
+            self.rollback()
+
+    def finish(self):
+        connection = self.bind
+        super().close()
+        connection.close()
+
+
+# Общая часть Database и AsyncDatabase: кэши и построение запросов без I/O
+class _DatabaseQueries:
+    """Кэши и построители запросов, общие для Database и AsyncDatabase.
+
+    Методы не обращаются к базе сами (кроме тех, что получают сессию
+    аргументом), поэтому подходят обоим движкам. Наследник создаёт
+    self.engine и вызывает _init_caches.
+    """
+
+    # Минимальное число собственных слов для выборки карточки по случайным
+    # номерам; маленькие словари дешевле просмотреть целиком
+    BOUNDED_MIN_WORDS = 256
+
+    def _init_caches(
+        self,
+        vocab_cache_size,
+        vocab_cache_ttl,
+        vocab_cache_max_words,
+        vocab_cache_total_words,
+        user_id_cache_size,
+    ):
+        # Кэш активных слов пользователя: user_id -> кортеж WordEntry; память
+        # ограничена суммарным числом слов (около 300 байт на слово)
+        self.vocab_cache = LRUCache(
+            maxsize=vocab_cache_size,
+            ttl=vocab_cache_ttl,
+            maxweight=vocab_cache_total_words,
+            weight=_vocabulary_words,
+        )
+        self.vocab_cache_max_words = vocab_cache_max_words
+        self._vocab_lock = threading.Lock()
+        self._vocab_invalidations = 0
+
+        # telegram_id -> users.id; пользователи не удаляются, поэтому без ttl
+        self.user_id_cache = LRUCache(maxsize=user_id_cache_size)
+
+    def _dialect_insert(self, model):
+        """INSERT с поддержкой ON CONFLICT для текущего диалекта (или None)"""
+        dialects = {"postgresql": postgresql, "sqlite": sqlite}
+        dialect = dialects.get(self.engine.dialect.name)
+        return dialect.insert(model) if dialect else None
+
+    def _upsert_user_statement(self, telegram_id, username, first_name, last_name):
+        """INSERT ... ON CONFLICT (telegram_id) DO NOTHING RETURNING id (или None)"""
+        stmt = self._dialect_insert(User)
+        if stmt is None:
+            return None
+
+        return (
+            stmt.values(
+                telegram_id=telegram_id,
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+            )
+            .on_conflict_do_nothing(index_elements=["telegram_id"])
+            .returning(User.id)
+        )
+
+    def _vocabulary_statement(self, user_id):
+        """Запрос словаря для кэша (на одну строку больше лимита)"""
+        words = self._user_words_select(user_id).subquery()
+        return (
+            select(words).order_by(words.c.id).limit(self.vocab_cache_max_words + 1)
+        )
+
+    def _store_vocabulary(self, user_id, rows, invalidations):
+        """Сохранение загруженного словаря в кэш"""
+        if len(rows) > self.vocab_cache_max_words:
+            vocabulary = _OVERSIZED
+        else:
+            vocabulary = tuple(WordEntry(*row) for row in rows)
+
+        # Не сохраняем результат, если словари менялись во время загрузки
+        with self._vocab_lock:
+            if invalidations == self._vocab_invalidations:
+                self.vocab_cache.set(user_id, vocabulary)
+
+        return vocabulary if vocabulary is not _OVERSIZED else None
+
+    def _invalidate_vocabulary(self, user_id):
+        """Сброс кэша словаря пользователя после изменения"""
+        with self._vocab_lock:
+            self._vocab_invalidations += 1
+            self.vocab_cache.pop(user_id)
+
+    def _user_words_select(self, user_id, include_deleted=False, is_default=None):
+        """SELECT слов пользователя: слова по умолчанию и собственные слова
+
+        Слова по умолчанию видны всем пользователям, кроме скрытых —
+        для них в user_words есть запись с deleted = true.
+        """
+        columns = (Word.id, Word.english, Word.russian, Word.is_default)
+        parts = []
+
+        if is_default is not False:
+            defaults = select(*columns).where(Word.is_default == true())
+            if not include_deleted:
+                hidden = select(UserWord.id).where(
+                    UserWord.user_id == user_id,
+                    UserWord.word_id == Word.id,
+                    UserWord.deleted == true(),
+                )
+                defaults = defaults.where(~hidden.exists())
+            parts.append(defaults)
+
+        if is_default is not True:
+            custom = (
+                select(*columns)
+                .join(UserWord)
+                .where(UserWord.user_id == user_id, Word.is_default == false())
+            )
+            if not include_deleted:
+                custom = custom.where(UserWord.deleted == false())
+            parts.append(custom)
+
+        return union_all(*parts) if len(parts) > 1 else parts[0]
+
+    def _words_page_statement(self, user_id, after=None, before=None, size=10):
+        """Страница слов пользователя по id слова и число слов — одним запросом.
+
+        Постраничный вывод по ключу: after — следующая страница (id > after),
+        before — предыдущая (id < before, в обратном порядке). Каждая часть
+        UNION ограничена size + 1 строками по индексу, лишняя строка
+        показывает, есть ли ещё страница. Число собственных слов берётся из
+        счётчика users.custom_word_count. Числа присоединяются к странице,
+        поэтому пустая страница тоже возвращает одну строку.
+        """
+        descending = before is not None
+
+        def keyset(query, column):
+            if after is not None:
+                query = query.where(column > after)
+            if before is not None:
+                query = query.where(column < before)
+            order = column.desc() if descending else column
+            return query.order_by(order).limit(size + 1).subquery()
+
+        defaults = keyset(self._user_words_select(user_id, is_default=True), Word.id)
+        custom = keyset(
+            self._user_words_select(user_id, is_default=False), UserWord.word_id
+        )
+        page = union_all(select(defaults), select(custom)).subquery()
+
+        counts = select(
+            select(func.count())
+            .select_from(self._user_words_select(user_id, is_default=True).subquery())
+            .scalar_subquery()
+            .label("default_count"),
+            self._word_count_statement(user_id)
+            .scalar_subquery()
+            .label("custom_count"),
+        ).subquery()
+
+        order = page.c.id.desc() if descending else page.c.id
+        return (
+            select(
+                counts.c.default_count,
+                counts.c.custom_count,
+                page.c.id,
+                page.c.english,
+                page.c.russian,
+                page.c.is_default,
+            )
+            .select_from(counts.outerjoin(page, true()))
+            .order_by(order)
+            .limit(size + 1)
+        )
+
+    @staticmethod
+    def _words_page(rows, after, before, size):
+        """WordsPage из строк _words_page_statement"""
+        default_count, custom_count = rows[0][:2]
+        words = [WordEntry(*row[2:]) for row in rows if row.id is not None]
+        more = len(words) > size
+        words = words[:size]
+
+        if before is not None:
+            words.reverse()
+            return WordsPage(words, default_count, custom_count, more, True)
+        return WordsPage(words, default_count, custom_count, after is not None, more)
+
+    def _picker_page_statement(
+        self, user_id, prefix=None, after=None, before=None, size=8
+    ):
+        """Страница собственных слов пользователя, при prefix — по началу слова.
+
+        Без prefix порядок по id слова (индекс user_words по user_id, word_id),
+        с prefix — по (english, id слова): диапазон индекса ix_user_words_english
+        от (user_id, prefix) до (user_id, prefix + U+10FFFF), поэтому слова
+        других пользователей не просматриваются. Курсор — id слова на границе
+        страницы; его english подставляется подзапросом, поэтому в
+        callback_data хватает id. Выбирается size + 1 строк, как в
+        _words_page_statement.
+        """
+        descending = before is not None
+        cursor = after if after is not None else before
+
+        if prefix:
+            prefix = prefix.lower().strip()
+            query = (
+                select(Word.id, Word.english, Word.russian, Word.is_default)
+                .join(UserWord, UserWord.word_id == Word.id)
+                .where(
+                    UserWord.user_id == user_id,
+                    UserWord.deleted == false(),
+                    UserWord.english >= prefix,
+                    UserWord.english < prefix + "\U0010ffff",
+                    UserWord.english.startswith(prefix, autoescape=True),
+                    Word.is_default == false(),
+                )
+            )
+            key = (UserWord.english, UserWord.word_id)
+            if cursor is not None:
+                cursor_key = tuple_(
+                    select(Word.english).where(Word.id == cursor).scalar_subquery(),
+                    cursor,
+                )
+                position = tuple_(*key)
+                query = query.where(
+                    position < cursor_key if descending else position > cursor_key
+                )
+        else:
+            query = self._user_words_select(user_id, is_default=False)
+            key = (UserWord.word_id,)
+            if after is not None:
+                query = query.where(UserWord.word_id > after)
+            if before is not None:
+                query = query.where(UserWord.word_id < before)
+
+        order = [column.desc() for column in key] if descending else key
+        return query.order_by(*order).limit(size + 1)
+
+    @staticmethod
+    def _picker_page(rows, after, before, size):
+        """PickerPage из строк _picker_page_statement"""
+        words = [WordEntry(*row) for row in rows]
+        more = len(words) > size
+        words = words[:size]
+
+        if before is not None:
+            words.reverse()
+            return PickerPage(words, more, True)
+        return PickerPage(words, after is not None, more)
+
+    @classmethod
+    def _next_due_statement(cls, user_id, now):
+        """Слово пользователя с самым ранним наступившим сроком повторения
+
+        Удалённые и скрытые слова пропускаются: их расписание могло
+        остаться, например, после ответа с устаревшим кэшем словаря.
+        """
+        return (
+            select(Word.id, Word.english, Word.russian, Word.is_default)
+            .join(WordSchedule, WordSchedule.word_id == Word.id)
+            .where(
+                WordSchedule.user_id == user_id,
+                WordSchedule.due_at <= now,
+                cls._word_visible(user_id),
+            )
+            .order_by(WordSchedule.due_at)
+            .limit(1)
+        )
+
+    @staticmethod
+    def _word_visible(user_id):
+        """Условие на Word: слово есть в словаре пользователя
+
+        Слово по умолчанию — если не скрыто, собственное — если связь
+        в user_words не удалена (как в _user_words_select).
+        """
+        link = select(UserWord.id).where(
+            UserWord.user_id == user_id, UserWord.word_id == Word.id
+        )
+        return or_(
+            and_(
+                Word.is_default == true(),
+                ~link.where(UserWord.deleted == true()).exists(),
+            ),
+            and_(
+                Word.is_default == false(),
+                link.where(UserWord.deleted == false()).exists(),
+            ),
+        )
+
+    @staticmethod
+    def _with_due_word(due_word, all_words, count):
+        """Карточка со словом из очереди и случайными вариантами ответа"""
+        options = [w for w in all_words if w.id != due_word.id][: count - 1]
+        options.append(due_word)
+        random.shuffle(options)
+        return due_word, options
+
+    @classmethod
+    def _visible_word_statement(cls, user_id, word_id):
+        """Строка, если слово word_id есть в словаре пользователя"""
+        return select(Word.id).where(Word.id == word_id, cls._word_visible(user_id))
+
+    @staticmethod
+    def _apply_review(schedule, correct, now):
+        """Обновление расписания слова после ответа"""
+        result = scheduler.review(
+            schedule.interval, schedule.ease, schedule.repetitions, correct, now
+        )
+        schedule.interval = result.interval
+        schedule.ease = result.ease
+        schedule.repetitions = result.repetitions
+        schedule.due_at = result.due_at
+        return result
+
+    def _bounded_probe_statement(self, user_id, total, count):
+        """Слова с count * 2 случайными номерами и видимые слова по умолчанию"""
+        positions = random.sample(range(1, total + 1), min(count * 2, total))
+        probes = select(UserWord.word_id).where(
+            UserWord.user_id == user_id,
+            UserWord.deleted == false(),
+            UserWord.position.in_(positions),
+        )
+        defaults = self._user_words_select(user_id, is_default=True).subquery()
+        word_ids = union_all(probes, select(defaults.c.id))
+        return select(Word.id, Word.english, Word.russian, Word.is_default).where(
+            Word.id.in_(word_ids)
+        )
+
+    def _pick_bounded(self, words, total, count):
+        """Сборка карточки из найденных слов с учётом доли слов по умолчанию"""
+        default_words = [w for w in words if w.is_default]
+        custom_words = [w for w in words if not w.is_default]
+
+        share = len(default_words) / (len(default_words) + total)
+        n_defaults = min(
+            sum(random.random() < share for _ in range(count)), len(default_words)
+        )
+        if len(custom_words) < count - n_defaults:
+            return None
+
+        all_words = random.sample(default_words, n_defaults) + random.sample(
+            custom_words, count - n_defaults
+        )
+        random.shuffle(all_words)
+
+        return random.choice(all_words), all_words
+
+    @staticmethod
+    def _pick_card(words, count):
+        """Случайные варианты ответа и правильный ответ среди них"""
+        all_words = random.sample(words, count)
+        return random.choice(all_words), all_words
+
+    def _get_default_words_for_test(self, session, count=4):
+        """Получение слов по умолчанию для теста"""
+        default_words = [
+            WordEntry(*row)
+            for row in session.query(
+                Word.id, Word.english, Word.russian, Word.is_default
+            ).filter_by(is_default=True)
+        ]
+
+        if len(default_words) < count:
+            # Если вообще нет слов, возвращаем тестовые
+            test_words = [
+                WordEntry(None, "hello", "привет", True),
+                WordEntry(None, "goodbye", "до свидания", True),
+                WordEntry(None, "thank you", "спасибо", True),
+                WordEntry(None, "please", "пожалуйста", True),
+            ]
+            target_word = test_words[0]
+            return target_word, test_words
+
+        target_word = random.choice(default_words)
+        other_words = [w for w in default_words if w.id != target_word.id]
+        other_words = random.sample(other_words, count - 1)
+
+        all_words = [target_word] + other_words
+        random.shuffle(all_words)
+
+        return target_word, all_words
+
+    @staticmethod
+    def new_import_stats():
+        return {"added": 0, "restored": 0, "duplicates": 0, "skipped": 0}
+
+    @staticmethod
+    def _import_keys(batch, stats):
+        """Нормализованные пары пачки без повторов внутри неё"""
+        keys = list(
+            dict.fromkeys(
+                (english.lower().strip(), russian.lower().strip())
+                for english, russian in batch
+            )
+        )
+        stats["duplicates"] += len(batch) - len(keys)
+        return keys
+
+    @staticmethod
+    def _words_by_keys_statement(keys):
+        return select(Word.id, Word.english, Word.russian, Word.is_default).where(
+            tuple_(Word.english, Word.russian).in_(keys)
+        )
+
+    def _insert_words_statement(self, keys):
+        """INSERT недостающих слов; при гонке с другим импортом дубли пропускаются"""
+        values = [
+            {"english": english, "russian": russian, "is_default": False}
+            for english, russian in keys
+        ]
+        stmt = self._dialect_insert(Word)
+        if stmt is None:
+            return insert(Word).values(values)
+        return stmt.values(values).on_conflict_do_nothing(
+            index_elements=["english", "russian"]
+        )
+
+    @staticmethod
+    def _user_links_statement(user_id, word_ids):
+        return select(UserWord.word_id, UserWord.deleted).where(
+            UserWord.user_id == user_id, UserWord.word_id.in_(word_ids)
+        )
+
+    def _import_statements(self, user_id, words, links, stats):
+        """Запросы, добавляющие слова пачки пользователю (правила add_word_to_user)"""
+        added, restored, unhidden = [], [], []
+        for word in words:
+            deleted = links.get(word.id)
+            if word.is_default:
+                # Слово по умолчанию видно, если его не скрыли
+                if deleted:
+                    unhidden.append(word.id)
+                else:
+                    stats["duplicates"] += 1
+            elif deleted is None:
+                added.append(word)
+            elif deleted:
+                restored.append(word.id)
+            else:
+                stats["duplicates"] += 1
+
+        stats["added"] += len(added)
+        stats["restored"] += len(restored) + len(unhidden)
+
+        # Счётчик увеличивается первым; новые связи получают последние номера
+        # по порядку: добавленные, затем восстановленные
+        new_count = len(added) + len(restored)
+        position = self._word_position(user_id)
+        statements = []
+        if new_count:
+            statements.append(self._word_count_update(user_id, new_count))
+        if added:
+            values = [
+                {
+                    "user_id": user_id,
+                    "word_id": word.id,
+                    "english": word.english,
+                    "deleted": False,
+                    "position": position - (new_count - 1 - i),
+                }
+                for i, word in enumerate(added)
+            ]
+            stmt = self._dialect_insert(UserWord)
+            if stmt is None:
+                statements.append(insert(UserWord).values(values))
+            else:
+                statements.append(
+                    stmt.values(values).on_conflict_do_nothing(
+                        index_elements=["user_id", "word_id"]
+                    )
+                )
+        if restored:
+            statements.append(
+                update(UserWord)
+                .where(UserWord.user_id == user_id, UserWord.word_id.in_(restored))
+                .values(
+                    deleted=False,
+                    position=position
+                    - case(
+                        {
+                            word_id: len(restored) - 1 - i
+                            for i, word_id in enumerate(restored)
+                        },
+                        value=UserWord.word_id,
+                    ),
+                )
+            )
+        if unhidden:
+            statements.append(
+                delete(UserWord).where(
+                    UserWord.user_id == user_id, UserWord.word_id.in_(unhidden)
+                )
+            )
+        return statements
+
+    @staticmethod
+    def _delete_schedule_statement(user_id, word_id):
+        return delete(WordSchedule).where(
+            WordSchedule.user_id == user_id, WordSchedule.word_id == word_id
+        )
+
+    @staticmethod
+    def _word_count_statement(user_id):
+        return select(User.custom_word_count).where(User.id == user_id)
+
+    @staticmethod
+    def _word_count_update(user_id, delta):
+        """Изменение счётчика собственных слов в той же транзакции, что и связь"""
+        return (
+            update(User)
+            .where(User.id == user_id)
+            .values(custom_word_count=User.custom_word_count + delta)
+        )
+
+    @staticmethod
+    def _word_position(user_id):
+        """Номер последнего собственного слова — значение счётчика в транзакции
+
+        Вычисляется после _word_count_update той же транзакции: счётчик уже
+        учитывает добавляемые слова и заблокирован до коммита.
+        """
+        return (
+            select(User.custom_word_count).where(User.id == user_id).scalar_subquery()
+        )
+
+    @staticmethod
+    def _fill_position_statement(user_id, position):
+        """Перенос последнего слова на освободившийся номер после уменьшения счётчика"""
+        return (
+            update(UserWord)
+            .where(
+                UserWord.user_id == user_id,
+                UserWord.deleted == false(),
+                UserWord.position
+                == select(User.custom_word_count + 1)
+                .where(User.id == user_id)
+                .scalar_subquery(),
+            )
+            .values(position=position)
+        )
+
+
 # Класс для работы с базой данных
-class Database:
-    def __init__(self, db_url):
-        self.engine = create_engine(db_url)
-        self.Session = sessionmaker(bind=self.engine)
+class Database(_DatabaseQueries):
+    def __init__(
+        self,
+        db_url,
+        vocab_cache_size=1024,
+        vocab_cache_ttl=300,
+        vocab_cache_max_words=5000,
+        vocab_cache_total_words=100_000,
+        user_id_cache_size=100_000,
+        pool_size=None,
+        max_overflow=None,
+        pool_timeout=None,
+        pool_recycle=-1,
+        pool_pre_ping=False,
+    ):
+        # Параметры пула, не заданные явно, остаются по умолчанию SQLAlchemy
+        # (для SQLite в памяти размер пула не настраивается)
+        options = {"pool_recycle": pool_recycle, "pool_pre_ping": pool_pre_ping}
+        for name, value in (
+            ("pool_size", pool_size),
+            ("max_overflow", max_overflow),
+            ("pool_timeout", pool_timeout),
+        ):
+            if value is not None:
+                options[name] = value
+        self.engine = create_engine(db_url, **options)
+        self._session_factory = sessionmaker(bind=self.engine)
+        # Внутри unit_of_work() возвращает общую сессию обновления
+        self.Session = self._session
+        self._unit = threading.local()
+
+        # Счётчики пула: выдачи и возвраты соединений, новые соединения,
+        # соединения, признанные негодными (в том числе pre-ping)
+        self._pool_lock = threading.Lock()
+        self._pool_counts = {
+            "checkouts": 0,
+            "checkins": 0,
+            "connects": 0,
+            "invalidations": 0,
+        }
+        for name, key in (
+            ("checkout", "checkouts"),
+            ("checkin", "checkins"),
+            ("connect", "connects"),
+            ("invalidate", "invalidations"),
+        ):
+            event.listen(self.engine, name, self._pool_counter(key))
+
+        self._init_caches(
+            vocab_cache_size,
+            vocab_cache_ttl,
+            vocab_cache_max_words,
+            vocab_cache_total_words,
+            user_id_cache_size,
+        )
+
+    def _pool_counter(self, key):
+        def count(*args):
+            with self._pool_lock:
+                self._pool_counts[key] += 1
+
+        return count
+
+    def _session(self):
+        if not getattr(self._unit, "units", 0):
+            return self._session_factory()
+        if self._unit.session is None:
+            self._unit.session = _UpdateSession(bind=self.engine.connect())
+        return self._unit.session
+
+    @contextmanager
+    def unit_of_work(self):
+        """Одна сессия и одно соединение из пула на все вызовы Database в блоке
+
+        Соединение берётся из пула при первом обращении к базе и
+        возвращается при выходе из блока. Каждый метод по-прежнему сам
+        фиксирует свою транзакцию. Вложенный блок использует внешнюю сессию.
+        """
+        self._unit.units = getattr(self._unit, "units", 0) + 1
+        if self._unit.units == 1:
+            self._unit.session = None
+            self._unit.memo = {}
+        try:
+            yield
+        finally:
+            self._unit.units -= 1
+            if not self._unit.units:
+                self._unit.memo = None
+                if self._unit.session is not None:
+                    session, self._unit.session = self._unit.session, None
+                    session.finish()
+
+    def unit_cache(self):
+        """Словарь, живущий до конца внешнего unit_of_work(); None вне блока
+
+        Для значений, которые можно переиспользовать в пределах одного
+        обновления, но не между обновлениями и процессами.
+        """
+        if not getattr(self._unit, "units", 0):
+            return None
+        return self._unit.memo
+
+    def pool_stats(self):
+        """Счётчики пула соединений и текущая занятость (для QueuePool)"""
+        with self._pool_lock:
+            stats = dict(self._pool_counts)
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            stats["size"] = pool.size()
+            stats["checked_out"] = pool.checkedout()
+            stats["overflow"] = pool.overflow()
+        return stats
 
     def create_tables(self):
         """Создание всех таблиц в БД"""
@@ -78,24 +938,7 @@ class Database:
     def init_default_words(self):
         """Инициализация базовых слов по умолчанию"""
         session = self.Session()
-
-        default_words = [
-            {"english": "red", "russian": "красный"},
-            {"english": "blue", "russian": "синий"},
-            {"english": "green", "russian": "зеленый"},
-            {"english": "yellow", "russian": "желтый"},
-            {"english": "black", "russian": "черный"},
-            {"english": "I", "russian": "я"},
-            {"english": "you", "russian": "ты"},
-            {"english": "he", "russian": "он"},
-            {"english": "she", "russian": "она"},
-            {"english": "it", "russian": "оно"},
-            {"english": "hello", "russian": "привет"},
-            {"english": "goodbye", "russian": "до свидания"},
-            {"english": "thank you", "russian": "спасибо"},
-            {"english": "please", "russian": "пожалуйста"},
-            {"english": "sorry", "russian": "извините"},
-        ]
+        default_words = DEFAULT_WORDS
 
         try:
             # Проверяем, есть ли уже слова по умолчанию
@@ -137,152 +980,347 @@ class Database:
                 session.commit()
                 session.refresh(user)
 
-                # Добавляем слова по умолчанию новому пользователю
-                self._add_default_words_to_user(user.id)
-
+            self.user_id_cache.set(telegram_id, user.id)
             return user
         finally:
             session.close()
 
-    def _add_default_words_to_user(self, user_id):
-        """Добавление слов по умолчанию пользователю"""
+    def get_or_create_user_id(
+        self, telegram_id, username=None, first_name=None, last_name=None
+    ):
+        """Получение id пользователя по telegram_id с созданием при необходимости
+
+        Вернувшийся пользователь обслуживается из кэша без обращения к БД.
+        Новый пользователь создаётся одним INSERT ... ON CONFLICT (telegram_id),
+        который безопасен при одновременных запросах из нескольких потоков.
+        Слова по умолчанию новому пользователю не копируются — они видны
+        всем пользователям автоматически.
+        """
+        user_id = self.user_id_cache.get(telegram_id)
+        if user_id is not None:
+            return user_id
+
+        stmt = self._upsert_user_statement(
+            telegram_id, username, first_name, last_name
+        )
+        if stmt is None:
+            return self.get_or_create_user(
+                telegram_id, username, first_name, last_name
+            ).id
+
         session = self.Session()
         try:
-            # Получаем все слова по умолчанию
-            default_words = session.query(Word).filter_by(is_default=True).all()
-
-            # Добавляем их пользователю
-            for word in default_words:
-                user_word = UserWord(user_id=user_id, word_id=word.id, deleted=False)
-                session.add(user_word)
-
+            user_id = session.execute(stmt).scalar()
+            if user_id is None:
+                # Пользователь уже есть (или создан параллельным запросом)
+                user_id = session.execute(
+                    select(User.id).where(User.telegram_id == telegram_id)
+                ).scalar_one()
             session.commit()
+        except Exception:
+            session.rollback()
+            raise
         finally:
             session.close()
 
-    def get_user_words(self, user_id, include_deleted=False, include_default=False):
-        """Получение слов пользователя"""
+        self.user_id_cache.set(telegram_id, user_id)
+        return user_id
+
+    def compact_default_words(self):
+        """Удаление скопированных связей со словами по умолчанию
+
+        Слова по умолчанию видны всем пользователям без записей в user_words;
+        там остаются только скрытые (deleted) слова по умолчанию. Старые
+        активные копии больше не нужны.
+        """
         session = self.Session()
         try:
-            query = (
-                session.query(Word).join(UserWord).filter(UserWord.user_id == user_id)
+            result = session.execute(
+                delete(UserWord).where(
+                    UserWord.deleted == false(),
+                    UserWord.word_id.in_(select(Word.id).where(Word.is_default == true())),
+                )
             )
+            session.commit()
+            if result.rowcount:
+                print(f"Удалено {result.rowcount} копий слов по умолчанию")
+        except Exception as e:
+            session.rollback()
+            print(f"Ошибка при очистке копий слов по умолчанию: {e}")
+        finally:
+            session.close()
 
-            if not include_deleted:
-                query = query.filter(UserWord.deleted == false())
+    def _get_vocabulary(self, user_id):
+        """Активные слова пользователя из кэша (кортеж WordEntry).
 
-            # По умолчанию возвращаем только НЕ дефолтные слова
-            if not include_default:
-                query = query.filter(Word.is_default == false())
+        При промахе словарь загружается одним запросом. Возвращает None,
+        если слов больше vocab_cache_max_words — такие словари не кэшируются.
+        """
+        if self.vocab_cache.maxsize <= 0:
+            return None
 
-            return query.all()
-        finally:
-            session.close()
+        vocabulary = self.vocab_cache.get(user_id)
+        if vocabulary is _OVERSIZED:
+            return None
+        if vocabulary is not None:
+            return vocabulary
 
-    def get_user_default_words(self, user_id, include_deleted=False):
-        """Получение только дефолтных слов пользователя"""
+        invalidations = self._vocab_invalidations
         session = self.Session()
         try:
-            query = (
-                session.query(Word)
-                .join(UserWord)
-                .filter(UserWord.user_id == user_id, Word.is_default == true())
-            )
+            rows = session.execute(self._vocabulary_statement(user_id)).all()
+        finally:
+            session.close()
 
-            if not include_deleted:
-                query = query.filter(UserWord.deleted == false())
+        return self._store_vocabulary(user_id, rows, invalidations)
 
-            return query.all()
+    def _query_user_words(self, user_id, include_deleted=False, is_default=None):
+        """Загрузка слов пользователя из БД в виде WordEntry"""
+        session = self.Session()
+        try:
+            words = self._user_words_select(
+                user_id, include_deleted, is_default
+            ).subquery()
+            rows = session.execute(select(words).order_by(words.c.id))
+            return [WordEntry(*row) for row in rows]
         finally:
             session.close()
 
+    def get_user_words(self, user_id, include_deleted=False, include_default=False):
+        """Получение слов пользователя"""
+        # По умолчанию возвращаем только НЕ дефолтные слова
+        is_default = None if include_default else False
+
+        if not include_deleted:
+            vocabulary = self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return [
+                    w for w in vocabulary if is_default is None or not w.is_default
+                ]
+
+        return self._query_user_words(user_id, include_deleted, is_default)
+
+    def get_user_default_words(self, user_id, include_deleted=False):
+        """Получение только дефолтных слов пользователя"""
+        if not include_deleted:
+            vocabulary = self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return [w for w in vocabulary if w.is_default]
+
+        return self._query_user_words(user_id, include_deleted, is_default=True)
+
     def get_all_user_words(self, user_id, include_deleted=False):
         """Получение всех слов пользователя (включая дефолтные)"""
+        if not include_deleted:
+            vocabulary = self._get_vocabulary(user_id)
+            if vocabulary is not None:
+                return list(vocabulary)
+
+        return self._query_user_words(user_id, include_deleted)
+
+    def get_words_page(self, user_id, after=None, before=None, size=10):
+        """Страница слов пользователя (WordsPage) для /mywords"""
         session = self.Session()
         try:
-            query = (
-                session.query(Word).join(UserWord).filter(UserWord.user_id == user_id)
-            )
+            rows = session.execute(
+                self._words_page_statement(user_id, after, before, size)
+            ).all()
+        finally:
+            session.close()
 
-            if not include_deleted:
-                query = query.filter(UserWord.deleted == false())
+        return self._words_page(rows, after, before, size)
 
-            return query.all()
+    def get_picker_page(self, user_id, prefix=None, after=None, before=None, size=8):
+        """Страница собственных слов (PickerPage) для выбора удаляемого слова"""
+        session = self.Session()
+        try:
+            rows = session.execute(
+                self._picker_page_statement(user_id, prefix, after, before, size)
+            ).all()
         finally:
             session.close()
 
-    def get_random_words_for_test(self, user_id, count=4):
-        """Получение случайных слов для теста"""
+        return self._picker_page(rows, after, before, size)
+
+    def get_random_words_for_test(self, user_id, count=4, mode="bounded"):
+        """Получение случайных слов для теста (правильный ответ и варианты, WordEntry)
+
+        Если словарь пользователя есть в кэше, карточка собирается в памяти.
+        Иначе mode="bounded" выбирает карточку за ограниченное число
+        обращений к индексу, независимо от размера словаря; mode="scan"
+        загружает все активные слова пользователя и выбирает среди них в Python.
+        """
+        vocabulary = self._get_vocabulary(user_id)
+        if vocabulary is not None:
+            if len(vocabulary) < count:
+                return self._get_random_words_scan(user_id, count)
+            return self._pick_card(vocabulary, count)
+
+        if mode == "bounded":
+            result = self._get_random_words_bounded(user_id, count)
+            if result is not None:
+                return result
+        return self._get_random_words_scan(user_id, count)
+
+    def get_next_card(self, user_id, count=4):
+        """Карточка для тренировки: слово, которое пора повторить, или случайное
+
+        Ближайшее слово из очереди повторения находится одним обращением к
+        индексу ix_word_schedules_due; остальные варианты ответа (и карточка,
+        если повторять нечего) берутся из get_random_words_for_test.
+        """
         session = self.Session()
         try:
-            # Получаем активные слова пользователя
-            user_words = (
-                session.query(Word)
-                .join(UserWord)
-                .filter(UserWord.user_id == user_id, UserWord.deleted == false())
-                .all()
-            )
-
-            if len(user_words) < count:
-                # Если у пользователя недостаточно слов, добавляем слова по умолчанию
-                return self._get_default_words_for_test(session, count)
+            row = session.execute(
+                self._next_due_statement(user_id, datetime.now())
+            ).first()
+        finally:
+            session.close()
 
-            # Выбираем случайное слово как правильный ответ
-            import random
+        target_word, all_words = self.get_random_words_for_test(user_id, count)
+        if row is None or not target_word:
+            return target_word, all_words
+        return self._with_due_word(WordEntry(*row), all_words, count)
 
-            target_word = random.choice(user_words)
+    def record_answer(self, user_id, word_id, correct):
+        """Учёт ответа на карточку в расписании повторения слова
 
-            # Выбираем другие слова как неправильные варианты
-            other_words = [w for w in user_words if w.id != target_word.id]
-            if len(other_words) >= count - 1:
-                other_words = random.sample(other_words, count - 1)
-            else:
-                # Если не хватает слов, дополняем словами по умолчанию
-                default_words = (
-                    session.query(Word)
-                    .filter(
-                        Word.is_default == true(),
-                        Word.id.notin_([w.id for w in user_words]),
-                    )
-                    .all()
-                )
-                other_words.extend(
-                    random.sample(default_words, count - 1 - len(other_words))
+        Для слова, которого уже нет в словаре пользователя, расписание не
+        создаётся; тогда возвращается None.
+        """
+        session = self.Session()
+        try:
+            schedule = session.get(WordSchedule, (user_id, word_id))
+            if schedule is None:
+                if not session.execute(
+                    self._visible_word_statement(user_id, word_id)
+                ).first():
+                    return None
+                schedule = WordSchedule(
+                    user_id=user_id,
+                    word_id=word_id,
+                    interval=0,
+                    ease=scheduler.INITIAL_EASE,
+                    repetitions=0,
                 )
+                session.add(schedule)
 
-            # Собираем все варианты ответов
-            all_words = [target_word] + other_words
-            random.shuffle(all_words)
+            result = self._apply_review(schedule, correct, datetime.now())
+            session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
-            return target_word, all_words
+    def insert_answer_events(self, events):
+        """Запись пачки ответов одним INSERT (список словарей)"""
+        session = self.Session()
+        try:
+            session.execute(insert(AnswerEvent), events)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
+    def get_user_batch(self, after_id=0, size=1000):
+        """Пользователи с id больше after_id по возрастанию: [(id, telegram_id)]
+
+        Выборка по ключу (keyset) первичного ключа: каждая пачка — один
+        запрос по индексу без OFFSET, таблица users не читается целиком.
+        """
+        session = self.Session()
+        try:
+            return session.execute(
+                select(User.id, User.telegram_id)
+                .where(User.id > after_id)
+                .order_by(User.id)
+                .limit(size)
+            ).all()
         finally:
             session.close()
 
-    def _get_default_words_for_test(self, session, count=4):
-        """Получение слов по умолчанию для теста"""
-        default_words = session.query(Word).filter_by(is_default=True).all()
-        import random
+    def get_broadcast_progress(self, name):
+        """Сохранённый ход рассылки name или None"""
+        session = self.Session()
+        try:
+            run = session.get(BroadcastRun, name)
+            if run is None:
+                return None
+            return BroadcastProgress(
+                run.last_user_id, run.sent, run.failed, run.skipped, run.finished_at
+            )
+        finally:
+            session.close()
 
-        if len(default_words) < count:
-            # Если вообще нет слов, возвращаем тестовые
-            test_words = [
-                Word(english="hello", russian="привет"),
-                Word(english="goodbye", russian="до свидания"),
-                Word(english="thank you", russian="спасибо"),
-                Word(english="please", russian="пожалуйста"),
+    def save_broadcast_progress(
+        self, name, last_user_id, sent, failed, skipped, finished=False
+    ):
+        """Запись хода рассылки name после очередной пачки"""
+        session = self.Session()
+        try:
+            run = session.get(BroadcastRun, name)
+            if run is None:
+                run = BroadcastRun(name=name)
+                session.add(run)
+            run.last_user_id = last_user_id
+            run.sent = sent
+            run.failed = failed
+            run.skipped = skipped
+            if finished:
+                run.finished_at = datetime.now()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _get_random_words_bounded(self, user_id, count=4):
+        """Выборка слов для теста по случайным номерам слов пользователя.
+
+        Собственные слова пронумерованы без пропусков (user_words.position),
+        а их число хранит users.custom_word_count, поэтому count * 2 различных
+        случайных номера дают равновероятную выборку без повторов, сколько бы
+        связей других пользователей ни лежало между связями этого. Тем же
+        запросом получаем видимые слова по умолчанию; они попадают в карточку
+        с вероятностью, пропорциональной их доле в словаре. Возвращает None,
+        если словарь слишком мал или различных слов не хватило.
+        """
+        session = self.Session()
+        try:
+            total = session.scalar(self._word_count_statement(user_id)) or 0
+
+            if total < self.BOUNDED_MIN_WORDS:
+                return None
+
+            words = [
+                WordEntry(*row)
+                for row in session.execute(
+                    self._bounded_probe_statement(user_id, total, count)
+                )
             ]
-            target_word = test_words[0]
-            return target_word, test_words
+        finally:
+            session.close()
 
-        target_word = random.choice(default_words)
-        other_words = [w for w in default_words if w.id != target_word.id]
-        other_words = random.sample(other_words, count - 1)
+        return self._pick_bounded(words, total, count)
 
-        all_words = [target_word] + other_words
-        random.shuffle(all_words)
+    def _get_random_words_scan(self, user_id, count=4):
+        """Выборка слов для теста просмотром всего словаря пользователя"""
+        user_words = self._query_user_words(user_id)
 
-        return target_word, all_words
+        if len(user_words) < count:
+            # Если у пользователя недостаточно слов, берём все слова по умолчанию
+            session = self.Session()
+            try:
+                return self._get_default_words_for_test(session, count)
+            finally:
+                session.close()
+
+        return self._pick_card(user_words, count)
 
     def add_word_to_user(self, user_id, english, russian):
         """Добавление нового слова пользователю"""
@@ -313,11 +1351,24 @@ class Database:
                 .first()
             )
 
+            if word.is_default:
+                # Слово по умолчанию уже видно пользователю, если не скрыто
+                if existing_user_word and existing_user_word.deleted:
+                    session.delete(existing_user_word)
+                    session.commit()
+                    self._invalidate_vocabulary(user_id)
+                    return word.english, word.russian, False
+                return word.english, word.russian, None
+
             if existing_user_word:
                 if existing_user_word.deleted:
                     # Если слово было удалено, восстанавливаем его
+                    session.execute(self._word_count_update(user_id, 1))
                     existing_user_word.deleted = False
+                    existing_user_word.position = self._word_position(user_id)
+                    existing_user_word.english = word.english
                     session.commit()
+                    self._invalidate_vocabulary(user_id)
                     return (
                         word.english,
                         word.russian,
@@ -330,10 +1381,18 @@ class Database:
                         None,
                     )  # None - слово уже существует
 
-            # Добавляем слово пользователю
-            user_word = UserWord(user_id=user_id, word_id=word.id, deleted=False)
+            # Добавляем слово пользователю: сначала счётчик, затем номер по нему
+            session.execute(self._word_count_update(user_id, 1))
+            user_word = UserWord(
+                user_id=user_id,
+                word_id=word.id,
+                english=word.english,
+                deleted=False,
+                position=self._word_position(user_id),
+            )
             session.add(user_word)
             session.commit()
+            self._invalidate_vocabulary(user_id)
 
             # Перезагружаем слово из БД чтобы получить актуальные данные
             word_refreshed = session.query(Word).filter_by(id=word.id).first()
@@ -367,10 +1426,18 @@ class Database:
                 .first()
             )
 
-            if user_word:
-                # Удаляем связь (мягкое удаление)
+            if user_word and not user_word.deleted:
+                # Удаляем связь (мягкое удаление) и расписание повторения;
+                # последнее слово пользователя занимает освободившийся номер
+                position = user_word.position
+                session.execute(self._word_count_update(user_id, -1))
+                if position is not None:
+                    session.execute(self._fill_position_statement(user_id, position))
                 user_word.deleted = True
+                user_word.position = None
+                session.execute(self._delete_schedule_statement(user_id, word_id))
                 session.commit()
+                self._invalidate_vocabulary(user_id)
                 return True, "Слово удалено"
             else:
                 return False, "Слово не найдено у пользователя"
@@ -381,6 +1448,49 @@ class Database:
         finally:
             session.close()
 
+    def import_words(self, user_id, pairs, batch_size=1000, stats=None):
+        """Добавление слов пользователю пачками (загрузка из файла).
+
+        pairs — итератор пар (английское, русское), читается по batch_size
+        штук. На пачку — несколько запросов и один коммит: поиск слов,
+        вставка недостающих, поиск связей пользователя и их вставка или
+        восстановление. Возвращает счётчики added, restored, duplicates, skipped.
+        """
+        if stats is None:
+            stats = self.new_import_stats()
+
+        try:
+            for batch in batched(pairs, batch_size):
+                keys = self._import_keys(batch, stats)
+                session = self.Session()
+                try:
+                    words = session.execute(self._words_by_keys_statement(keys)).all()
+                    found = {(w.english, w.russian) for w in words}
+                    missing = [key for key in keys if key not in found]
+                    if missing:
+                        session.execute(self._insert_words_statement(missing))
+                        words += session.execute(
+                            self._words_by_keys_statement(missing)
+                        ).all()
+
+                    links = dict(
+                        session.execute(
+                            self._user_links_statement(user_id, [w.id for w in words])
+                        ).all()
+                    )
+                    for stmt in self._import_statements(user_id, words, links, stats):
+                        session.execute(stmt)
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+                finally:
+                    session.close()
+        finally:
+            self._invalidate_vocabulary(user_id)
+
+        return stats
+
     def get_word_by_id(self, word_id):
         """Получение слова по ID"""
         session = self.Session()
@@ -390,19 +1500,9 @@ class Database:
             session.close()
 
     def get_user_word_count(self, user_id):
-        """Получение только пользовательских слов (не дефолтных)"""
+        """Число собственных (не дефолтных) слов пользователя — чтение счётчика"""
         session = self.Session()
         try:
-            words = (
-                session.query(Word)
-                .join(UserWord)
-                .filter(
-                    UserWord.user_id == user_id,
-                    Word.is_default == false(),
-                    UserWord.deleted == false(),
-                )
-                .all()
-            )
-            return words
+            return session.scalar(self._word_count_statement(user_id)) or 0
         finally:
             session.close()
@@ -1,53 +1,179 @@
 import os
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from telebot import TeleBot, types, custom_filters
-from telebot.handler_backends import State, StatesGroup
-from telebot.storage import StateMemoryStorage
+from telebot import TeleBot, apihelper
 
 import database
+import views
+import webhook
+from answer_log import AnswerLog, answer_event
+from broadcast import Broadcast, start_daily
+from chat_workers import ChatWorkerPool
+from metrics import Metrics, start_metrics_server
+from outbound import OutboundSender
+from query_profiler import QueryProfiler
+from router import Router
+from state_storage import DatabaseStateStorage, MemoryStateStorage
+from views import CANCEL, Command, MyStates
+from word_import import (
+    IMPORT_EXTENSIONS,
+    MAX_IMPORT_FILE_SIZE,
+    open_text,
+    read_word_pairs,
+)
 
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 DB_URL = os.getenv("DATABASE_URL")
 
-state_storage = StateMemoryStorage()
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный HTTPS-адрес, включая путь
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SSL_CERT = os.getenv("WEBHOOK_SSL_CERT")
+WEBHOOK_SSL_KEY = os.getenv("WEBHOOK_SSL_KEY")
+
+# Хранилище состояний: memory (в процессе) или database (общее для процессов)
+STATE_STORAGE = os.getenv("STATE_STORAGE", "memory")
+# Ограничения хранилища в памяти: простаивающие дольше STATE_IDLE_TTL секунд
+# состояния удаляются, сверх STATE_MAX_ENTRIES вытесняются самые старые
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "100000"))
+STATE_IDLE_TTL = int(os.getenv("STATE_IDLE_TTL", "3600"))
+
+# Профилирование запросов к БД по обновлениям: число запросов, время,
+# самые медленные и повторы (N+1) в лог при превышении порогов
+DB_PROFILE = os.getenv("DB_PROFILE", "0") == "1"
+DB_PROFILE_MAX_STATEMENTS = int(os.getenv("DB_PROFILE_MAX_STATEMENTS", "10"))
+DB_PROFILE_MAX_MS = float(os.getenv("DB_PROFILE_MAX_MS", "100"))
+
+# Пул соединений с БД; пустое значение — значение SQLAlchemy по умолчанию
+DB_POOL_SIZE = os.getenv("DB_POOL_SIZE")
+DB_MAX_OVERFLOW = os.getenv("DB_MAX_OVERFLOW")
+DB_POOL_TIMEOUT = os.getenv("DB_POOL_TIMEOUT")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # секунд, -1 — без
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Потоки обработки обновлений: обновления одного чата всегда попадают в один
+# поток и обрабатываются по порядку; UPDATE_QUEUE_SIZE — очередь потока
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+
+# Исходящие сообщения отправляются из SEND_WORKERS потоков с ограничением
+# частоты: SEND_RATE в секунду всего, SEND_CHAT_RATE в секунду на чат со
+# всплеском до SEND_CHAT_BURST (0 — без ограничения); SEND_WORKERS=0 —
+# отправка прямо из обработчика
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "10000"))
+
+# Ежедневная рассылка карточки всем пользователям в BROADCAST_TIME (ЧЧ:ММ,
+# пусто — без рассылки): BROADCAST_RATE сообщений в секунду, пользователи
+# читаются пачками по BROADCAST_BATCH_SIZE
+BROADCAST_TIME = os.getenv("BROADCAST_TIME", "")
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "200"))
+
+# Порт HTTP-сервера с /metrics в формате Prometheus; 0 — не запускать
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Счётчики и время обработчиков, методов Database и запросов к Bot API
+metrics = Metrics()
+db = metrics.wrap_database(
+    database.Database(
+        DB_URL,
+        pool_size=int(DB_POOL_SIZE) if DB_POOL_SIZE else None,
+        max_overflow=int(DB_MAX_OVERFLOW) if DB_MAX_OVERFLOW else None,
+        pool_timeout=float(DB_POOL_TIMEOUT) if DB_POOL_TIMEOUT else None,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    ),
+    exclude=("unit_of_work", "unit_cache", "pool_stats"),
+)
+apihelper.CUSTOM_REQUEST_SENDER = metrics.request_sender()
+profiler = QueryProfiler(
+    db.engine,
+    max_statements=DB_PROFILE_MAX_STATEMENTS,
+    max_seconds=DB_PROFILE_MAX_MS / 1000,
+)
+if DB_PROFILE:
+    profiler.attach()
+# Ответы на карточки пишутся в фоне пачками, не задерживая ответ бота
+answer_log = AnswerLog(db)
+if STATE_STORAGE == "database":
+    state_storage = DatabaseStateStorage(db)
+else:
+    state_storage = MemoryStateStorage(
+        max_entries=STATE_MAX_ENTRIES, idle_ttl=STATE_IDLE_TTL
+    )
 bot = TeleBot(TOKEN, state_storage=state_storage)
-db = database.Database(DB_URL)
-
-
-class MyStates(StatesGroup):
-    target_word = State()
-    waiting_for_english = State()
-    waiting_for_russian = State()
-    waiting_for_word_to_delete = State()
-
-
-class Command:
-    ADD_WORD = "➕ Добавить слово"
-    DELETE_WORD = "🔙 Удалить слово"
-    NEXT = "⏭ Дальше"
-    MY_WORDS = "📚 Мои слова"
-    HELP = "❓ Помощь"
-
-
-WELCOME_MESSAGE = """Привет 👋
-
-Давай попрактикуемся в английском языке. Тренировки можешь проходить в удобном для себя темпе. 
-
-У тебя есть возможность использовать тренажёр, как конструктор, и собирать свою собственную базу для обучения.
- Для этого воспользуйся инструментами:
-- добавить слово ➕,
-- удалить слово 🔙,
-- мои слова 📚.
-
-Ну что, начнём ⬇️"""
+chat_workers = ChatWorkerPool(
+    bot, workers=UPDATE_WORKERS, max_pending=UPDATE_QUEUE_SIZE, metrics=metrics
+)
+outbound = None
+if SEND_WORKERS:
+    outbound = OutboundSender(
+        workers=SEND_WORKERS,
+        rate=SEND_RATE,
+        chat_rate=SEND_CHAT_RATE,
+        chat_burst=SEND_CHAT_BURST,
+        max_pending=SEND_QUEUE_SIZE,
+        metrics=metrics,
+    ).attach(bot)
+    metrics.add_stats("outbound", outbound.stats)
+router = Router()
+metrics.add_stats("answer_log", answer_log.stats)
+metrics.add_stats("vocab_cache", db.vocab_cache.stats)
+metrics.add_stats("user_id_cache", db.user_id_cache.stats)
+metrics.add_stats("db_pool", db.pool_stats)
+if STATE_STORAGE != "database":
+    metrics.add_stats("state", state_storage.footprint)
+if DB_PROFILE:
+    metrics.add_stats("db_profile", profiler.stats)
+
+
+@contextmanager
+def handling(name, chat_id):
+    """Замер обработчика name: метрики и профиль запросов обновления"""
+    with metrics.handler(name), profiler.update(name, chat_id):
+        yield
+
+
+# Каждое обновление обрабатывается в unit_of_work: все обращения к базе,
+# включая чтение состояния, идут через одну сессию и одно соединение
+@bot.message_handler(content_types=["text"])
+def dispatch(message):
+    """Единая точка входа: обработчик выбирается по таблице маршрутов"""
+    with db.unit_of_work():
+        state = bot.get_state(message.from_user.id, message.chat.id)
+        handler = router.resolve(message.text, state)
+        if handler is not None:
+            with handling(handler.__name__, message.chat.id):
+                handler(message)
+
+
+@bot.callback_query_handler(func=lambda call: True)
+def dispatch_callback(call):
+    """Нажатия inline-кнопок по таблице маршрутов"""
+    handler = router.resolve_callback(call.data)
+    if handler is None:
+        bot.answer_callback_query(call.id)
+        return
+    with db.unit_of_work(), handling(handler.__name__, call.message.chat.id):
+        handler(call)
 
 
-@bot.message_handler(commands=["start", "cards"])
+@router.command("start", "cards")
 def handle_start(message):
     """Начало работы с ботом"""
     cid = message.chat.id
-    user = db.get_or_create_user(
+    user_id = db.get_or_create_user_id(
         telegram_id=cid,
         username=message.from_user.username,
         first_name=message.from_user.first_name,
@@ -55,192 +181,264 @@ def handle_start(message):
     )
 
     if message.text == "/start":
-        bot.send_message(cid, WELCOME_MESSAGE, parse_mode="HTML")
+        bot.send_message(cid, views.WELCOME_MESSAGE, parse_mode="HTML")
 
-    create_cards(message, user.id)
+    create_cards(message, user_id)
 
 
-@bot.message_handler(commands=["help"])
+@router.command("help")
 def handle_help(message):
     """Помощь по боту"""
-    help_text = """🤖 *Команды бота:*
+    bot.send_message(message.chat.id, views.HELP_MESSAGE, parse_mode="Markdown")
 
-/start - Начать работу
-/cards - Новая карточка  
-/mywords - Мои слова
-/help - Помощь
 
-*Кнопки:*
-⏭ Дальше - Следующее слово
-➕ Добавить слово - Добавить новое слово
-🔙 Удалить слово - Удалить ваше слово
-📚 Мои слова - Показать все слова
-❓ Помощь - Справка"""
-    bot.send_message(message.chat.id, help_text, parse_mode="Markdown")
-
-
-@bot.message_handler(commands=["mywords"])
+@router.command("mywords")
 def handle_mywords(message):
     """Показать слова пользователя"""
     cid = message.chat.id
-    user = db.get_or_create_user(telegram_id=cid)
+    user_id = db.get_or_create_user_id(telegram_id=cid)
 
-    # Все слова
-    all_words = db.get_all_user_words(user.id)
+    # Первая страница и число слов одним запросом
+    page = db.get_words_page(user_id, size=views.PAGE_SIZE)
 
-    if not all_words:
-        bot.send_message(
-            cid,
-            "У вас пока нет слов. Добавьте слова с помощью кнопки '➕ Добавить слово'.",
-        )
+    if not page.words:
+        bot.send_message(cid, views.NO_WORDS_MESSAGE)
         return
 
-    # Дефолтные слова
-    default_words = db.get_user_default_words(user.id)
-    # Пользовательские слова
-    custom_words = db.get_user_words(user.id)
+    bot.send_message(
+        cid,
+        views.mywords_message(page),
+        parse_mode="Markdown",
+        reply_markup=views.page_markup("mywords", page),
+    )
 
-    text = f"📚 *Ваши слова ({len(all_words)}):*\n\n"
 
-    if default_words:
-        text += "*Слова по умолчанию:*\n"
-        for w in default_words[:5]:
-            text += f"• {w.english} - {w.russian}\n"
-        if len(default_words) > 5:
-            text += f"... и ещё {len(default_words) - 5}\n"
-        text += "\n"
+@router.callback("mywords")
+def mywords_page(call):
+    """Листание списка слов"""
+    cid = call.message.chat.id
+    user_id = db.get_or_create_user_id(telegram_id=cid)
 
-    if custom_words:
-        text += "*Ваши слова:*\n"
-        for w in custom_words[:10]:
-            text += f"• {w.english} - {w.russian}\n"
-        if len(custom_words) > 10:
-            text += f"... и ещё {len(custom_words) - 10}"
+    after, before = views.parse_page_callback(call.data)
+    page = db.get_words_page(user_id, after, before, views.PAGE_SIZE)
 
-    bot.send_message(cid, text, parse_mode="Markdown")
+    bot.answer_callback_query(call.id)
+    if page.words:
+        bot.edit_message_text(
+            views.mywords_message(page),
+            cid,
+            call.message.message_id,
+            parse_mode="Markdown",
+            reply_markup=views.page_markup("mywords", page),
+        )
 
 
 def create_cards(message, user_id=None):
     """Создать новую карточку с вопросом"""
-    cid = message.chat.id
+    send_card(message.chat.id, message.from_user.id, user_id)
+
 
+def send_card(cid, uid, user_id=None):
+    """Отправить карточку в чат cid (uid — id пользователя Telegram)"""
     if user_id is None:
-        user = db.get_or_create_user(telegram_id=cid)
-        user_id = user.id
+        user_id = db.get_or_create_user_id(telegram_id=cid)
 
-    target_word, all_words = db.get_random_words_for_test(user_id)
+    target_word, all_words = db.get_next_card(user_id)
 
     if not target_word:
-        bot.send_message(cid, "Недостаточно слов для тренировки. Добавьте слова!")
+        bot.send_message(cid, views.NOT_ENOUGH_WORDS_MESSAGE)
         return
 
-    markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
+    card = views.Card.from_words(target_word, all_words)
 
-    answer_buttons = [types.KeyboardButton(w.english) for w in all_words]
+    bot.send_message(
+        cid,
+        views.card_question(card),
+        reply_markup=views.card_markup(card.options),
+        parse_mode="Markdown",
+    )
 
-    service_buttons = [
-        types.KeyboardButton(Command.NEXT),
-        types.KeyboardButton(Command.ADD_WORD),
-        types.KeyboardButton(Command.DELETE_WORD),
-        types.KeyboardButton(Command.MY_WORDS),
-        types.KeyboardButton(Command.HELP),
-    ]
+    bot.set_state(uid, MyStates.target_word, cid)
+    with bot.retrieve_data(uid, cid) as data:
+        data["card"] = card
+        data["user_id"] = user_id
+        data["shown_at"] = time.time()
+        data.pop("answered", None)  # ответ на новую карточку ещё не записан
 
-    # Добавление кнопок
-    for i in range(0, len(answer_buttons), 2):
-        markup.add(*answer_buttons[i : i + 2])
 
-    for i in range(0, len(service_buttons), 2):
-        markup.add(*service_buttons[i : i + 2])
+def send_reminder(user_id, telegram_id, done):
+    """Карточка рассылки в личный чат через поток этого чата (chat_workers)
 
-    question = f"🇷🇺 *{target_word.russian}*\n\nВыбери перевод:"
-    bot.send_message(cid, question, reply_markup=markup, parse_mode="Markdown")
+    Карточка выбирается, записывается в состояние и ставится в очередь
+    отправки по порядку с обновлениями чата, поэтому ответ пользователя,
+    пришедший одновременно, не затирает её, а начатый диалог не теряется.
+    """
+    chat_workers.submit_call(
+        telegram_id, lambda: deliver_reminder(user_id, telegram_id, done)
+    )
+
+
+def deliver_reminder(user_id, telegram_id, done):
+    """Выбор и отправка карточки рассылки; итог — в done (см. Broadcast)"""
+    try:
+        with db.unit_of_work():
+            # Пользователь посреди другого диалога (например, ввода слова)
+            state = bot.get_state(telegram_id, telegram_id)
+            if state is not None and state != MyStates.target_word.name:
+                done(None)
+                return
+            target_word, all_words = db.get_next_card(user_id)
+            if not target_word:
+                done(None)
+                return
+            card = views.Card.from_words(target_word, all_words)
+
+            bot.set_state(telegram_id, MyStates.target_word, telegram_id)
+            with bot.retrieve_data(telegram_id, telegram_id) as data:
+                data["card"] = card
+                data["user_id"] = user_id
+                data["shown_at"] = time.time()
+                data.pop("answered", None)  # ответ на новую карточку ещё не записан
+    except Exception as e:
+        print(f"Ошибка рассылки пользователю {user_id}: {e}")
+        done(False)
+        return
+
+    args = (telegram_id, views.reminder_message(card))
+    kwargs = {
+        "reply_markup": views.card_markup(card.options),
+        "parse_mode": "Markdown",
+    }
+    if outbound is None:
+        try:
+            bot.send_message(*args, **kwargs)
+        except Exception as e:
+            print(f"Ошибка рассылки пользователю {user_id}: {e}")
+            done(False)
+            return
+        done(True)
+        return
+    # Общая очередь с ответами бота: вместе они не превышают ограничения Telegram
+    outbound.submit(
+        telegram_id,
+        "broadcast",
+        outbound.direct["send_message"],
+        args,
+        kwargs,
+        done=done,
+    )
 
-    bot.set_state(message.from_user.id, MyStates.target_word, cid)
-    with bot.retrieve_data(message.from_user.id, cid) as data:
-        data["target_word"] = target_word
-        data["all_words"] = all_words
-        data["user_id"] = user_id
 
+broadcast = Broadcast(
+    db,
+    send_reminder,
+    batch_size=BROADCAST_BATCH_SIZE,
+    rate=BROADCAST_RATE,
+)
+metrics.add_stats("broadcast", broadcast.stats)
 
-@bot.message_handler(func=lambda m: m.text == Command.NEXT)
+
+@router.button(Command.NEXT)
 def next_card(message):
     """Следующая карточка"""
-    cid = message.chat.id
-    user = db.get_or_create_user(telegram_id=cid)
-    create_cards(message, user.id)
+    create_cards(message)
 
 
-@bot.message_handler(func=lambda m: m.text == Command.ADD_WORD)
+@router.button(Command.ADD_WORD)
 def add_word_start(message):
     """Начать добавление слова"""
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add(types.KeyboardButton("❌ Отмена"))
-    bot.send_message(message.chat.id, "Введите английское слово:", reply_markup=markup)
+    bot.send_message(
+        message.chat.id, "Введите английское слово:", reply_markup=views.cancel_markup()
+    )
     bot.set_state(message.from_user.id, MyStates.waiting_for_english, message.chat.id)
 
 
-@bot.message_handler(func=lambda m: m.text == Command.DELETE_WORD)
+@router.button(Command.DELETE_WORD)
 def delete_word_start(message):
     """Начать удаление слова"""
     cid = message.chat.id
-    user = db.get_or_create_user(telegram_id=cid)
+    user_id = db.get_or_create_user_id(telegram_id=cid)
 
-    words = db.get_user_words(user.id)  # Только пользовательские слова
+    # Только пользовательские слова, первая страница
+    page = db.get_picker_page(user_id, size=views.DELETE_PAGE_SIZE)
 
-    if not words:
-        bot.send_message(
-            cid,
-            "У вас нет слов для удаления.\n\nВы можете удалять только слова, которые вы сами добавили.",
-        )
+    if not page.words:
+        bot.send_message(cid, views.NOTHING_TO_DELETE_MESSAGE)
         return
 
-    markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
-    word_buttons = [
-        types.KeyboardButton(f"{w.english} - {w.russian}") for w in words[:12]
-    ]
-    markup.add(*word_buttons)
-    markup.add(types.KeyboardButton("❌ Отмена"))
-
-    bot.send_message(cid, "Выберите слово для удаления:", reply_markup=markup)
+    bot.send_message(
+        cid, views.DELETE_PROMPT, reply_markup=views.delete_markup(page)
+    )
     bot.set_state(message.from_user.id, MyStates.waiting_for_word_to_delete, cid)
-
+    # Новый список без поиска: листание не должно продолжать прежний поиск
     with bot.retrieve_data(message.from_user.id, cid) as data:
-        data["words_to_delete"] = {
-            f"{w.english} - {w.russian}": w.id for w in words[:12]
-        }
+        data.pop("delete_prefix", None)
 
 
-@bot.message_handler(func=lambda m: m.text == Command.MY_WORDS)
+@router.button(Command.MY_WORDS)
 def show_my_words(message):
     """Показать мои слова"""
     handle_mywords(message)
 
 
-@bot.message_handler(func=lambda m: m.text == Command.HELP)
+@router.button(Command.HELP)
 def show_help(message):
     """Показать помощь"""
     handle_help(message)
 
 
+@bot.message_handler(content_types=["document"])
+def dispatch_document(message):
+    """Присланные файлы: загрузка списка слов"""
+    with db.unit_of_work(), handling("handle_document", message.chat.id):
+        handle_document(message)
+
+
+def handle_document(message):
+    """Загрузка слов из CSV/TSV-файла"""
+    cid = message.chat.id
+    document = message.document
+
+    if not (document.file_name or "").lower().endswith(IMPORT_EXTENSIONS):
+        bot.send_message(cid, views.IMPORT_FORMAT_MESSAGE)
+        return
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        bot.send_message(cid, views.IMPORT_TOO_LARGE_MESSAGE)
+        return
+
+    user_id = db.get_or_create_user_id(telegram_id=cid)
+
+    try:
+        file_info = bot.get_file(document.file_id)
+        content = bot.download_file(file_info.file_path)
+
+        # Файл разбирается построчно и пишется в базу пачками
+        stats = db.new_import_stats()
+        pairs = read_word_pairs(open_text(content), stats)
+        db.import_words(user_id, pairs, stats=stats)
+
+        bot.send_message(
+            cid, views.import_summary_message(stats), parse_mode="Markdown"
+        )
+
+    except Exception as e:
+        bot.send_message(cid, f"❌ Ошибка: {str(e)}")
+
+
 # Состояния ввода
-@bot.message_handler(state=MyStates.waiting_for_english)
+@router.state(MyStates.waiting_for_english)
 def get_english_word(message):
     """Получить английское слово"""
-    if message.text == "❌ Отмена":
+    if message.text == CANCEL:
         bot.delete_state(message.from_user.id, message.chat.id)
-        user = db.get_or_create_user(telegram_id=message.chat.id)
-        create_cards(message, user.id)
+        create_cards(message)
         return
 
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add(types.KeyboardButton("❌ Отмена"))
-
     bot.send_message(
         message.chat.id,
-        f"Английское: *{message.text}*\n\nТеперь введите перевод:",
+        views.english_received_message(message.text),
         parse_mode="Markdown",
-        reply_markup=markup,
+        reply_markup=views.cancel_markup(),
     )
 
     bot.set_state(message.from_user.id, MyStates.waiting_for_russian, message.chat.id)
@@ -248,13 +446,12 @@ def get_english_word(message):
         data["new_english"] = message.text.strip()
 
 
-@bot.message_handler(state=MyStates.waiting_for_russian)
+@router.state(MyStates.waiting_for_russian)
 def get_russian_translation(message):
     """Получить русский перевод"""
-    if message.text == "❌ Отмена":
+    if message.text == CANCEL:
         bot.delete_state(message.from_user.id, message.chat.id)
-        user = db.get_or_create_user(telegram_id=message.chat.id)
-        create_cards(message, user.id)
+        create_cards(message)
         return
 
     cid = message.chat.id
@@ -262,160 +459,198 @@ def get_russian_translation(message):
     with bot.retrieve_data(message.from_user.id, cid) as data:
         english = data["new_english"]
         russian = message.text.strip()
-        user = db.get_or_create_user(telegram_id=cid)
+        user_id = db.get_or_create_user_id(telegram_id=cid)
 
         try:
             english_word, russian_word, result = db.add_word_to_user(
-                user.id, english, russian
+                user_id, english, russian
             )
 
-            if result is True:
-                response = f"✅ *Слово добавлено!*\n\n{english_word} - {russian_word}"
-            elif result is False:
-                response = (
-                    f"✅ *Слово восстановлено!*\n\n{english_word} - {russian_word}"
-                )
-            else:
-                response = f"ℹ️ *Слово уже есть:*\n\n{english_word} - {russian_word}"
-
+            response = views.add_word_message(english_word, russian_word, result)
             bot.send_message(cid, response, parse_mode="Markdown")
 
         except Exception as e:
             bot.send_message(cid, f"❌ Ошибка: {str(e)}")
 
     bot.delete_state(message.from_user.id, cid)
-    user = db.get_or_create_user(telegram_id=cid)
-    create_cards(message, user.id)
+    create_cards(message, user_id)
 
 
-@bot.message_handler(state=MyStates.waiting_for_word_to_delete)
-def delete_selected_word(message):
-    """Удалить выбранное слово"""
-    if message.text == "❌ Отмена":
+@router.state(MyStates.waiting_for_word_to_delete)
+def search_word_to_delete(message):
+    """Поиск удаляемого слова по началу"""
+    if message.text == CANCEL:
         bot.delete_state(message.from_user.id, message.chat.id)
-        user = db.get_or_create_user(telegram_id=message.chat.id)
-        create_cards(message, user.id)
+        create_cards(message)
         return
 
     cid = message.chat.id
+    prefix = message.text.strip()
+    user_id = db.get_or_create_user_id(telegram_id=cid)
 
-    with bot.retrieve_data(message.from_user.id, cid) as data:
-        words_map = data.get("words_to_delete", {})
+    page = db.get_picker_page(user_id, prefix, size=views.DELETE_PAGE_SIZE)
+    if not page.words:
+        bot.send_message(cid, views.search_not_found_message(prefix))
+        return
 
-        if message.text in words_map:
-            word_id = words_map[message.text]
-            user = db.get_or_create_user(telegram_id=cid)
+    # Листание продолжает поиск по тому же началу слова
+    with bot.retrieve_data(message.from_user.id, cid) as data:
+        data["delete_prefix"] = prefix
 
-            success, msg = db.delete_word_from_user(user.id, word_id)
+    bot.send_message(
+        cid, views.DELETE_PROMPT, reply_markup=views.delete_markup(page)
+    )
 
-            if success:
-                bot.send_message(cid, f"✅ {msg}")
-            else:
-                bot.send_message(cid, f"❌ {msg}")
-        else:
-            bot.send_message(cid, "Выберите слово из списка!")
-            return
 
-    bot.delete_state(message.from_user.id, cid)
-    user = db.get_or_create_user(telegram_id=cid)
-    create_cards(message, user.id)
+@router.callback("delete")
+def delete_callback(call):
+    """Кнопки списка удаления: слово, листание, отмена"""
+    cid = call.message.chat.id
+    uid = call.from_user.id
+    action = call.data.split(":", 2)[1]
 
+    bot.answer_callback_query(call.id)
 
-@bot.message_handler(func=lambda m: True)
-def handle_test_answer(message):
-    """Обработка ответов на тест"""
-    cid = message.chat.id
-    uid = message.from_user.id
-
-    current_state = bot.get_state(uid, cid)
-    if current_state in [
-        MyStates.waiting_for_english,
-        MyStates.waiting_for_russian,
-        MyStates.waiting_for_word_to_delete,
-    ]:
+    if action == "cancel":
+        bot.edit_message_reply_markup(cid, call.message.message_id)
+        bot.delete_state(uid, cid)
+        send_card(cid, uid)
         return
 
-    if message.text in [
-        Command.NEXT,
-        Command.ADD_WORD,
-        Command.DELETE_WORD,
-        Command.MY_WORDS,
-        Command.HELP,
-    ]:
+    user_id = db.get_or_create_user_id(telegram_id=cid)
+
+    if action == "word":
+        # id слова из callback_data; delete_word_from_user проверяет владельца
+        word_id = int(call.data.rsplit(":", 1)[1])
+        success, msg = db.delete_word_from_user(user_id, word_id)
+        bot.edit_message_text(
+            f"✅ {msg}" if success else f"❌ {msg}", cid, call.message.message_id
+        )
+        bot.delete_state(uid, cid)
+        send_card(cid, uid, user_id)
         return
 
-    try:
-        with bot.retrieve_data(uid, cid) as data:
-            if not data or "target_word" not in data:
-                user = db.get_or_create_user(telegram_id=cid)
-                create_cards(message, user.id)
-                return
+    with bot.retrieve_data(uid, cid) as data:
+        prefix = (data or {}).get("delete_prefix")
 
-            target_word = data["target_word"]
-            all_words = data.get("all_words", [])
+    after, before = views.parse_page_callback(call.data)
+    page = db.get_picker_page(
+        user_id, prefix, after, before, size=views.DELETE_PAGE_SIZE
+    )
+    if page.words:
+        bot.edit_message_reply_markup(
+            cid, call.message.message_id, reply_markup=views.delete_markup(page)
+        )
 
-            # Проверяем ответ
-            user_answer = message.text.strip()
-            is_correct = user_answer == target_word.english
 
-            # Создаем клавиатуру для ответа
-            markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
+@router.default
+def handle_test_answer(message):
+    """Обработка ответов на тест"""
+    # Кнопки и состояния ввода сюда не попадают: их разбирает router
+    is_correct = None
+    try:
+        uid, cid = message.from_user.id, message.chat.id
+        with bot.retrieve_data(uid, cid) as data:
+            if data and "card" in data:
+                is_correct = check_answer(message, data)
+    except Exception:
+        is_correct = None
 
-            if is_correct:
-                response = (
-                    f"✅ *Правильно!*\n\n{target_word.english} - {target_word.russian}"
-                )
+    # Новая карточка, когда карточки нет (например, после перезапуска) или
+    # ответ правильный; только после выхода из retrieve_data, иначе его
+    # save() затёр бы состояние, записанное send_card
+    if is_correct is not False:
+        create_cards(message)
 
-                buttons = [
-                    types.KeyboardButton(Command.NEXT),
-                    types.KeyboardButton(Command.ADD_WORD),
-                    types.KeyboardButton(Command.DELETE_WORD),
-                    types.KeyboardButton(Command.MY_WORDS),
-                    types.KeyboardButton(Command.HELP),
-                ]
-                markup.add(*buttons)
 
-            else:
-                response = f"❌ *Неправильно!*\n\nПравильный ответ: {target_word.english}\nСлово: {target_word.russian}"
+def check_answer(message, data):
+    """Проверка ответа на карточку из data; True, если ответ правильный"""
+    cid = message.chat.id
+    uid = message.from_user.id
 
-                answer_buttons = []
-                for word in all_words:
-                    btn_text = word.english
-                    if btn_text == user_answer:
-                        btn_text = f"❌ {btn_text}"
-                    answer_buttons.append(types.KeyboardButton(btn_text))
+    card = views.Card.restore(data["card"])
 
-                service_buttons = [
-                    types.KeyboardButton(Command.NEXT),
-                    types.KeyboardButton(Command.ADD_WORD),
-                    types.KeyboardButton(Command.DELETE_WORD),
-                    types.KeyboardButton(Command.MY_WORDS),
-                    types.KeyboardButton(Command.HELP),
-                ]
+    # Проверяем ответ
+    user_answer = message.text.strip()
+    is_correct = user_answer == card.english
 
-                for i in range(0, len(answer_buttons), 2):
-                    markup.add(*answer_buttons[i : i + 2])
+    # В расписание повторения идёт только первый ответ на карточку
+    if card.word_id is not None and not data.get("answered"):
+        db.record_answer(data["user_id"], card.word_id, is_correct)
+        data["answered"] = True
 
-                for i in range(0, len(service_buttons), 2):
-                    markup.add(*service_buttons[i : i + 2])
+    answer_log.record(
+        answer_event(
+            data["user_id"],
+            card.word_id,
+            user_answer,
+            is_correct,
+            data.get("shown_at"),
+        )
+    )
 
-            bot.send_message(cid, response, reply_markup=markup, parse_mode="Markdown")
+    # Создаем клавиатуру для ответа
+    if is_correct:
+        markup = views.service_markup()
+    else:
+        markup = views.card_markup(card.options, wrong_answer=user_answer)
+
+    response = views.answer_message(card, is_correct)
+    bot.send_message(cid, response, reply_markup=markup, parse_mode="Markdown")
+
+    if is_correct:
+        bot.delete_state(uid, cid)
+    return is_correct
+
+
+def run_webhook():
+    """Приём обновлений через встроенный HTTP-сервер"""
+    server = webhook.WebhookServer(
+        bot,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        ssl_cert=WEBHOOK_SSL_CERT,
+        ssl_key=WEBHOOK_SSL_KEY,
+        dispatcher=chat_workers,
+    )
 
-            if is_correct:
-                bot.delete_state(uid, cid)
+    if WEBHOOK_URL:
+        bot.remove_webhook()
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
 
-    except Exception:
-        user = db.get_or_create_user(telegram_id=cid)
-        create_cards(message, user.id)
+    print(f"Webhook слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
 
 
 if __name__ == "__main__":
     db.create_tables()
     db.init_default_words()
-    bot.add_custom_filter(custom_filters.StateFilter(bot))
+    db.compact_default_words()
+
+    if METRICS_PORT:
+        start_metrics_server(metrics, METRICS_HOST, METRICS_PORT)
+        print(f"Метрики: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+    if BROADCAST_TIME:
+        start_daily(BROADCAST_TIME, lambda day: broadcast.run(f"daily:{day}"))
+        print(f"Ежедневная рассылка в {BROADCAST_TIME}")
 
     try:
         print("Бот запущен!")
-        bot.infinity_polling()
+        if BOT_MODE == "webhook":
+            run_webhook()
+        else:
+            bot.remove_webhook()
+            bot.infinity_polling()
     except KeyboardInterrupt:
         print("\nБот остановлен.")
+    finally:
+        chat_workers.close()
+        if outbound is not None:
+            outbound.close()
+        answer_log.close()
@@ -0,0 +1,329 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from telebot import apihelper
+
+# Границы корзин гистограмм задержки, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Счётчики по корзинам, сумма и число наблюдений.
+
+    observe() только увеличивает счётчик корзины; накопительные значения,
+    которые ожидает Prometheus, считаются при выдаче /metrics.
+    """
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class _Family:
+    """Метрика с одной меткой: значение метки -> число или Histogram"""
+
+    def __init__(self, name, kind, help, label, collect=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.label = label
+        self.values = {}
+        self.collect = collect  # для gauge: функция, возвращающая values
+
+
+class _Timing:
+    """Время текущего обработчика в потоке: всего, в БД и в Bot API"""
+
+    __slots__ = ("db", "telegram", "depth")
+
+    def __init__(self):
+        self.db = 0.0
+        self.telegram = 0.0
+        self.depth = 0  # вложенность вызовов Database
+
+
+# Метрики обработчиков, методов Database и вызовов Bot API
+class Metrics:
+    """Счётчики и гистограммы в памяти процесса в формате Prometheus.
+
+    Запись — несколько операций со словарём под общей блокировкой, текст
+    для /metrics собирается только при запросе. Время обработчика делится
+    на время в методах Database и в запросах к Bot API того же потока.
+    """
+
+    def __init__(self, prefix="bot"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._families = {}
+        self._stats = []
+
+        self.handler_requests = self._family(
+            "handler_requests_total", "counter", "Обработанные обновления", "handler"
+        )
+        self.handler_errors = self._family(
+            "handler_errors_total", "counter", "Исключения в обработчиках", "handler"
+        )
+        self.handler_seconds = self._family(
+            "handler_duration_seconds", "histogram", "Время обработчика", "handler"
+        )
+        self.handler_db_seconds = self._family(
+            "handler_db_seconds", "histogram", "Время обработчика в БД", "handler"
+        )
+        self.handler_telegram_seconds = self._family(
+            "handler_telegram_seconds",
+            "histogram",
+            "Время обработчика в запросах к Bot API",
+            "handler",
+        )
+        self.db_calls = self._family(
+            "db_calls_total", "counter", "Вызовы методов Database", "method"
+        )
+        self.db_errors = self._family(
+            "db_errors_total", "counter", "Исключения в методах Database", "method"
+        )
+        self.db_seconds = self._family(
+            "db_duration_seconds", "histogram", "Время методов Database", "method"
+        )
+        self.telegram_requests = self._family(
+            "telegram_requests_total", "counter", "Запросы к Bot API", "method"
+        )
+        self.telegram_errors = self._family(
+            "telegram_errors_total", "counter", "Неудачные запросы к Bot API", "method"
+        )
+        self.telegram_seconds = self._family(
+            "telegram_request_duration_seconds",
+            "histogram",
+            "Время запросов к Bot API",
+            "method",
+        )
+
+    def _family(self, name, kind, help, label, collect=None):
+        family = _Family(f"{self.prefix}_{name}", kind, help, label, collect)
+        self._families[name] = family
+        return family
+
+    def counter(self, name, help, label):
+        return self._family(name, "counter", help, label)
+
+    def histogram(self, name, help, label):
+        return self._family(name, "histogram", help, label)
+
+    def gauge(self, name, help, label, collect):
+        """Gauge, значения которого collect() возвращает при выдаче /metrics"""
+        return self._family(name, "gauge", help, label, collect)
+
+    def add(self, family, key, value=1):
+        with self._lock:
+            family.values[key] = family.values.get(key, 0) + value
+
+    def observe(self, family, key, value):
+        with self._lock:
+            histogram = family.values.get(key)
+            if histogram is None:
+                histogram = family.values[key] = Histogram()
+            histogram.observe(value)
+
+    def _timing(self):
+        return getattr(self._local, "timing", None)
+
+    def handler(self, name):
+        """Контекст вокруг вызова обработчика name"""
+        return _HandlerScope(self, name)
+
+    def wrap_database(self, db, exclude=()):
+        """Замер всех публичных методов экземпляра Database, кроме exclude
+
+        Методы заменяются обёртками на самом экземпляре, класс не меняется.
+        Вложенные вызовы (один метод Database вызывает другой) попадают в
+        гистограмму своего метода, но время обработчика в БД не удваивают.
+        """
+        for name in dir(type(db)):
+            if name.startswith("_") or name in exclude:
+                continue
+            method = getattr(db, name)
+            if callable(method):
+                setattr(db, name, self._timed_method(name, method))
+        return db
+
+    def _timed_method(self, name, method):
+        def timed(*args, **kwargs):
+            timing = self._timing()
+            if timing is not None:
+                timing.depth += 1
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                self.add(self.db_errors, name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self.add(self.db_calls, name)
+                self.observe(self.db_seconds, name, elapsed)
+                if timing is not None:
+                    timing.depth -= 1
+                    if not timing.depth:
+                        timing.db += elapsed
+
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+
+    def request_sender(self, send=None):
+        """Функция для apihelper.CUSTOM_REQUEST_SENDER с замером запросов
+
+        send — исходная отправка с сигнатурой requests.request; по умолчанию
+        сессия requests, которую TeleBot использует без CUSTOM_REQUEST_SENDER.
+        """
+        if send is None:
+
+            def send(method, url, **kwargs):
+                return apihelper._get_req_session().request(method, url, **kwargs)
+
+        def sender(method, url, **kwargs):
+            name = url.rsplit("/", 1)[-1]
+            started = time.perf_counter()
+            try:
+                response = send(method, url, **kwargs)
+            except Exception:
+                self.add(self.telegram_errors, name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self.add(self.telegram_requests, name)
+                self.observe(self.telegram_seconds, name, elapsed)
+                timing = self._timing()
+                if timing is not None:
+                    timing.telegram += elapsed
+            if response.status_code != 200:
+                self.add(self.telegram_errors, name)
+            return response
+
+        return sender
+
+    def add_stats(self, name, stats):
+        """Числа из stats() (например, счётчики кэша) как gauge при выдаче /metrics"""
+        self._stats.append((name, stats))
+
+    def render(self):
+        """Текст в формате Prometheus exposition 0.0.4"""
+        with self._lock:
+            snapshot = [
+                (
+                    family,
+                    {
+                        key: (
+                            (list(value.counts), value.sum)
+                            if isinstance(value, Histogram)
+                            else value
+                        )
+                        for key, value in family.values.items()
+                    },
+                )
+                for family in self._families.values()
+            ]
+        snapshot = [
+            (family, family.collect() if family.collect else values)
+            for family, values in snapshot
+        ]
+
+        lines = []
+        for family, values in snapshot:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for key, value in sorted(values.items()):
+                label = f'{family.label}="{_escape(key)}"'
+                if family.kind != "histogram":
+                    lines.append(f"{family.name}{{{label}}} {value}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(
+                        f'{family.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"{family.name}_sum{{{label}}} {total}")
+                lines.append(f"{family.name}_count{{{label}}} {cumulative}")
+
+        for name, stats in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"{self.prefix}_{name}_{key}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class _HandlerScope:
+    __slots__ = ("metrics", "name", "timing", "outer", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        local = self.metrics._local
+        self.outer = getattr(local, "timing", None)
+        self.timing = local.timing = _Timing()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics = self.metrics
+        elapsed = time.perf_counter() - self.started
+        metrics._local.timing = self.outer
+        metrics.add(metrics.handler_requests, self.name)
+        if exc_type is not None:
+            metrics.add(metrics.handler_errors, self.name)
+        metrics.observe(metrics.handler_seconds, self.name, elapsed)
+        metrics.observe(metrics.handler_db_seconds, self.name, self.timing.db)
+        metrics.observe(
+            metrics.handler_telegram_seconds, self.name, self.timing.telegram
+        )
+        return False
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(metrics, host="0.0.0.0", port=9100):
+    """HTTP-сервер /metrics в фоновом потоке; возвращает сервер"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True
+    ).start()
+    return server
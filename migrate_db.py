@@ -0,0 +1,223 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+
+from database import Base, Database
+
+load_dotenv()
+
+# Индексы, которые заменены новыми и больше не нужны
+OBSOLETE_INDEXES = ["ix_user_words_user_id_id", "ix_user_words_active"]
+
+# Колонки времени, которые раньше хранились строками ISO
+TIMESTAMP_COLUMNS = [("users", "created_at"), ("user_words", "added_at")]
+
+
+def normalize_flags(conn):
+    """Замена NULL в булевых колонках на false"""
+    conn.execute(text("UPDATE words SET is_default = false WHERE is_default IS NULL"))
+    conn.execute(text("UPDATE user_words SET deleted = false WHERE deleted IS NULL"))
+
+
+def deduplicate_words(conn):
+    """Слияние одинаковых пар (english, russian) перед уникальным индексом"""
+    # Если хотя бы одна из копий — слово по умолчанию, оставшееся тоже им будет
+    conn.execute(
+        text(
+            """
+            UPDATE words SET is_default = true
+            WHERE is_default = false AND EXISTS (
+                SELECT 1 FROM words d
+                WHERE d.english = words.english AND d.russian = words.russian
+                  AND d.is_default = true
+            )
+            """
+        )
+    )
+    # Переносим связи на слово с минимальным id
+    conn.execute(
+        text(
+            """
+            UPDATE user_words SET word_id = (
+                SELECT min(d.id) FROM words w
+                JOIN words d ON d.english = w.english AND d.russian = w.russian
+                WHERE w.id = user_words.word_id
+            )
+            WHERE word_id IN (
+                SELECT w.id FROM words w WHERE EXISTS (
+                    SELECT 1 FROM words d
+                    WHERE d.english = w.english AND d.russian = w.russian
+                      AND d.id < w.id
+                )
+            )
+            """
+        )
+    )
+    result = conn.execute(
+        text(
+            """
+            DELETE FROM words WHERE EXISTS (
+                SELECT 1 FROM words d
+                WHERE d.english = words.english AND d.russian = words.russian
+                  AND d.id < words.id
+            )
+            """
+        )
+    )
+    print(f"Удалено дублей слов: {result.rowcount}")
+
+
+def deduplicate_user_words(conn):
+    """Одна связь на пару (user_id, word_id): оставляем активную, затем с меньшим id"""
+    result = conn.execute(
+        text(
+            """
+            DELETE FROM user_words WHERE EXISTS (
+                SELECT 1 FROM user_words o
+                WHERE o.user_id = user_words.user_id
+                  AND o.word_id = user_words.word_id
+                  AND o.id <> user_words.id
+                  AND (
+                    (o.deleted = false AND user_words.deleted = true)
+                    OR (o.deleted = user_words.deleted AND o.id < user_words.id)
+                  )
+            )
+            """
+        )
+    )
+    print(f"Удалено дублей связей: {result.rowcount}")
+
+
+def convert_timestamps(conn):
+    """Перевод строковых колонок времени в TIMESTAMP (только PostgreSQL)
+
+    SQLite хранит DateTime строками ISO, поэтому старые значения читаются как есть.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+
+    inspector = inspect(conn)
+    for table, column in TIMESTAMP_COLUMNS:
+        columns = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+        if column in columns and columns[column].python_type is str:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE TIMESTAMP "
+                    f"USING NULLIF({column}, '')::timestamp"
+                )
+            )
+            print(f"Колонка {table}.{column} переведена в TIMESTAMP")
+
+
+def add_word_counts(conn):
+    """Колонка users.custom_word_count и её заполнение по user_words
+
+    Повторный запуск пересчитывает счётчики, если они разошлись с данными.
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns("users")}
+    if "custom_word_count" not in columns:
+        conn.execute(
+            text(
+                "ALTER TABLE users ADD COLUMN custom_word_count "
+                "INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+    conn.execute(
+        text(
+            """
+            UPDATE users SET custom_word_count = (
+                SELECT count(*) FROM user_words uw
+                JOIN words w ON w.id = uw.word_id
+                WHERE uw.user_id = users.id
+                  AND uw.deleted = false AND w.is_default = false
+            )
+            """
+        )
+    )
+    print("Счётчики слов пользователей пересчитаны")
+
+
+def add_word_positions(conn):
+    """Колонка user_words.position: номера активных собственных слов по порядку id
+
+    Повторный запуск перенумеровывает слова, если номера разошлись с данными.
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns("user_words")}
+    if "position" not in columns:
+        conn.execute(text("ALTER TABLE user_words ADD COLUMN position INTEGER"))
+
+    conn.execute(text("UPDATE user_words SET position = NULL"))
+    conn.execute(
+        text(
+            """
+            UPDATE user_words SET position = ranked.position
+            FROM (
+                SELECT uw.id, row_number() OVER (
+                    PARTITION BY uw.user_id ORDER BY uw.id
+                ) AS position
+                FROM user_words uw
+                JOIN words w ON w.id = uw.word_id
+                WHERE uw.deleted = false AND w.is_default = false
+            ) AS ranked
+            WHERE ranked.id = user_words.id
+            """
+        )
+    )
+    print("Номера слов пользователей пересчитаны")
+
+
+def add_user_word_english(conn):
+    """Колонка user_words.english — копия words.english для поиска по началу слова"""
+    columns = {c["name"] for c in inspect(conn).get_columns("user_words")}
+    if "english" not in columns:
+        conn.execute(text("ALTER TABLE user_words ADD COLUMN english VARCHAR(100)"))
+
+    result = conn.execute(
+        text(
+            """
+            UPDATE user_words SET english = (
+                SELECT w.english FROM words w WHERE w.id = user_words.word_id
+            )
+            WHERE english IS NULL
+            """
+        )
+    )
+    print(f"Заполнено слов в связях: {result.rowcount}")
+
+
+def create_indexes(conn):
+    """Создание недостающих индексов из моделей и удаление устаревших"""
+    for name in OBSOLETE_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+            print(f"Индекс {index.name} готов")
+
+    conn.execute(text("ANALYZE"))
+
+
+# Обновление схемы существующей базы данных
+def migrate_database(db_url):
+    db = Database(db_url)
+    db.create_tables()
+
+    with db.engine.begin() as conn:
+        normalize_flags(conn)
+        deduplicate_words(conn)
+        deduplicate_user_words(conn)
+        convert_timestamps(conn)
+        add_word_counts(conn)
+        add_word_positions(conn)
+        add_user_word_english(conn)
+        create_indexes(conn)
+
+    db.compact_default_words()
+    print("Миграция завершена!")
+
+
+if __name__ == "__main__":
+    migrate_database(os.getenv("DATABASE_URL"))
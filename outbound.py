@@ -0,0 +1,363 @@
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from collections import deque
+
+from telebot.apihelper import ApiTelegramException
+
+# Методы TeleBot, которые отправляют или меняют сообщения в чате
+QUEUED_METHODS = ("send_message", "edit_message_text", "edit_message_reply_markup")
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity про запас"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Секунд до появления токена; 0 — токен есть"""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Message:
+    __slots__ = (
+        "method",
+        "send",
+        "args",
+        "kwargs",
+        "enqueued_at",
+        "errors",
+        "done",
+    )
+
+    def __init__(self, method, send, args, kwargs, done=None):
+        self.method = method
+        self.send = send
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+        self.errors = 0  # сетевые ошибки; 429 не считаются
+        self.done = done  # done(True) после отправки, done(False) если отброшено
+
+
+class _Chat:
+    __slots__ = ("messages", "bucket", "not_before", "busy", "scheduled")
+
+    def __init__(self, bucket):
+        self.messages = deque()
+        self.bucket = bucket
+        self.not_before = 0.0  # до этого времени чат ждёт retry_after
+        self.busy = False  # сообщение чата отправляется прямо сейчас
+        self.scheduled = False  # чат есть в очереди готовых
+
+
+# Отправка сообщений с учётом ограничений Telegram на частоту
+class OutboundSender:
+    """Очередь исходящих сообщений и workers потоков, которые их отправляют.
+
+    attach(bot) подменяет у бота send_message и правку сообщений: вызов
+    только ставит сообщение в очередь его чата и возвращает None, не
+    дожидаясь Bot API. Отправку ограничивают два ведра токенов: общее
+    (rate сообщений в секунду) и у каждого чата своё (chat_rate в секунду,
+    всплеск до chat_burst); 0 — без ограничения. Сообщения одного чата
+    уходят по одному и по порядку.
+
+    На ответ 429 сообщение возвращается в начало очереди чата, и вся
+    отправка ждёт retry_after секунд: Telegram не сообщает, какое
+    ограничение превышено. Сетевые ошибки повторяются через секунду,
+    всего не больше max_attempts попыток; остальные ошибки Bot API
+    выводятся в лог, и сообщение отбрасывается. В очереди ждёт не больше
+    max_pending сообщений, при заполнении обработчик ждёт места.
+    """
+
+    def __init__(
+        self,
+        workers=8,
+        rate=30,
+        chat_rate=1,
+        chat_burst=3,
+        max_pending=10000,
+        max_attempts=5,
+        metrics=None,
+    ):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(rate, rate) if rate else None
+        self.direct = {}  # исходные методы бота, подменённые attach()
+
+        self._cond = threading.Condition()
+        self._chats = {}
+        self._ready = []  # куча (not_before, номер, chat_id)
+        self._order = itertools.count()
+        self._closed = False
+        self._paused_until = 0.0  # retry_after последнего ответа 429
+        self._pruned_at = time.monotonic()
+
+        self.pending = 0
+        self.sent = 0
+        self.throttled = 0
+        self.retried = 0
+        self.dropped = 0
+        self.blocked = 0
+
+        self.metrics = metrics
+        if metrics is not None:
+            self._delivery_seconds = metrics.histogram(
+                "outbound_delivery_seconds",
+                "Время от постановки сообщения в очередь до отправки",
+                "method",
+            )
+            self._send_seconds = metrics.histogram(
+                "outbound_send_seconds", "Время отправки сообщения", "method"
+            )
+            self._throttled = metrics.counter(
+                "outbound_throttled_total", "Ответы 429 от Bot API", "method"
+            )
+            self._dropped = metrics.counter(
+                "outbound_dropped_total", "Неотправленные сообщения", "method"
+            )
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"outbound-{n}", daemon=True)
+            for n in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def attach(self, bot, methods=QUEUED_METHODS):
+        """Вызовы methods у bot уходят в очередь вместо прямой отправки"""
+        for name in methods:
+            self.direct[name] = getattr(bot, name)
+            setattr(bot, name, self._queued(name, getattr(bot, name)))
+        return self
+
+    def _queued(self, name, send):
+        signature = inspect.signature(send)
+
+        def queued(*args, **kwargs):
+            chat_id = signature.bind(*args, **kwargs).arguments.get("chat_id")
+            if chat_id is None:
+                # Inline-сообщение без чата: отправляется сразу
+                return send(*args, **kwargs)
+            self.submit(chat_id, name, send, args, kwargs)
+
+        queued.__name__ = name
+        queued.__doc__ = send.__doc__
+        return queued
+
+    def submit(self, chat_id, method, send, args=(), kwargs=None, done=None):
+        """Постановка send(*args, **kwargs) в очередь чата chat_id
+
+        done(delivered), если задан, вызывается из потока отправки, когда
+        сообщение отправлено (True) или отброшено (False).
+        """
+        kwargs = kwargs or {}
+        with self._cond:
+            if self.pending >= self.max_pending and not self._closed:
+                self.blocked += 1
+                while self.pending >= self.max_pending and not self._closed:
+                    self._cond.wait()
+            if not self._closed:
+                self._push(chat_id, _Message(method, send, args, kwargs, done))
+                return
+        # После close() сообщения отправляются из вызывающего потока
+        send(*args, **kwargs)
+        if done is not None:
+            done(True)
+
+    def _push(self, chat_id, message, first=False):
+        """Сообщение в очередь чата (под self._cond)"""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            bucket = None
+            if self.chat_rate:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            chat = self._chats[chat_id] = _Chat(bucket)
+        if first:
+            chat.messages.appendleft(message)
+        else:
+            chat.messages.append(message)
+        self.pending += 1
+        self._schedule(chat_id, chat, chat.not_before)
+
+    def _schedule(self, chat_id, chat, not_before):
+        if chat.busy or chat.scheduled or not chat.messages:
+            return
+        chat.scheduled = True
+        heapq.heappush(self._ready, (not_before, next(self._order), chat_id))
+        self._cond.notify()
+
+    def _next(self):
+        """Следующее сообщение, которое можно отправить; None — остановка"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if not self._ready:
+                    if self._closed and not self.pending:
+                        self._cond.notify_all()
+                        return None
+                    self._cond.wait(10)
+                    continue
+
+                not_before = max(self._ready[0][0], self._paused_until)
+                if not_before > now:
+                    self._cond.wait(not_before - now)
+                    continue
+                chat_id = self._ready[0][2]
+
+                chat = self._chats[chat_id]
+                if chat.bucket is not None:
+                    wait = chat.bucket.wait_time(now)
+                    if wait:
+                        heapq.heapreplace(
+                            self._ready, (now + wait, next(self._order), chat_id)
+                        )
+                        continue
+                if self._global is not None:
+                    wait = self._global.wait_time(now)
+                    if wait:
+                        self._cond.wait(wait)
+                        continue
+                    self._global.take(now)
+                if chat.bucket is not None:
+                    chat.bucket.take(now)
+
+                heapq.heappop(self._ready)
+                chat.scheduled = False
+                chat.busy = True
+                message = chat.messages.popleft()
+                self.pending -= 1
+                self._cond.notify_all()
+                return chat_id, chat, message
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            chat_id, chat, message = item
+            retry_after = self._send(message)
+
+            with self._cond:
+                chat.busy = False
+                if retry_after is not None:
+                    chat.not_before = time.monotonic() + retry_after
+                    self._push(chat_id, message, first=True)
+                else:
+                    self._schedule(chat_id, chat, chat.not_before)
+
+    def _send(self, message):
+        """Одна попытка отправки; секунды до повтора или None"""
+        started = time.monotonic()
+        try:
+            message.send(*message.args, **message.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code != 429:
+                return self._drop(message, e)
+            parameters = (e.result_json or {}).get("parameters") or {}
+            retry_after = parameters.get("retry_after", 1)
+            with self._cond:
+                self.throttled += 1
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+            if self.metrics is not None:
+                self.metrics.add(self._throttled, message.method)
+            return retry_after
+        except Exception as e:
+            message.errors += 1
+            if message.errors >= self.max_attempts:
+                return self._drop(message, e)
+            with self._cond:
+                self.retried += 1
+            return 1
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe(
+                    self._send_seconds, message.method, time.monotonic() - started
+                )
+        with self._cond:
+            self.sent += 1
+        if self.metrics is not None:
+            self.metrics.observe(
+                self._delivery_seconds,
+                message.method,
+                time.monotonic() - message.enqueued_at,
+            )
+        if message.done is not None:
+            message.done(True)
+        return None
+
+    def _drop(self, message, error):
+        with self._cond:
+            self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.add(self._dropped, message.method)
+        print(f"Ошибка при отправке {message.method}: {error}")
+        if message.done is not None:
+            message.done(False)
+        return None
+
+    def _prune(self, now):
+        """Удаление простаивающих чатов с полным ведром (под self._cond)"""
+        if now - self._pruned_at < 10:
+            return
+        self._pruned_at = now
+        idle = [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if not chat.messages
+            and not chat.busy
+            and (chat.bucket is None or chat.bucket.full(now))
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def depth(self):
+        """Сообщений в очереди"""
+        return self.pending
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": self.pending,
+                "chats": len(self._chats),
+                "sent": self.sent,
+                "throttled": self.throttled,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+            }
+
+    def close(self, timeout=None):
+        """Отправка уже поставленных сообщений и остановка потоков"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,186 @@
+import re
+import threading
+import time
+from heapq import heappush, heappushpop
+
+from sqlalchemy import event
+
+# Числа и строки в тексте запроса не отличают «тот же» запрос (для N+1)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class _UpdateProfile:
+    """Запросы одного обновления: число, время, самые медленные, повторы"""
+
+    __slots__ = ("label", "statements", "seconds", "slowest", "repeats")
+
+    def __init__(self, label):
+        self.label = label  # обработчик и чат для лога
+        self.statements = 0
+        self.seconds = 0.0
+        self.slowest = []  # куча (время, текст) из keep_slowest элементов
+        self.repeats = {}
+
+
+class _UpdateScope:
+    __slots__ = ("profiler", "profile", "outer")
+
+    def __init__(self, profiler, label):
+        self.profiler = profiler
+        self.profile = _UpdateProfile(label)
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.outer = getattr(local, "profile", None)
+        local.profile = self.profile
+        return self.profile
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._local.profile = self.outer
+        self.profiler._finish(self.profile)
+        return False
+
+
+class _NoScope:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SCOPE = _NoScope()
+
+
+# Профилировщик запросов к БД по обновлениям Telegram
+class QueryProfiler:
+    """События SQLAlchemy на движке: сколько запросов и времени в БД у обновления.
+
+    Запросы, выполненные внутри update(handler), относятся к этому
+    обновлению (по потоку, в котором работает обработчик). Обновление,
+    превысившее max_statements запросов или max_seconds в БД, выводится в
+    лог вместе с самыми медленными запросами. Один и тот же запрос
+    (без учёта значений параметров), выполненный repeat_threshold раз и
+    больше, помечается как возможный N+1.
+
+    Пока attach() не вызван, update() ничего не делает.
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_statements=10,
+        max_seconds=0.1,
+        repeat_threshold=3,
+        keep_slowest=3,
+    ):
+        self.engine = engine
+        self.max_statements = max_statements
+        self.max_seconds = max_seconds
+        self.repeat_threshold = repeat_threshold
+        self.keep_slowest = keep_slowest
+        self.attached = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.updates = 0
+        self.statements = 0
+        self.seconds = 0.0
+        self.over_threshold = 0
+        self.n_plus_one = 0
+        self.background_statements = 0
+
+    def attach(self):
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+        event.listen(self.engine, "handle_error", self._error)
+        self.attached = True
+        return self
+
+    def detach(self):
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        event.remove(self.engine, "after_cursor_execute", self._after)
+        event.remove(self.engine, "handle_error", self._error)
+        self.attached = False
+
+    def update(self, handler, chat_id=None):
+        """Контекст обработки одного обновления обработчиком handler"""
+        if not self.attached:
+            return _NO_SCOPE
+        return _UpdateScope(self, f"{handler} (чат {chat_id})")
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profiler_started"].pop()
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            with self._lock:
+                self.background_statements += 1
+            return
+
+        profile.statements += 1
+        profile.seconds += elapsed
+        if len(profile.slowest) < self.keep_slowest:
+            heappush(profile.slowest, (elapsed, statement))
+        elif elapsed > profile.slowest[0][0]:
+            heappushpop(profile.slowest, (elapsed, statement))
+
+        key = _LITERALS.sub("?", statement)
+        profile.repeats[key] = profile.repeats.get(key, 0) + 1
+
+    def _error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None:
+            started = connection.info.get("profiler_started")
+            if started:
+                started.pop()
+
+    def _finish(self, profile):
+        repeated = [
+            (count, statement)
+            for statement, count in profile.repeats.items()
+            if count >= self.repeat_threshold
+        ]
+        over = (
+            profile.statements > self.max_statements
+            or profile.seconds > self.max_seconds
+        )
+
+        with self._lock:
+            self.updates += 1
+            self.statements += profile.statements
+            self.seconds += profile.seconds
+            self.over_threshold += over
+            self.n_plus_one += bool(repeated)
+
+        if over:
+            print(
+                f"Обновление {profile.label}: {profile.statements} запросов, "
+                f"{profile.seconds * 1000:.1f} мс в БД"
+            )
+            for elapsed, statement in sorted(profile.slowest, reverse=True):
+                print(f"  {elapsed * 1000:.1f} мс: {_short(statement)}")
+        for count, statement in repeated:
+            print(f"Возможный N+1 в {profile.label}: {count} × {_short(statement)}")
+
+    def stats(self):
+        """Итоги по всем обновлениям с начала работы"""
+        with self._lock:
+            return {
+                "updates": self.updates,
+                "statements": self.statements,
+                "seconds": round(self.seconds, 6),
+                "statements_per_update": (
+                    round(self.statements / self.updates, 2) if self.updates else 0
+                ),
+                "over_threshold": self.over_threshold,
+                "n_plus_one": self.n_plus_one,
+                "background_statements": self.background_statements,
+            }
+
+
+def _short(statement, limit=200):
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "…"
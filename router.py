@@ -0,0 +1,96 @@
+# Таблица маршрутов для текстовых сообщений бота
+class Router:
+    """Выбор обработчика по словарям вместо цепочки фильтров TeleBot.
+
+    TeleBot проверяет обработчики по очереди: каждое сообщение сравнивается
+    со всеми кнопками, а фильтр состояния читает хранилище для каждого
+    обработчика состояния. Здесь обработчик находится за несколько
+    обращений к словарю, а состояние читается один раз на обновление.
+
+    Порядок как у прежних декораторов: команды, кнопки, состояния ввода,
+    обработчик по умолчанию. Нажатия inline-кнопок выбираются по префиксу
+    callback_data до двоеточия. Подходит и для TeleBot, и для AsyncTeleBot —
+    хранятся сами функции.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.buttons = {}
+        self.states = {}
+        self.callbacks = {}
+        self.fallback = None
+
+    def command(self, *names):
+        """Обработчик команд /name"""
+
+        def decorator(handler):
+            for name in names:
+                self.commands[name] = handler
+            return handler
+
+        return decorator
+
+    def button(self, *texts):
+        """Обработчик нажатия кнопки (точное совпадение текста)"""
+
+        def decorator(handler):
+            for text in texts:
+                self.buttons[text] = handler
+            return handler
+
+        return decorator
+
+    def state(self, *states):
+        """Обработчик сообщений в состоянии ввода"""
+
+        def decorator(handler):
+            for state in states:
+                self.states[getattr(state, "name", state)] = handler
+            return handler
+
+        return decorator
+
+    def callback(self, *prefixes):
+        """Обработчик inline-кнопок с callback_data вида "prefix:..." """
+
+        def decorator(handler):
+            for prefix in prefixes:
+                self.callbacks[prefix] = handler
+            return handler
+
+        return decorator
+
+    def default(self, handler):
+        """Обработчик остальных сообщений"""
+        self.fallback = handler
+        return handler
+
+    @staticmethod
+    def extract_command(text):
+        """Имя команды из "/name@bot аргументы" или None"""
+        if not text.startswith("/"):
+            return None
+        return text.split(maxsplit=1)[0][1:].split("@", 1)[0]
+
+    def resolve(self, text, state):
+        """Обработчик для текста сообщения и текущего состояния"""
+        command = self.extract_command(text)
+        if command is not None:
+            handler = self.commands.get(command)
+            if handler is not None:
+                return handler
+
+        handler = self.buttons.get(text)
+        if handler is not None:
+            return handler
+
+        if state is not None:
+            handler = self.states.get(state)
+            if handler is not None:
+                return handler
+
+        return self.fallback
+
+    def resolve_callback(self, data):
+        """Обработчик для callback_data или None"""
+        return self.callbacks.get((data or "").split(":", 1)[0])
@@ -0,0 +1,35 @@
+from collections import namedtuple
+from datetime import timedelta
+
+# Интервальное повторение по алгоритму SM-2 с двумя оценками:
+# правильный ответ — качество 4, неправильный — 2
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 2
+# Слово с ошибкой возвращается в ту же тренировку, а не через сутки
+RETRY_DELAY = timedelta(minutes=10)
+
+Review = namedtuple("Review", ["interval", "ease", "repetitions", "due_at"])
+
+
+def review(interval, ease, repetitions, correct, now):
+    """Новые параметры повторения слова после ответа (интервал в днях)"""
+    quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+    ease = max(
+        MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+
+    if not correct:
+        return Review(0, ease, 0, now + RETRY_DELAY)
+
+    repetitions += 1
+    if repetitions == 1:
+        interval = 1
+    elif repetitions == 2:
+        interval = 6
+    else:
+        interval = round(interval * ease)
+
+    return Review(interval, ease, repetitions, now + timedelta(days=interval))
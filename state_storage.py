@@ -0,0 +1,352 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+from telebot import asyncio_storage
+from telebot.storage import StateStorageBase, StateContext
+
+from database import ChatState
+
+# Запись в кэше: в БД нет состояния для этой пары чат-пользователь
+_ABSENT = (None, None)
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+# Хранилище состояний TeleBot в общей базе данных
+class DatabaseStateStorage(StateStorageBase):
+    """Состояния и данные диалогов в таблице chat_states.
+
+    Переживает перезапуск и доступно нескольким процессам бота. Запись —
+    один upsert. Прочитанная запись запоминается только до конца текущего
+    Database.unit_of_work() (db.unit_cache()): проверка состояния и
+    retrieve_data одного обновления делают один SELECT, а следующее
+    обновление, в том числе в другом процессе, читает базу заново. Данные
+    хранятся в JSON, поэтому в них можно класть только JSON-совместимые
+    значения.
+    """
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+
+    def _remember(self, chat_id, user_id, record):
+        memo = self.db.unit_cache()
+        if memo is not None:
+            memo[("chat_state", chat_id, user_id)] = record
+
+    def _upsert(self, chat_id, user_id, **values):
+        """INSERT ... ON CONFLICT DO UPDATE; возвращает сохранённую запись"""
+        stmt = self.db._dialect_insert(ChatState)
+        session = self.db.Session()
+        try:
+            if stmt is not None:
+                insert_values = {"state": None, "data": "{}", **values}
+                stmt = (
+                    stmt.values(chat_id=chat_id, user_id=user_id, **insert_values)
+                    .on_conflict_do_update(
+                        index_elements=["chat_id", "user_id"],
+                        set_={**values, "updated_at": datetime.now()},
+                    )
+                    .returning(ChatState.state, ChatState.data)
+                )
+                record = tuple(session.execute(stmt).one())
+            else:
+                row = session.get(ChatState, (chat_id, user_id))
+                if row is None:
+                    row = ChatState(chat_id=chat_id, user_id=user_id, data="{}")
+                    session.add(row)
+                for key, value in values.items():
+                    setattr(row, key, value)
+                session.flush()
+                record = (row.state, row.data)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        self._remember(chat_id, user_id, record)
+        return record
+
+    def _load(self, chat_id, user_id):
+        """(state, data JSON) или _ABSENT"""
+        memo = self.db.unit_cache()
+        if memo is not None:
+            record = memo.get(("chat_state", chat_id, user_id))
+            if record is not None:
+                return record
+
+        session = self.db.Session()
+        try:
+            row = session.execute(
+                select(ChatState.state, ChatState.data).where(
+                    ChatState.chat_id == chat_id, ChatState.user_id == user_id
+                )
+            ).first()
+        finally:
+            session.close()
+
+        record = tuple(row) if row is not None else _ABSENT
+        self._remember(chat_id, user_id, record)
+        return record
+
+    def _update_data(self, chat_id, user_id, data_json):
+        """Замена данных существующей записи; False, если записи нет"""
+        stmt = (
+            update(ChatState)
+            .where(ChatState.chat_id == chat_id, ChatState.user_id == user_id)
+            .values(data=data_json, updated_at=datetime.now())
+            .returning(ChatState.state)
+        )
+        session = self.db.Session()
+        try:
+            row = session.execute(stmt).first()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        record = (row.state, data_json) if row is not None else _ABSENT
+        self._remember(chat_id, user_id, record)
+        return row is not None
+
+    def set_state(self, chat_id, user_id, state):
+        if hasattr(state, "name"):
+            state = state.name
+        self._upsert(chat_id, user_id, state=state)
+        return True
+
+    def delete_state(self, chat_id, user_id):
+        session = self.db.Session()
+        try:
+            result = session.execute(
+                delete(ChatState).where(
+                    ChatState.chat_id == chat_id, ChatState.user_id == user_id
+                )
+            )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        self._remember(chat_id, user_id, _ABSENT)
+        return result.rowcount > 0
+
+    def get_state(self, chat_id, user_id):
+        return self._load(chat_id, user_id)[0]
+
+    def get_data(self, chat_id, user_id):
+        data_json = self._load(chat_id, user_id)[1]
+        return json.loads(data_json) if data_json is not None else None
+
+    def reset_data(self, chat_id, user_id):
+        return self._update_data(chat_id, user_id, "{}")
+
+    def set_data(self, chat_id, user_id, key, value):
+        data = self.get_data(chat_id, user_id)
+        if data is None:
+            raise RuntimeError(
+                "chat_id {} and user_id {} does not exist".format(chat_id, user_id)
+            )
+        data[key] = value
+        return self._update_data(chat_id, user_id, _dumps(data))
+
+    def get_interactive_data(self, chat_id, user_id):
+        return StateContext(self, chat_id, user_id)
+
+    def save(self, chat_id, user_id, data):
+        # retrieve_data без состояния отдаёт None: записывать нечего
+        if data is not None:
+            self._update_data(chat_id, user_id, _dumps(data))
+
+
+def _sizeof(value):
+    """Примерный объём значения в байтах вместе с вложенными объектами"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(item) for item in value)
+    return size
+
+
+class _Record:
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state, touched_at):
+        self.state = state
+        self.data = {}
+        self.touched_at = touched_at
+
+
+# Хранилище состояний в памяти процесса с ограничением размера
+class MemoryStateStorage(StateStorageBase):
+    """Состояния диалогов в памяти с вытеснением.
+
+    Запись удаляется, если к ней не обращались idle_ttl секунд, а при
+    превышении max_entries вытесняются самые давно использованные. Записи
+    лежат в порядке последнего обращения, поэтому очистка просматривает
+    только начало очереди. footprint() — текущий объём для мониторинга.
+    """
+
+    def __init__(self, max_entries=100_000, idle_ttl=3600):
+        super().__init__()
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expire(self, now):
+        """Удаление простаивающих и лишних записей (под блокировкой)"""
+        records = self._records
+        while records:
+            key, record = next(iter(records.items()))
+            if self.idle_ttl and record.touched_at + self.idle_ttl <= now:
+                self.expirations += 1
+            elif len(records) > self.max_entries:
+                self.evictions += 1
+            else:
+                break
+            del records[key]
+
+    def _touch(self, chat_id, user_id):
+        """Живая запись с обновлённым временем обращения или None"""
+        now = time.monotonic()
+        self._expire(now)
+        key = (chat_id, user_id)
+        record = self._records.get(key)
+        if record is not None:
+            record.touched_at = now
+            self._records.move_to_end(key)
+        return record
+
+    def set_state(self, chat_id, user_id, state):
+        if hasattr(state, "name"):
+            state = state.name
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            if record is None:
+                record = _Record(state, time.monotonic())
+                self._records[(chat_id, user_id)] = record
+                self._expire(record.touched_at)
+            record.state = state
+        return True
+
+    def delete_state(self, chat_id, user_id):
+        with self._lock:
+            return self._records.pop((chat_id, user_id), None) is not None
+
+    def get_state(self, chat_id, user_id):
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            return record.state if record is not None else None
+
+    def get_data(self, chat_id, user_id):
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            return record.data if record is not None else None
+
+    def reset_data(self, chat_id, user_id):
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            if record is None:
+                return False
+            record.data = {}
+            return True
+
+    def set_data(self, chat_id, user_id, key, value):
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            if record is None:
+                raise RuntimeError(
+                    "chat_id {} and user_id {} does not exist".format(chat_id, user_id)
+                )
+            record.data[key] = value
+            return True
+
+    def get_interactive_data(self, chat_id, user_id):
+        return StateContext(self, chat_id, user_id)
+
+    def save(self, chat_id, user_id, data):
+        # retrieve_data без состояния отдаёт None; запись, созданная внутри
+        # такого блока, не затирается
+        if data is None:
+            return
+        with self._lock:
+            record = self._touch(chat_id, user_id)
+            if record is not None:
+                record.data = data
+
+    def footprint(self):
+        """Число записей, примерный объём в байтах и счётчики вытеснения"""
+        with self._lock:
+            self._expire(time.monotonic())
+            # Копии data: set_data меняет словари записей под блокировкой,
+            # а объём считается уже без неё
+            records = [
+                (key, record, record.state, dict(record.data))
+                for key, record in self._records.items()
+            ]
+            stats = {
+                "entries": len(records),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+        stats["bytes"] = sys.getsizeof(self._records) + sum(
+            _sizeof(key) + sys.getsizeof(record) + _sizeof(state) + _sizeof(data)
+            for key, record, state, data in records
+        )
+        return stats
+
+
+# Та же логика для AsyncTeleBot: вызовы не блокируются, поэтому просто
+# делегируются синхронному хранилищу
+class AsyncMemoryStateStorage(asyncio_storage.StateStorageBase):
+    """Асинхронная обёртка над MemoryStateStorage"""
+
+    def __init__(self, max_entries=100_000, idle_ttl=3600):
+        super().__init__()
+        self.storage = MemoryStateStorage(max_entries=max_entries, idle_ttl=idle_ttl)
+
+    async def set_state(self, chat_id, user_id, state):
+        return self.storage.set_state(chat_id, user_id, state)
+
+    async def delete_state(self, chat_id, user_id):
+        return self.storage.delete_state(chat_id, user_id)
+
+    async def get_state(self, chat_id, user_id):
+        return self.storage.get_state(chat_id, user_id)
+
+    async def get_data(self, chat_id, user_id):
+        return self.storage.get_data(chat_id, user_id)
+
+    async def reset_data(self, chat_id, user_id):
+        return self.storage.reset_data(chat_id, user_id)
+
+    async def set_data(self, chat_id, user_id, key, value):
+        return self.storage.set_data(chat_id, user_id, key, value)
+
+    def get_interactive_data(self, chat_id, user_id):
+        return asyncio_storage.StateContext(self, chat_id, user_id)
+
+    async def save(self, chat_id, user_id, data):
+        self.storage.save(chat_id, user_id, data)
+
+    def footprint(self):
+        return self.storage.footprint()
@@ -0,0 +1,269 @@
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+
+from dotenv import load_dotenv
+from telebot import TeleBot, apihelper
+
+import database
+import webhook
+from chat_workers import chat_key
+
+load_dotenv()
+TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+DB_URL = os.getenv("DATABASE_URL")
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SSL_CERT = os.getenv("WEBHOOK_SSL_CERT")
+WEBHOOK_SSL_KEY = os.getenv("WEBHOOK_SSL_KEY")
+
+# Рабочих процессов; по умолчанию по одному на ядро
+BOT_PROCESSES = int(os.getenv("BOT_PROCESSES") or os.cpu_count() or 1)
+# Пачек обновлений в очереди одного процесса
+PROCESS_QUEUE_SIZE = int(os.getenv("PROCESS_QUEUE_SIZE", "1000"))
+
+
+def process_index(update, processes):
+    """Номер процесса для обновления: crc32 от идентификатора чата.
+
+    Хэш, а не остаток от деления, чтобы внутри процесса чаты
+    по-прежнему равномерно расходились по потокам ChatWorkerPool.
+    """
+    return zlib.crc32(str(chat_key(update)).encode()) % processes
+
+
+def _run_worker(index, updates, started, api_url, file_url):
+    """Рабочий процесс: main.py без приёма обновлений"""
+    # Ctrl+C получает вся группа процессов; останавливает их супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    apihelper.API_URL = api_url
+    apihelper.FILE_URL = file_url
+
+    import main
+    from metrics import start_metrics_server
+
+    if main.METRICS_PORT:
+        # У каждого процесса свой /metrics: METRICS_PORT + номер процесса
+        port = main.METRICS_PORT + index
+        start_metrics_server(main.metrics, main.METRICS_HOST, port)
+
+    started.put(index)
+    try:
+        while True:
+            batch = updates.get()
+            if batch is None:
+                break
+            main.bot.process_new_updates(batch)
+    finally:
+        main.chat_workers.close()
+        if main.outbound is not None:
+            main.outbound.close()
+        main.answer_log.close()
+
+
+class _Worker:
+    __slots__ = ("queue", "process", "routed", "restarts")
+
+    def __init__(self, updates):
+        self.queue = updates
+        self.process = None
+        self.routed = 0
+        self.restarts = 0
+
+
+# Несколько процессов main.py за одним приёмом обновлений (python supervisor.py)
+class Supervisor:
+    """processes рабочих процессов main.py и очередь обновлений к каждому.
+
+    Каждый процесс импортирует main.py со своим движком Database и своими
+    потоками обработки, но сам обновления не получает. Обновления одного
+    чата всегда попадают в один процесс (process_index), поэтому состояния
+    в памяти (STATE_STORAGE=memory) остаются верными без общего хранилища,
+    а обработка не упирается в GIL одного процесса.
+
+    Как и ChatWorkerPool, подменяет bot.process_new_updates у бота,
+    принимающего обновления (attach), и может служить dispatcher для
+    WebhookServer. Обновления передаются между процессами через
+    multiprocessing.Queue пачками: всё, что пришло одному процессу из
+    одного getUpdates, — одна пачка. Упавший процесс запускается заново
+    с новой очередью.
+    """
+
+    def __init__(self, processes=BOT_PROCESSES, max_pending=PROCESS_QUEUE_SIZE):
+        self._context = multiprocessing.get_context("spawn")
+        self._started = self._context.Queue()
+        self._max_pending = max_pending
+        self._workers = [
+            _Worker(self._context.Queue(maxsize=max_pending))
+            for _ in range(processes)
+        ]
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._monitor = None
+        self.bot = None
+
+    def start(self, timeout=60):
+        """Запуск процессов; ждёт, пока все импортируют main.py"""
+        for index in range(len(self._workers)):
+            self._spawn(index)
+        for _ in self._workers:
+            self._started.get(timeout=timeout)
+
+        self._monitor = threading.Thread(
+            target=self._watch, name="supervisor", daemon=True
+        )
+        self._monitor.start()
+        return self
+
+    def _spawn(self, index):
+        worker = self._workers[index]
+        worker.process = self._context.Process(
+            target=_run_worker,
+            args=(
+                index,
+                worker.queue,
+                self._started,
+                apihelper.API_URL,
+                apihelper.FILE_URL,
+            ),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _watch(self):
+        while not self._closing.wait(1):
+            for index, worker in enumerate(self._workers):
+                if worker.process.is_alive() or self._closing.is_set():
+                    continue
+                print(
+                    f"Процесс {index} завершился с кодом "
+                    f"{worker.process.exitcode}, перезапуск"
+                )
+                # Упавший процесс мог оставить захваченной блокировку чтения
+                # очереди; обновления, ждавшие в ней, теряются вместе с ним
+                worker.queue = self._context.Queue(maxsize=self._max_pending)
+                worker.restarts += 1
+                self._spawn(index)
+
+    def attach(self, bot):
+        """Обновления, полученные bot, уходят в рабочие процессы"""
+        self.bot = bot
+        bot.threaded = False
+        bot.process_new_updates = self.process_new_updates
+        return self
+
+    def submit(self, update, block=True):
+        """Передача одного обновления его процессу; False, если очередь полна"""
+        return self._put(process_index(update, len(self._workers)), [update], block)
+
+    def process_new_updates(self, updates):
+        """Замена bot.process_new_updates: одна пачка на процесс"""
+        batches = {}
+        for update in updates:
+            index = process_index(update, len(self._workers))
+            batches.setdefault(index, []).append(update)
+        for index, batch in batches.items():
+            self._put(index, batch, block=True)
+
+        if self.bot is not None and updates:
+            # Смещение getUpdates: обновления уже в очередях процессов
+            with self._lock:
+                last = max(update.update_id for update in updates)
+                if last > self.bot.last_update_id:
+                    self.bot.last_update_id = last
+
+    def _put(self, index, batch, block):
+        worker = self._workers[index]
+        try:
+            worker.queue.put(batch, block=block)
+        except queue.Full:
+            return False
+        with self._lock:
+            worker.routed += len(batch)
+        return True
+
+    def stats(self):
+        """Переданные обновления и перезапуски по каждому процессу"""
+        return [
+            {
+                "process": index,
+                "pid": worker.process.pid,
+                "alive": worker.process.is_alive(),
+                "routed": worker.routed,
+                "restarts": worker.restarts,
+            }
+            for index, worker in enumerate(self._workers)
+        ]
+
+    def close(self, timeout=30):
+        """Обработка уже переданных обновлений и остановка процессов"""
+        self._closing.set()
+        for worker in self._workers:
+            worker.queue.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.process.join(max(0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+
+
+def prepare_database(db_url=DB_URL):
+    """Таблицы и слова по умолчанию — один раз до запуска процессов"""
+    db = database.Database(db_url)
+    try:
+        db.create_tables()
+        db.init_default_words()
+        db.compact_default_words()
+    finally:
+        db.engine.dispose()
+
+
+def run_webhook(bot, supervisor):
+    server = webhook.WebhookServer(
+        bot,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        ssl_cert=WEBHOOK_SSL_CERT,
+        ssl_key=WEBHOOK_SSL_KEY,
+        dispatcher=supervisor,
+    )
+
+    if WEBHOOK_URL:
+        bot.remove_webhook()
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+
+    print(f"Webhook слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    prepare_database()
+
+    bot = TeleBot(TOKEN)
+    supervisor = Supervisor().attach(bot).start()
+    print(f"Бот запущен: {BOT_PROCESSES} процессов")
+    try:
+        if BOT_MODE == "webhook":
+            run_webhook(bot, supervisor)
+        else:
+            bot.remove_webhook()
+            bot.infinity_polling()
+    except KeyboardInterrupt:
+        print("\nБот остановлен.")
+    finally:
+        supervisor.close()
@@ -0,0 +1,250 @@
+from collections import namedtuple
+
+from telebot import types
+from telebot.handler_backends import State, StatesGroup
+
+
+class MyStates(StatesGroup):
+    target_word = State()
+    waiting_for_english = State()
+    waiting_for_russian = State()
+    waiting_for_word_to_delete = State()
+
+
+class Command:
+    ADD_WORD = "➕ Добавить слово"
+    DELETE_WORD = "🔙 Удалить слово"
+    NEXT = "⏭ Дальше"
+    MY_WORDS = "📚 Мои слова"
+    HELP = "❓ Помощь"
+
+
+CANCEL = "❌ Отмена"
+
+# Слов на странице /mywords и в списке для удаления
+PAGE_SIZE = 10
+DELETE_PAGE_SIZE = 8
+
+WELCOME_MESSAGE = """Привет 👋
+
+Давай попрактикуемся в английском языке. Тренировки можешь проходить в удобном для себя темпе.
+
+У тебя есть возможность использовать тренажёр, как конструктор, и собирать свою собственную базу для обучения.
+ Для этого воспользуйся инструментами:
+- добавить слово ➕,
+- удалить слово 🔙,
+- мои слова 📚.
+
+Ну что, начнём ⬇️"""
+
+HELP_MESSAGE = """🤖 *Команды бота:*
+
+/start - Начать работу
+/cards - Новая карточка
+/mywords - Мои слова
+/help - Помощь
+
+*Кнопки:*
+⏭ Дальше - Следующее слово
+➕ Добавить слово - Добавить новое слово
+🔙 Удалить слово - Удалить ваше слово
+📚 Мои слова - Показать все слова
+❓ Помощь - Справка
+
+*Загрузка списка слов:*
+Пришлите файл .csv или .tsv: в каждой строке английское слово и перевод через запятую или табуляцию."""
+
+NO_WORDS_MESSAGE = (
+    "У вас пока нет слов. Добавьте слова с помощью кнопки '➕ Добавить слово'."
+)
+
+NOT_ENOUGH_WORDS_MESSAGE = "Недостаточно слов для тренировки. Добавьте слова!"
+
+IMPORT_FORMAT_MESSAGE = "Пришлите файл .csv, .tsv или .txt: в каждой строке английское слово и перевод через запятую или табуляцию."
+
+IMPORT_TOO_LARGE_MESSAGE = "Файл слишком большой: бот может скачать файл размером до 20 МБ."
+
+DELETE_PROMPT = "Выберите слово для удаления или отправьте начало слова для поиска:"
+
+NOTHING_TO_DELETE_MESSAGE = "У вас нет слов для удаления.\n\nВы можете удалять только слова, которые вы сами добавили."
+
+
+# Карточка в данных состояния диалога: id и строки слов вместо объектов ORM.
+# Кортеж без __dict__ занимает в памяти минимум места и сохраняется в JSON
+# как список, поэтому подходит для любого хранилища состояний
+class Card(namedtuple("Card", ["word_id", "english", "russian", "options"])):
+    __slots__ = ()
+
+    @classmethod
+    def from_words(cls, target_word, all_words):
+        """Карточка из результата Database.get_random_words_for_test"""
+        return cls(
+            target_word.id,
+            target_word.english,
+            target_word.russian,
+            tuple(w.english for w in all_words),
+        )
+
+    @classmethod
+    def restore(cls, value):
+        """Карточка из данных состояния (после JSON варианты — список)"""
+        word_id, english, russian, options = value
+        return cls(word_id, english, russian, tuple(options))
+
+
+# Общие для синхронного (main.py) и асинхронного (async_main.py) бота
+# тексты и клавиатуры
+
+
+def service_buttons():
+    return [
+        types.KeyboardButton(Command.NEXT),
+        types.KeyboardButton(Command.ADD_WORD),
+        types.KeyboardButton(Command.DELETE_WORD),
+        types.KeyboardButton(Command.MY_WORDS),
+        types.KeyboardButton(Command.HELP),
+    ]
+
+
+def card_markup(options, wrong_answer=None):
+    """Клавиатура карточки: варианты ответа и служебные кнопки"""
+    markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
+
+    answer_buttons = []
+    for btn_text in options:
+        if btn_text == wrong_answer:
+            btn_text = f"❌ {btn_text}"
+        answer_buttons.append(types.KeyboardButton(btn_text))
+
+    buttons = service_buttons()
+
+    # Добавление кнопок
+    for i in range(0, len(answer_buttons), 2):
+        markup.add(*answer_buttons[i : i + 2])
+
+    for i in range(0, len(buttons), 2):
+        markup.add(*buttons[i : i + 2])
+
+    return markup
+
+
+def service_markup():
+    """Клавиатура только со служебными кнопками"""
+    markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
+    markup.add(*service_buttons())
+    return markup
+
+
+def cancel_markup():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(types.KeyboardButton(CANCEL))
+    return markup
+
+
+def card_question(target_word):
+    return f"🇷🇺 *{target_word.russian}*\n\nВыбери перевод:"
+
+
+def reminder_message(target_word):
+    return f"⏰ *Карточка дня!*\n\n{card_question(target_word)}"
+
+
+def answer_message(target_word, is_correct):
+    if is_correct:
+        return f"✅ *Правильно!*\n\n{target_word.english} - {target_word.russian}"
+    return f"❌ *Неправильно!*\n\nПравильный ответ: {target_word.english}\nСлово: {target_word.russian}"
+
+
+def english_received_message(english):
+    return f"Английское: *{english}*\n\nТеперь введите перевод:"
+
+
+def add_word_message(english_word, russian_word, result):
+    """Ответ на добавление слова (result из Database.add_word_to_user)"""
+    if result is True:
+        return f"✅ *Слово добавлено!*\n\n{english_word} - {russian_word}"
+    if result is False:
+        return f"✅ *Слово восстановлено!*\n\n{english_word} - {russian_word}"
+    return f"ℹ️ *Слово уже есть:*\n\n{english_word} - {russian_word}"
+
+
+def import_summary_message(stats):
+    """Итог загрузки слов из файла (счётчики из Database.import_words)"""
+    return (
+        "📥 *Загрузка завершена*\n\n"
+        f"Добавлено: {stats['added']}\n"
+        f"Восстановлено: {stats['restored']}\n"
+        f"Уже были в словаре: {stats['duplicates']}\n"
+        f"Пропущено строк: {stats['skipped']}"
+    )
+
+
+def mywords_message(page):
+    """Страница списка слов пользователя (WordsPage из Database.get_words_page)"""
+    total = page.default_count + page.custom_count
+    text = (
+        f"📚 *Ваши слова ({total}):*\n"
+        f"по умолчанию: {page.default_count}, ваших: {page.custom_count}\n\n"
+    )
+    for w in page.words:
+        mark = "" if w.is_default else " ✏️"
+        text += f"• {w.english} - {w.russian}{mark}\n"
+    return text
+
+
+def page_buttons(prefix, page):
+    """Кнопки «назад/вперёд»: callback_data "prefix:prev:<id>" / "prefix:next:<id>" """
+    buttons = []
+    if page.has_prev and page.words:
+        buttons.append(
+            types.InlineKeyboardButton(
+                "◀️ Назад", callback_data=f"{prefix}:prev:{page.words[0].id}"
+            )
+        )
+    if page.has_next and page.words:
+        buttons.append(
+            types.InlineKeyboardButton(
+                "Вперёд ▶️", callback_data=f"{prefix}:next:{page.words[-1].id}"
+            )
+        )
+    return buttons
+
+
+def page_markup(prefix, page):
+    markup = types.InlineKeyboardMarkup()
+    buttons = page_buttons(prefix, page)
+    if buttons:
+        markup.row(*buttons)
+    return markup
+
+
+def parse_page_callback(data):
+    """(after, before) из callback_data кнопок page_markup"""
+    _, direction, word_id = data.split(":", 2)
+    if direction == "prev":
+        return None, int(word_id)
+    return int(word_id), None
+
+
+def search_not_found_message(prefix):
+    return (
+        f"Слов, начинающихся на «{prefix}», нет. "
+        f"Отправьте другое начало слова или нажмите «{CANCEL}»."
+    )
+
+
+def delete_markup(page):
+    """Слова для удаления (callback_data "delete:word:<id>"), листание и отмена"""
+    markup = types.InlineKeyboardMarkup()
+    for w in page.words:
+        markup.row(
+            types.InlineKeyboardButton(
+                f"{w.english} - {w.russian}", callback_data=f"delete:word:{w.id}"
+            )
+        )
+
+    buttons = page_buttons("delete", page)
+    if buttons:
+        markup.row(*buttons)
+    markup.row(types.InlineKeyboardButton(CANCEL, callback_data="delete:cancel"))
+    return markup
@@ -0,0 +1,137 @@
+import hmac
+import json
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class _WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        webhook = self.server.webhook
+
+        if self.path.split("?", 1)[0] != webhook.path:
+            self._reply(404)
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+
+        if not webhook.check_secret(self.headers.get(SECRET_HEADER)):
+            self._reply(403)
+            return
+
+        try:
+            update = types.Update.de_json(json.loads(body))
+        except (ValueError, TypeError, KeyError):
+            self._reply(400)
+            return
+
+        # Очередь заполнена — Telegram повторит доставку позже
+        self._reply(200 if webhook.submit(update) else 503)
+
+
+# Приём обновлений через webhook вместо long polling
+class WebhookServer:
+    """HTTP-сервер, принимающий обновления от Telegram.
+
+    Проверяет секрет из заголовка X-Telegram-Bot-Api-Secret-Token и передаёт
+    обновления в bot.process_new_updates через пул из workers потоков.
+    В очереди может ждать не больше max_pending обновлений, лишние
+    отклоняются с кодом 503.
+
+    С dispatcher (ChatWorkerPool) обновление сразу кладётся в очередь его
+    чата прямо из HTTP-потока, чтобы не нарушить порядок внутри чата;
+    потоки и очередь тогда задаёт сам dispatcher, а workers и max_pending
+    не используются.
+    """
+
+    def __init__(
+        self,
+        bot,
+        host="0.0.0.0",
+        port=8443,
+        path="/webhook",
+        secret_token=None,
+        workers=8,
+        max_pending=1000,
+        ssl_cert=None,
+        ssl_key=None,
+        dispatcher=None,
+    ):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret_token = secret_token
+        self.executor = None
+        if dispatcher is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="webhook"
+            )
+            self._pending = threading.BoundedSemaphore(max_pending)
+
+        # Обработчики выполняются в потоках пула, а не в пуле TeleBot
+        bot.threaded = False
+
+        self.server = _WebhookServer((host, port), _WebhookHandler)
+        self.server.webhook = self
+        if ssl_cert:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(ssl_cert, ssl_key)
+            self.server.socket = context.wrap_socket(
+                self.server.socket, server_side=True
+            )
+
+    def check_secret(self, value):
+        if not self.secret_token:
+            return True
+        return value is not None and hmac.compare_digest(value, self.secret_token)
+
+    def submit(self, update):
+        """Постановка обновления в очередь; False, если очередь заполнена"""
+        if self.dispatcher is not None:
+            return self.dispatcher.submit(update, block=False)
+        if not self._pending.acquire(blocking=False):
+            return False
+        try:
+            self.executor.submit(self._process, update)
+        except RuntimeError:
+            self._pending.release()
+            return False
+        return True
+
+    def _process(self, update):
+        try:
+            self.bot.process_new_updates([update])
+        except Exception as e:
+            print(f"Ошибка при обработке обновления {update.update_id}: {e}")
+        finally:
+            self._pending.release()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,73 @@
+import csv
+import io
+from itertools import islice
+
+# Загрузка слов из CSV/TSV-файла: строка «английское, русское»
+
+IMPORT_EXTENSIONS = (".csv", ".tsv", ".txt")
+# Ограничение Bot API на скачивание файлов ботом
+MAX_IMPORT_FILE_SIZE = 20 * 1024 * 1024
+MAX_WORD_LENGTH = 100  # как у колонок words.english / words.russian
+
+# Первая строка с такими значениями — заголовок, а не слово
+_HEADER_WORDS = {"english", "russian", "английский", "русский", "слово", "перевод"}
+
+
+def _delimiter(line):
+    if "\t" in line:
+        return "\t"
+    if ";" in line and "," not in line:
+        return ";"
+    return ","
+
+
+def read_word_pairs(stream, stats):
+    """Пары (английское, русское) из текстового потока, строка за строкой.
+
+    Разделитель (табуляция, точка с запятой или запятая) определяется по
+    первой строке. Пустые строки, заголовок и строки без перевода или со
+    слишком длинными словами пропускаются и считаются в stats["skipped"].
+    """
+    first_line = stream.readline()
+    if not first_line:
+        return
+
+    lines = _chain_first(first_line, stream)
+    for number, row in enumerate(csv.reader(lines, delimiter=_delimiter(first_line))):
+        fields = [field.strip() for field in row]
+        if not any(fields):
+            continue
+        if number == 0 and fields[0].lower() in _HEADER_WORDS:
+            continue
+
+        if (
+            len(fields) < 2
+            or not fields[0]
+            or not fields[1]
+            or len(fields[0]) > MAX_WORD_LENGTH
+            or len(fields[1]) > MAX_WORD_LENGTH
+        ):
+            stats["skipped"] += 1
+            continue
+
+        yield fields[0], fields[1]
+
+
+def _chain_first(first_line, stream):
+    yield first_line
+    yield from stream
+
+
+def open_text(content):
+    """Текстовый поток над содержимым файла (UTF-8, с BOM или без)"""
+    return io.TextIOWrapper(io.BytesIO(content), encoding="utf-8-sig", errors="replace")
+
+
+def batched(iterable, size):
+    """Пачки по size элементов без загрузки всего потока в память"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch